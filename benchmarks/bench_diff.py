@@ -0,0 +1,81 @@
+"""Compare shadowpcagent.diffing.unified_diff against difflib on large files.
+
+Usage: python benchmarks/bench_diff.py [--scenario sql|lockfile] [--lines 50000] [--edits 20]
+"""
+import argparse
+import difflib
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from shadowpcagent.diffing import unified_diff  # noqa: E402
+
+
+def _make_inputs(
+    lines: int, edits: int, seed: int, scenario: str = "sql"
+) -> tuple[list[str], list[str]]:
+    rng = random.Random(seed)
+    if scenario == "lockfile":
+        original = []
+        for i in range(lines // 6):
+            original += [
+                f'"pkg-{i}@^1.0.0":',
+                f'  version "1.{rng.randrange(5)}.0"',
+                '  resolved "https://registry.example/pkg.tgz"',
+                "  dependencies:",
+                '    lodash "^4.17.0"',
+                "",
+            ]
+    else:
+        original = [
+            f"INSERT INTO events VALUES ({i}, 'user{rng.randrange(500)}', {rng.randrange(10**6)});"
+            for i in range(lines)
+        ]
+        # Generated files repeat lines a lot; sprinkle in some duplicates.
+        for _ in range(lines // 20):
+            original[rng.randrange(lines)] = "COMMIT;"
+    updated = original[:]
+    for _ in range(edits):
+        index = rng.randrange(len(updated))
+        choice = rng.random()
+        if choice < 0.4:
+            updated[index] = updated[index].replace("INSERT", "UPSERT")
+        elif choice < 0.7:
+            updated.insert(index, f"-- inserted {index}")
+        else:
+            del updated[index]
+    return original, updated
+
+
+def _time(fn) -> tuple[float, int]:
+    started = time.perf_counter()
+    output = list(fn())
+    return time.perf_counter() - started, len(output)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=["sql", "lockfile"], default="sql")
+    parser.add_argument("--lines", type=int, default=50_000)
+    parser.add_argument("--edits", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-difflib", action="store_true")
+    args = parser.parse_args()
+
+    original, updated = _make_inputs(args.lines, args.edits, args.seed, args.scenario)
+    fast, fast_lines = _time(lambda: unified_diff(original, updated, "a", "b", lineterm=""))
+    print(f"histogram: {fast * 1000:9.1f} ms  ({fast_lines} diff lines)")
+    if not args.skip_difflib:
+        slow, slow_lines = _time(
+            lambda: difflib.unified_diff(original, updated, "a", "b", lineterm="")
+        )
+        print(f"difflib:   {slow * 1000:9.1f} ms  ({slow_lines} diff lines)")
+        print(f"speedup:   {slow / fast:9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,30 @@
 ﻿from __future__ import annotations
 
 import argparse
+import json
+import sys
+from dataclasses import asdict
+from datetime import timedelta
 from pathlib import Path
 from typing import Optional
 
+from shadowpcagent.config import DEFAULT_CONFIG, load_config
+from shadowpcagent.drafts import DraftManager
+from shadowpcagent.executors import CommandPool, ShellExecutor
+from shadowpcagent.history import DEFAULT_HISTORY_PATH, RunHistory
+from shadowpcagent.journal import DEFAULT_JOURNAL_PATH, UndoJournal
+from shadowpcagent.metrics import REGISTRY
+from shadowpcagent.profiling import DEFAULT_PROFILE_DIR, PROFILE_MODES, Profiler, profile_run_id
+from shadowpcagent.retention import (
+    DEFAULT_HISTORY_MAX_BYTES,
+    DEFAULT_MAX_AGE,
+    DEFAULT_MAX_TOTAL_BYTES,
+    LogRetention,
+)
 from shadowpcagent.tools.shadow_search.index import build_sqlite_index, DEFAULT_DB_PATH
-from shadowpcagent.tools.shadow_search.query import search_sqlite
+from shadowpcagent.tools.shadow_search.query import search_sqlite, search_symbols
+from shadowpcagent.tools.shadow_search.symbols import build_symbol_index, DEFAULT_SYMBOL_DB_PATH
+from shadowpcagent.warehouse import DEFAULT_WAREHOUSE_PATH, LogQuery, LogWarehouse, parse_time
 
 
 def _cmd_search_index(args: argparse.Namespace) -> int:
@@ -26,6 +45,19 @@ def _cmd_search_index(args: argparse.Namespace) -> int:
     seconds = float(result.get("seconds", 0.0))
     out_db = result.get("db_path")
     print(f"OK: indexed {files_indexed} files in {seconds:.2f}s -> {out_db}")
+
+    if args.symbols:
+        sym = build_symbol_index(
+            roots=roots,
+            db_path=Path(args.symbol_db_path) if args.symbol_db_path else None,
+            reset=bool(args.reset),
+            ignore_dirnames=args.ignore_dirname,
+            follow_symlinks=bool(args.follow_symlinks),
+        )
+        print(
+            f"OK: parsed {sym['files_parsed']}/{sym['files_seen']} python files "
+            f"({sym['symbols_indexed']} symbols) in {sym['seconds']:.2f}s -> {sym['db_path']}"
+        )
     return 0
 
 
@@ -46,8 +78,190 @@ def _cmd_search_query(args: argparse.Namespace) -> int:
     return 0
 
 
+def _cmd_search_symbol(args: argparse.Namespace) -> int:
+    results = search_symbols(
+        term=str(args.term),
+        limit=int(args.limit),
+        db_path=Path(args.symbol_db_path) if args.symbol_db_path else None,
+        fuzzy=not args.no_fuzzy,
+    )
+
+    for r in results:
+        print(f"{r['path']}:{r['lineno']}-{r['end_lineno']}  {r['kind']} {r['qualname']}{r['signature']}")
+    return 0
+
+
+def _cmd_drafts_triage(args: argparse.Namespace) -> int:
+    manager = DraftManager(draft_dir=Path(args.draft_dir))
+    statuses = manager.triage(Path(args.repo_root).resolve(), max_workers=args.workers)
+    if not statuses:
+        print(f"No drafts found in {manager.draft_dir}")
+        return 0
+
+    name_width = max(len(s.path.name) for s in statuses)
+    print(f"{'STATUS':<10} {'DRAFT':<{name_width}}  DETAIL")
+    for s in statuses:
+        targets = ", ".join(s.targets)
+        detail = f"{s.detail} [{targets}]" if targets else s.detail
+        print(f"{s.status:<10} {s.path.name:<{name_width}}  {detail}")
+    counts = {status: sum(1 for s in statuses if s.status == status) for status in ("applies", "conflicts", "stale")}
+    print(f"{counts['applies']} applies, {counts['conflicts']} conflicts, {counts['stale']} stale")
+    return 0
+
+
+def _cmd_drafts_gc(args: argparse.Namespace) -> int:
+    manager = DraftManager(draft_dir=Path(args.draft_dir))
+    result = manager.gc(
+        max_age=timedelta(days=args.max_age_days) if args.max_age_days is not None else None,
+        max_count=args.max_count,
+        max_bytes=args.max_bytes,
+    )
+    for path in result.removed:
+        print(f"removed {path}")
+    print(f"OK: removed {len(result.removed)} draft(s), freed {result.freed_bytes} bytes, kept {result.kept}")
+    return 0
+
+
+def _cmd_logs_prune(args: argparse.Namespace) -> int:
+    retention = LogRetention(
+        log_dir=Path(args.log_dir),
+        history_path=Path(args.history_path),
+        max_total_bytes=args.max_bytes,
+        max_age=timedelta(days=args.max_age_days),
+        history_max_bytes=args.history_max_bytes,
+    )
+    result = retention.run()
+    for path in result.rotated:
+        print(f"rotated {path}")
+    print(
+        f"OK: compressed {len(result.compressed)} log(s), removed {len(result.removed)}, "
+        f"freed {result.freed_bytes} bytes"
+    )
+    return 0
+
+
+def _cmd_logs_ingest(args: argparse.Namespace) -> int:
+    result = LogWarehouse(Path(args.db_path)).ingest(
+        log_dir=Path(args.log_dir),
+        history_path=Path(args.history_path) if args.history_path else None,
+    )
+    print(
+        f"OK: loaded {result['events_loaded']} event(s) from {result['files_loaded']}/{result['files_seen']} "
+        f"file(s) in {result['seconds']:.2f}s -> {result['db_path']}"
+    )
+    return 0
+
+
+def _cmd_logs_query(args: argparse.Namespace) -> int:
+    fields = {}
+    for item in args.where or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            print(f"ERROR: --where expects FIELD=VALUE, got {item!r}")
+            return 2
+        fields[name] = value
+    query = LogQuery(
+        event=args.event,
+        since=parse_time(args.since),
+        until=parse_time(args.until),
+        status=args.status,
+        run=args.run,
+        contains=args.contains,
+        fields=fields,
+    )
+    warehouse = LogWarehouse(Path(args.db_path))
+    if args.stat:
+        print(json.dumps(warehouse.stats(query, args.stat)))
+    elif args.runs:
+        for run in warehouse.runs(query):
+            print(run)
+    else:
+        for row in warehouse.query(query, limit=args.limit):
+            print(json.dumps(row))
+    return 0
+
+
+def _cmd_history(args: argparse.Namespace) -> int:
+    history = RunHistory(Path(args.history_path))
+    records = history.since(args.since, limit=args.limit) if args.since else history.tail(args.limit)
+    for record in records:
+        print(f"{record.get('timestamp', '')}  {record.get('status', ''):<18} {record.get('task', '')}")
+    if args.stats:
+        stats = history.stats()
+        total = stats["total"] or 1
+        print(f"\n{stats['total']} run(s)")
+        for status, count in sorted(stats["by_status"].items(), key=lambda item: -item[1]):
+            print(f"  {status:<18} {count:>6}  {100.0 * count / total:5.1f}%")
+        tasks = sorted(stats["by_task"].items(), key=lambda item: -item[1]["runs"])[: args.top_tasks]
+        for task, per_task in tasks:
+            ok = per_task["by_status"].get("completed", 0)
+            print(f"  {per_task['runs']:>6} run(s), {ok} completed  {task}")
+    return 0
+
+
+def _cmd_exec(args: argparse.Namespace) -> int:
+    config = load_config(Path(args.config) if args.config else None)
+    executor = ShellExecutor(
+        allowlist=config.allowlist | set(args.allow),
+        timeout=args.timeout,
+        pure_commands=config.pure_commands,
+    )
+    pool = CommandPool(executor, max_parallel=args.parallel)
+    try:
+        batch = pool.run(args.commands, fail_fast=args.fail_fast)
+    except ValueError as exc:
+        print(f"ERROR: {exc}")
+        return 2
+    if args.json:
+        print(json.dumps(asdict(batch), indent=2))
+        return 0 if batch.succeeded else 1
+    for result in batch.results:
+        if result.cancelled:
+            status = "CANCELLED"
+        elif result.timed_out:
+            status = "TIMEOUT"
+        else:
+            status = "OK" if result.returncode == 0 else f"EXIT {result.returncode}"
+        print(f"{status:<10} {result.duration:>8.2f}s  {result.command}")
+        if result.returncode != 0 and not result.cancelled:
+            for line in (result.stderr or result.stdout).splitlines()[-10:]:
+                print(f"    {line}")
+    print(f"{len(batch.results)} command(s) in {batch.duration:.2f}s")
+    return 0 if batch.succeeded else 1
+
+
+def _cmd_undo(args: argparse.Namespace) -> int:
+    journal = UndoJournal(Path(args.journal))
+    if args.list:
+        for entry in journal.pending():
+            print(f"{entry['run']}  {entry['source']:<8} {len(entry['files'])} file(s)  {entry['timestamp']}")
+        return 0
+
+    result = journal.undo(to_run=args.to)
+    if result.error:
+        print(f"ERROR: {result.error}")
+        return 1
+    for path in result.files:
+        print(f"restored {path}")
+    print(f"OK: undid {result.entries} change(s) from {', '.join(result.runs)}")
+    return 0
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog="shadowpcagent")
+    p.add_argument(
+        "--metrics-textfile",
+        default=None,
+        help="Write Prometheus metrics for this command to a textfile-collector .prom file",
+    )
+    p.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile the command with cProfile (cpu), tracemalloc (mem) or both",
+    )
+    p.add_argument("--profile-dir", default=str(DEFAULT_PROFILE_DIR), help="Where per-run profile artifacts go")
+    p.add_argument("--config", default=None, help="JSON config (allowlist, max_files, log_dir, draft_dir, pure_commands)")
     sub = p.add_subparsers(dest="command", required=True)
 
     # shadowpcagent search ...
@@ -63,6 +277,8 @@ def build_parser() -> argparse.ArgumentParser:
     idx.add_argument("--ignore-glob", action="append", default=None, help="Ignore glob (repeatable)")
     idx.add_argument("--follow-symlinks", action="store_true", help="Follow symlinks while indexing")
     idx.add_argument("--batch-size", type=int, default=2000, help="SQLite insert batch size")
+    idx.add_argument("--symbols", action="store_true", help="Also refresh the Python symbol index")
+    idx.add_argument("--symbol-db-path", default=str(DEFAULT_SYMBOL_DB_PATH), help="Path to symbol sqlite db file")
     idx.set_defaults(func=_cmd_search_index)
 
     # shadowpcagent search query ...
@@ -72,13 +288,114 @@ def build_parser() -> argparse.ArgumentParser:
     qry.add_argument("--db-path", default=str(DEFAULT_DB_PATH), help="Path to sqlite db file")
     qry.set_defaults(func=_cmd_search_query)
 
+    # shadowpcagent search symbol ...
+    sym = subs.add_parser("symbol", help="Find Python definitions in the symbol index")
+    sym.add_argument("--term", required=True, help="Name or dotted qualname (prefix/fuzzy match)")
+    sym.add_argument("--limit", type=int, default=20, help="Max results")
+    sym.add_argument("--no-fuzzy", action="store_true", help="Only exact and prefix matches")
+    sym.add_argument("--symbol-db-path", default=str(DEFAULT_SYMBOL_DB_PATH), help="Path to symbol sqlite db file")
+    sym.set_defaults(func=_cmd_search_symbol)
+
+    # shadowpcagent drafts ...
+    drafts = sub.add_parser("drafts", help="Inspect saved draft patches")
+    drafts_subs = drafts.add_subparsers(dest="drafts_cmd", required=True)
+
+    # shadowpcagent drafts triage ...
+    triage = drafts_subs.add_parser("triage", help="Check which drafts still apply to the current tree")
+    triage.add_argument("--draft-dir", default=str(DEFAULT_CONFIG.draft_dir), help="Directory holding draft-*.patch files")
+    triage.add_argument("--repo-root", default=".", help="Tree to validate drafts against")
+    triage.add_argument("--workers", type=int, default=None, help="Validation threads (default: executor default)")
+    triage.set_defaults(func=_cmd_drafts_triage)
+
+    # shadowpcagent drafts gc ...
+    gc = drafts_subs.add_parser("gc", help="Delete drafts outside the age/count/size budgets")
+    gc.add_argument("--draft-dir", default=str(DEFAULT_CONFIG.draft_dir), help="Draft store directory")
+    gc.add_argument("--max-age-days", type=float, default=30.0, help="Drop drafts older than this")
+    gc.add_argument("--max-count", type=int, default=200, help="Keep at most this many drafts")
+    gc.add_argument("--max-bytes", type=int, default=50 * 1024 * 1024, help="Keep at most this many stored bytes")
+    gc.set_defaults(func=_cmd_drafts_gc)
+
+    # shadowpcagent logs ...
+    logs = sub.add_parser("logs", help="Run log maintenance and queries")
+    logs_subs = logs.add_subparsers(dest="logs_cmd", required=True)
+
+    # shadowpcagent logs prune ...
+    prune = logs_subs.add_parser("prune", help="Gzip closed logs, rotate run history, enforce budgets")
+    prune.add_argument("--log-dir", default=str(DEFAULT_CONFIG.log_dir), help="Directory holding run-*.jsonl logs")
+    prune.add_argument("--history-path", default=str(DEFAULT_HISTORY_PATH), help="Run history JSONL file")
+    prune.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_TOTAL_BYTES, help="Budget for archived logs")
+    prune.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE.days, help="Delete archives older than this")
+    prune.add_argument(
+        "--history-max-bytes", type=int, default=DEFAULT_HISTORY_MAX_BYTES, help="Rotate run history above this size"
+    )
+    prune.set_defaults(func=_cmd_logs_prune)
+
+    # shadowpcagent logs ingest ...
+    ingest = logs_subs.add_parser("ingest", help="Incrementally load run logs into the SQLite warehouse")
+    ingest.add_argument("--log-dir", default=str(DEFAULT_CONFIG.log_dir), help="Directory holding run-*.jsonl logs")
+    ingest.add_argument("--history-path", default=str(DEFAULT_HISTORY_PATH), help="Run history JSONL file")
+    ingest.add_argument("--db-path", default=str(DEFAULT_WAREHOUSE_PATH), help="Path to warehouse sqlite db")
+    ingest.set_defaults(func=_cmd_logs_ingest)
+
+    # shadowpcagent logs query ...
+    lq = logs_subs.add_parser("query", help="Query the log warehouse")
+    lq.add_argument("--event", default=None, help="Event type (e.g. shell_command, patch_validation)")
+    lq.add_argument("--since", default=None, help="ISO timestamp or relative (7d, 24h, 30m)")
+    lq.add_argument("--until", default=None, help="ISO timestamp or relative (7d, 24h, 30m)")
+    lq.add_argument("--status", default=None, help="Payload status (e.g. completed, planned)")
+    lq.add_argument("--run", default=None, help="Run id (log file stem)")
+    lq.add_argument("--contains", default=None, help="Substring anywhere in the payload")
+    lq.add_argument("--where", action="append", default=None, help="Payload field match FIELD=VALUE (repeatable)")
+    lq.add_argument("--runs", action="store_true", help="Print matching run ids only")
+    lq.add_argument("--stat", default=None, help="Summarize a numeric field (e.g. duration)")
+    lq.add_argument("--limit", type=int, default=50, help="Max events")
+    lq.add_argument("--db-path", default=str(DEFAULT_WAREHOUSE_PATH), help="Path to warehouse sqlite db")
+    lq.set_defaults(func=_cmd_logs_query)
+
+    # shadowpcagent history ...
+    hist = sub.add_parser("history", help="Show recent runs and aggregate stats")
+    hist.add_argument("--limit", type=int, default=20, help="Number of runs to show")
+    hist.add_argument("--since", default=None, help="Show runs from this UTC day (YYYY-MM-DD), oldest first")
+    hist.add_argument("--stats", action="store_true", help="Also print counts by status and task")
+    hist.add_argument("--top-tasks", type=int, default=10, help="Tasks to list with --stats")
+    hist.add_argument("--history-path", default=str(DEFAULT_HISTORY_PATH), help="Run history JSONL file")
+    hist.set_defaults(func=_cmd_history)
+
+    # shadowpcagent exec ...
+    ex = sub.add_parser("exec", help="Run independent allowlisted commands concurrently")
+    ex.add_argument("commands", nargs="+", help="Commands to run; quote each one")
+    ex.add_argument("--parallel", type=int, default=4, help="Max commands running at once")
+    ex.add_argument("--fail-fast", action="store_true", help="Cancel the rest after the first failure")
+    ex.add_argument("--timeout", type=float, default=None, help="Per-command wall-clock timeout in seconds")
+    ex.add_argument("--allow", action="append", default=[], help="Extra allowlisted command (repeatable)")
+    ex.add_argument("--json", action="store_true", help="Print results as JSON")
+    ex.set_defaults(func=_cmd_exec)
+
+    # shadowpcagent undo ...
+    undo = sub.add_parser("undo", help="Revert applied changes using the undo journal")
+    undo.add_argument("--to", default=None, help="Undo every run back to and including this run id")
+    undo.add_argument("--list", action="store_true", help="List undoable changes instead of undoing")
+    undo.add_argument("--journal", default=str(DEFAULT_JOURNAL_PATH), help="Path to the undo journal")
+    undo.set_defaults(func=_cmd_undo)
+
     return p
 
 
 def main(argv: Optional[list[str]] = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv if argv is not None else None)
-    return int(args.func(args))
+    profiler = None
+    if args.profile:
+        profiler = Profiler(args.profile, Path(args.profile_dir) / profile_run_id()).start()
+    try:
+        code = int(args.func(args))
+    finally:
+        if profiler is not None:
+            for kind, path in profiler.stop().items():
+                print(f"profile {kind}: {path}", file=sys.stderr)
+    if args.metrics_textfile and REGISTRY.updated:
+        REGISTRY.write_textfile(Path(args.metrics_textfile))
+    return code
 
 
 if __name__ == "__main__":
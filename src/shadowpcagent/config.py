@@ -1,5 +1,5 @@
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Iterable
 
@@ -10,6 +10,7 @@ class AgentConfig:
     max_files: int
     log_dir: Path
     draft_dir: Path
+    pure_commands: set[str] = field(default_factory=set)
 
 
 DEFAULT_CONFIG = AgentConfig(
@@ -28,11 +29,13 @@ def load_config(path: Path | None) -> AgentConfig:
     max_files = int(data.get("max_files", DEFAULT_CONFIG.max_files))
     log_dir = Path(data.get("log_dir", str(DEFAULT_CONFIG.log_dir)))
     draft_dir = Path(data.get("draft_dir", str(DEFAULT_CONFIG.draft_dir)))
+    pure_commands = set(data.get("pure_commands", DEFAULT_CONFIG.pure_commands))
     return AgentConfig(
         allowlist=allowlist,
         max_files=max_files,
         log_dir=log_dir,
         draft_dir=draft_dir,
+        pure_commands=pure_commands,
     )
 
 
@@ -44,4 +47,5 @@ def merge_allowlist(config: AgentConfig, allowlist: Iterable[str]) -> AgentConfi
         max_files=config.max_files,
         log_dir=config.log_dir,
         draft_dir=config.draft_dir,
+        pure_commands=set(config.pure_commands),
     )
@@ -1,16 +1,27 @@
+import functools
 import json
 from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 
+from shadowpcagent.config import AgentConfig
 from shadowpcagent.drafts import DraftManager
-from shadowpcagent.editor import EditRequest, FileEditor
-from shadowpcagent.executors import ShellExecutor
+from shadowpcagent.editor import CodemodRequest, EditRequest, EditResult, FileEditor
+from shadowpcagent.executors import CommandPool, ShardedTestExecutor, ShellExecutor
+from shadowpcagent.flight import RECORDER, dump_path
 from shadowpcagent.gui import GuiExecutor
+from shadowpcagent.history import DEFAULT_HISTORY_PATH
+from shadowpcagent.impact import TestImpactSelector, touched_paths
+from shadowpcagent.journal import UndoJournal
 from shadowpcagent.logging_utils import JsonlLogger, RunHistoryLogger
+from shadowpcagent.metrics import DEFAULT_METRICS_PATH, PATCH_VALIDATION_FAILURES, REGISTRY, RUNS, SCAN_FILES
 from shadowpcagent.models import ActionLog, Plan, PlanStep, RunHistoryEntry, RunSummary
 from shadowpcagent.patcher import UnifiedDiffApplier
+from shadowpcagent.profiling import DEFAULT_PROFILE_DIR, Profiler
+from shadowpcagent.repomap import RepoMapBuilder
+from shadowpcagent.retention import LogRetention
 from shadowpcagent.safety import SafetyEngine
+from shadowpcagent.tracing import NOOP_SPAN, Span, Tracer
 from shadowpcagent.workspace import WorkspaceScanner
 
 
@@ -25,18 +36,95 @@ class Planner:
         return Plan(task=task, steps=steps)
 
 
+def _dump_flight_on_exception(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except BaseException as exc:
+            profile_paths: dict = {}
+            try:
+                profile_paths = self._stop_profiler()
+            finally:
+                RECORDER.exception("orchestrator", exc)
+                if profile_paths:
+                    RECORDER.record("orchestrator", "profile", profile_paths)
+                path = RECORDER.dump(dump_path(self.logger.path.stem))
+                self.logger.log(
+                    "flight_recorder",
+                    {"path": str(path), "error": f"{type(exc).__name__}: {exc}", "profile_paths": profile_paths},
+                )
+            if isinstance(self._run_span, Span):
+                self._run_span.args["error"] = type(exc).__name__
+            self._end_trace()
+            self.flush()
+            raise
+
+    return wrapper
+
+
 class Orchestrator:
-    def __init__(self, allowlist: set[str], log_dir: Path, draft_dir: Path) -> None:
+    def __init__(
+        self,
+        allowlist: set[str],
+        log_dir: Path,
+        draft_dir: Path,
+        tracing: bool = True,
+        metrics_path: Path | None = DEFAULT_METRICS_PATH,
+        profile: str | None = None,
+        shell_timeout: float | None = 600.0,
+        shell_idle_timeout: float | None = 120.0,
+        max_parallel_commands: int = 4,
+        pure_commands: set[str] | None = None,
+    ) -> None:
         self.planner = Planner()
+        self.metrics_path = metrics_path
+        self.profile = profile
+        self._profiler: Profiler | None = None
         self.gui_executor = GuiExecutor()
         self.safety_engine = SafetyEngine()
-        self.shell_executor = ShellExecutor(allowlist=allowlist)
-        self.logger = JsonlLogger(log_dir=log_dir)
-        self.draft_manager = DraftManager(draft_dir=draft_dir)
-        self.editor = FileEditor()
-        self.patcher = UnifiedDiffApplier()
-        self.run_history = RunHistoryLogger(Path("artifacts") / "run-history.jsonl")
+        self.shell_executor = ShellExecutor(
+            allowlist=allowlist,
+            timeout=shell_timeout,
+            idle_timeout=shell_idle_timeout,
+            output_dir=Path("artifacts") / "shell",
+            on_progress=lambda progress: self.logger.log("shell_progress", progress),
+            pure_commands=pure_commands or (),
+        )
+        self.command_pool = CommandPool(self.shell_executor, max_parallel=max_parallel_commands)
+        self.logger = JsonlLogger(log_dir=log_dir, buffered=True, recorder=RECORDER)
+        self.tracer = Tracer(enabled=tracing, sink=lambda record: self.logger.log("span", record))
+        self._run_span = NOOP_SPAN
+        self.draft_manager = DraftManager(draft_dir=draft_dir, run_id=self.logger.path.stem)
+        self.journal = UndoJournal(log_dir.parent / "undo-journal.jsonl", run_id=self.logger.path.stem)
+        self.editor = FileEditor(journal=self.journal)
+        self.patcher = UnifiedDiffApplier(journal=self.journal)
+        history_path = DEFAULT_HISTORY_PATH
+        self.retention = LogRetention(log_dir=log_dir, history_path=history_path)
+        # Rotates history before the writer opens it; compression runs in the background.
+        self.retention.start(active=self.logger.path)
+        self.run_history = RunHistoryLogger(history_path, buffered=True)
+        self.test_executor = ShardedTestExecutor(
+            allowlist=allowlist,
+            durations_path=self.run_history.history_path.with_name("test-durations.json"),
+            timeout=shell_timeout,
+            idle_timeout=shell_idle_timeout,
+            output_dir=Path("artifacts") / "shell",
+        )
+        self.repo_map_path = Path("artifacts") / "repo-map.json"
+        self.repo_mapper = RepoMapBuilder(artifact_path=self.repo_map_path)
+
+    @classmethod
+    def from_config(cls, config: AgentConfig, **kwargs) -> "Orchestrator":
+        return cls(
+            allowlist=set(config.allowlist),
+            log_dir=config.log_dir,
+            draft_dir=config.draft_dir,
+            pure_commands=set(config.pure_commands),
+            **kwargs,
+        )
 
+    @_dump_flight_on_exception
     def run(
         self,
         task: str,
@@ -49,11 +137,26 @@ class Orchestrator:
         plan_only: bool,
         apply_draft_path: Path | None,
         dry_run_apply: bool,
+        run_tests: bool = False,
+        test_shards: int | None = None,
+        fail_fast: bool = False,
+        codemod_request: CodemodRequest | None = None,
+        edit_requests: list[EditRequest] | None = None,
+        commands: list[str] | None = None,
+        fail_fast_commands: bool = False,
     ) -> RunSummary:
-        plan = self.planner.build_plan(task)
-        report = self.safety_engine.classify(task=task, plan=plan)
+        if self.profile:
+            self._profiler = Profiler(self.profile, DEFAULT_PROFILE_DIR / self.logger.path.stem).start()
+        self.tracer.reset()
+        RECORDER.record("orchestrator", "run_start", {"task": task, "command": command, "repo_root": str(repo_root)})
+        self._run_span = self.tracer.start("Orchestrator.run", category="run", task=task)
+        with self.tracer.start("plan") as span:
+            plan = self.planner.build_plan(task)
+            report = self.safety_engine.classify(task=task, plan=plan)
         actions: list[ActionLog] = []
-        scan = WorkspaceScanner(repo_root).scan(max_files=max_files)
+        with self.tracer.start("scan", max_files=max_files) as span:
+            scan = WorkspaceScanner(repo_root).scan(max_files=max_files)
+        SCAN_FILES.observe(scan.file_count)
         self.logger.log("plan_built", {"task": task, "steps": [s.title for s in plan.steps]})
         self.logger.log(
             "workspace_scan",
@@ -68,6 +171,27 @@ class Orchestrator:
                 action="Scan workspace",
                 succeeded=True,
                 detail=f"Scanned {scan.file_count} files under {repo_root}",
+                duration=span.duration,
+            )
+        )
+        with self.tracer.start("repo_map") as span:
+            repo_map = self.repo_mapper.build(repo_root, max_files=max_files).summary(self.repo_map_path)
+        self.logger.log(
+            "repo_map",
+            {
+                "files": repo_map.files,
+                "cached_files": repo_map.cached_files,
+                "seconds": repo_map.seconds,
+                "build_tools": sorted(repo_map.build_tools),
+                "path": repo_map.path,
+            },
+        )
+        actions.append(
+            ActionLog(
+                action="Map repository",
+                succeeded=True,
+                detail=f"Mapped {repo_map.files} source files in {repo_map.seconds:.2f}s",
+                duration=span.duration,
             )
         )
         draft_path = None
@@ -75,8 +199,11 @@ class Orchestrator:
         edit_path = None
         applied_patch = None
         applied_patch_path = None
+        edit_results: list[EditResult] = []
+        codemod_result = None
         if draft_note:
-            draft = self.draft_manager.write_note(draft_note)
+            with self.tracer.start("draft_note") as span:
+                draft = self.draft_manager.write_note(draft_note, task=task)
             draft_path = str(draft.path)
             self.logger.log("draft_created", {"path": draft_path})
             actions.append(
@@ -84,34 +211,92 @@ class Orchestrator:
                     action="Create draft note",
                     succeeded=True,
                     detail=f"Draft written to {draft_path}",
+                    duration=span.duration,
+                )
+            )
+        edits = ([edit_request] if edit_request else []) + list(edit_requests or [])
+        if edits:
+            edit_path = str(edits[0].path)
+            for request in edits:
+                path = str(request.path)
+                if self.safety_engine.is_sensitive_path(path) and not approve_sensitive:
+                    report.requires_approval = True
+                    report.reasons.append(f"Sensitive path detected: {path}")
+            with self.tracer.start("edit", category="executor", files=len(edits)) as span:
+                batch_result = self.editor.apply_batch(edits)
+            edit_results = batch_result.results
+            edit_diff = batch_result.diff
+            for result in batch_result.results:
+                self.logger.log(
+                    "edit_attempt",
+                    {
+                        "path": str(result.path),
+                        "changed": result.changed,
+                        "applied": result.applied,
+                        "error": result.error,
+                    },
+                )
+            if batch_result.diff:
+                draft = self.draft_manager.write_diff(batch_result.diff, task=task)
+                draft_path = draft_path or str(draft.path)
+                self.logger.log("draft_created", {"path": draft_path})
+            paths = sorted({str(request.path) for request in edits})
+            target = edit_path if len(paths) == 1 else f"{len(paths)} files"
+            actions.append(
+                ActionLog(
+                    action="Edit file" if len(edits) == 1 else "Edit files (batch)",
+                    succeeded=batch_result.error is None,
+                    detail=batch_result.error
+                    or f"Edit {'applied' if batch_result.applied else 'drafted'} for {target}",
+                    duration=span.duration,
                 )
             )
-        if edit_request:
-            edit_path = str(edit_request.path)
-            if self.safety_engine.is_sensitive_path(edit_path) and not approve_sensitive:
+        if codemod_request:
+            with self.tracer.start("codemod", category="executor", pattern=codemod_request.pattern) as span:
+                # Nothing is written until every changed path has passed the sensitive-path gate.
+                codemod_result = self.editor.apply_codemod(
+                    codemod_request,
+                    approve=lambda paths: approve_sensitive
+                    or not any(self.safety_engine.is_sensitive_path(str(path)) for path in paths),
+                )
+            sensitive = [
+                str(f.path) for f in codemod_result.files
+                if self.safety_engine.is_sensitive_path(str(f.path))
+            ]
+            if sensitive and not approve_sensitive:
                 report.requires_approval = True
-                report.reasons.append(f"Sensitive path detected: {edit_path}")
-            edit_result = self.editor.apply_edit(edit_request)
-            edit_diff = edit_result.diff
+                report.reasons.extend(f"Sensitive path detected: {path}" for path in sensitive)
             self.logger.log(
-                "edit_attempt",
+                "codemod",
                 {
-                    "path": edit_path,
-                    "changed": edit_result.changed,
-                    "applied": edit_result.applied,
-                    "error": edit_result.error,
+                    "root": str(codemod_request.root),
+                    "pattern": codemod_request.pattern,
+                    "path_glob": codemod_request.path_glob,
+                    "candidates": codemod_result.candidates,
+                    "seconds": codemod_result.seconds,
+                    "applied": codemod_result.applied,
+                    "error": codemod_result.error,
+                    "files": [
+                        {"path": str(f.path), "matches": f.matches, "seconds": f.seconds, "error": f.error}
+                        for f in codemod_result.files
+                    ],
                 },
             )
-            if edit_result.diff:
-                draft = self.draft_manager.write_diff(edit_result.diff)
+            if codemod_result.diff:
+                draft = self.draft_manager.write_diff(codemod_result.diff, task=task)
                 draft_path = draft_path or str(draft.path)
-                self.logger.log("draft_created", {"path": draft_path})
+                edit_diff = edit_diff or codemod_result.diff
+                self.logger.log("draft_created", {"path": str(draft.path)})
+            matches = sum(f.matches for f in codemod_result.files)
             actions.append(
                 ActionLog(
-                    action="Edit file",
-                    succeeded=edit_result.error is None,
-                    detail=edit_result.error
-                    or f"Edit {'applied' if edit_result.applied else 'drafted'} for {edit_path}",
+                    action="Codemod",
+                    succeeded=codemod_result.error is None,
+                    detail=codemod_result.error
+                    or f"{matches} match(es) in {len(codemod_result.files)} of "
+                    f"{codemod_result.candidates} candidate file(s) "
+                    f"{'applied' if codemod_result.applied else 'drafted'}",
+                    duration=span.duration,
                 )
             )
         if apply_draft_path:
@@ -122,28 +307,51 @@ class Orchestrator:
             if not approve_sensitive:
                 report.requires_approval = True
                 report.reasons.append("Patch apply requires explicit approval.")
-            diff_text = Path(apply_draft_path).read_text(encoding="utf-8")
-            validation_result = self.patcher.apply(diff_text, repo_root=repo_root, dry_run=True)
+            with self.tracer.start("patch_validate", category="executor", path=applied_patch_path) as span:
+                diff_text = self.draft_manager.read(Path(apply_draft_path))
+                patch_plan = self.patcher.plan(diff_text, repo_root=repo_root)
+            validation_result = patch_plan.result
             applied_patch = validation_result
-            self.logger.log("patch_validation", validation_result.__dict__)
+            self.logger.debug(
+                "patch_plan",
+                [{"path": str(item.path), "error": item.error, "placements": item.placements} for item in patch_plan.files],
+            )
+            if not validation_result.validated:
+                PATCH_VALIDATION_FAILURES.inc()
+            self.logger.log_dataclass("patch_validation", validation_result)
+            for file_result in validation_result.files:
+                if self.safety_engine.is_sensitive_path(file_result.path) and not approve_sensitive:
+                    report.reasons.append(f"Sensitive path detected: {file_result.path}")
+            patch_target = (
+                validation_result.path
+                if len(validation_result.files) <= 1
+                else f"{len(validation_result.files)} files"
+            )
+            if validation_result.offset or validation_result.fuzz:
+                patch_target += (
+                    f" (offset up to {validation_result.offset} lines, fuzz {validation_result.fuzz})"
+                )
             actions.append(
                 ActionLog(
                     action="Validate draft patch",
                     succeeded=validation_result.validated,
                     detail=validation_result.error
-                    or f"Validated patch for {validation_result.path}",
+                    or f"Validated patch for {patch_target}",
+                    duration=span.duration,
                 )
             )
             if approve_sensitive and not dry_run_apply:
                 if validation_result.validated:
-                    apply_result = self.patcher.apply(diff_text, repo_root=repo_root, dry_run=False)
+                    with self.tracer.start("patch_apply", category="executor", path=applied_patch_path) as span:
+                        apply_result = self.patcher.apply_plan(patch_plan)
                     applied_patch = apply_result
                     actions.append(
                         ActionLog(
                             action="Apply draft patch",
                             succeeded=apply_result.applied,
                             detail=apply_result.error
-                            or f"Applied patch to {apply_result.path}",
+                            or f"Applied patch to {patch_target}",
+                            duration=span.duration,
                         )
                     )
                 else:
@@ -154,6 +362,21 @@ class Orchestrator:
                             detail="Validation failed; patch not applied.",
                         )
                     )
+        test_selection = None
+        # Selection refreshes the symbol index, so only do it when tests will run.
+        changed = touched_paths(*edit_results, codemod_result, applied_patch) if run_tests else []
+        if changed:
+            with self.tracer.start("test_selection", changed=len(changed)) as span:
+                test_selection = TestImpactSelector(repo_root).select(changed)
+            self.logger.log_dataclass("test_selection", test_selection)
+            actions.append(
+                ActionLog(
+                    action="Select impacted tests",
+                    succeeded=True,
+                    detail=test_selection.reason,
+                    duration=span.duration,
+                )
+            )
         if report.requires_approval and not approve_sensitive:
             summary = RunSummary(
                 status="approval_required",
@@ -164,6 +387,8 @@ class Orchestrator:
                 files_scanned=scan.file_count,
                 file_types=scan.file_types,
                 repo_root=str(repo_root),
+                repo_map=repo_map,
+                test_selection=test_selection,
                 plan_only=False,
                 log_path=str(self.logger.path),
                 draft_path=draft_path,
@@ -184,6 +409,8 @@ class Orchestrator:
                 files_scanned=scan.file_count,
                 file_types=scan.file_types,
                 repo_root=str(repo_root),
+                repo_map=repo_map,
+                test_selection=test_selection,
                 plan_only=True,
                 log_path=str(self.logger.path),
                 draft_path=draft_path,
@@ -192,28 +419,93 @@ class Orchestrator:
             )
             return self._finalize_summary(summary)
 
-        gui_result = self.gui_executor.perform_action("Open application")
+        with self.tracer.start("gui_action", category="executor", action="Open application") as span:
+            gui_result = self.gui_executor.perform_action("Open application")
         actions.append(
             ActionLog(
                 action=gui_result.action,
                 succeeded=gui_result.succeeded,
                 detail=f"GUI action at {gui_result.timestamp}",
+                duration=span.duration,
             )
         )
 
-        shell_result = self.shell_executor.run(command)
-        self.logger.log("shell_command", shell_result.__dict__)
-        actions.append(
-            ActionLog(
-                action="Run command",
-                succeeded=shell_result.returncode == 0,
-                detail=f"Command '{command}' exited {shell_result.returncode}",
+        # Edits, codemods and patches above may have changed the tree.
+        self.shell_executor.invalidate()
+        if commands:
+            # Independent checks run concurrently; the primary command comes first.
+            with self.tracer.start("shell_commands", category="executor", commands=len(commands) + 1) as span:
+                batch = self.command_pool.run([command, *commands], fail_fast=fail_fast_commands)
+            shell_results = batch.results
+            self.logger.log(
+                "shell_batch",
+                {"commands": len(shell_results), "duration": batch.duration, "cancelled": batch.cancelled},
+            )
+        else:
+            with self.tracer.start("shell_command", category="executor", command=command) as span:
+                shell_results = [self.shell_executor.run(command)]
+        shell_result = shell_results[0]
+        for result in shell_results:
+            self.logger.log("shell_command", result.__dict__)
+            if result.cancelled:
+                status = "cancelled (fail-fast)"
+            else:
+                status = f"exited {result.returncode}" + (f" ({result.timed_out} timeout)" if result.timed_out else "")
+                status += " (cached)" if result.cached else ""
+            actions.append(
+                ActionLog(
+                    action="Run command",
+                    succeeded=result.returncode == 0 and not result.cancelled,
+                    detail=f"Command '{result.command}' {status}",
+                    duration=result.duration if commands else span.duration,
+                )
             )
-        )
 
-        self.gui_executor.perform_action("Execute task steps")
+        test_run = None
+        if run_tests and test_selection is not None and not test_selection.has_tests:
+            actions.append(
+                ActionLog(action="Run tests", succeeded=True, detail="Skipped: no tests depend on the changes.")
+            )
+        elif run_tests:
+            test_args = test_selection.pytest_args() if test_selection else []
+            with self.tracer.start("tests", category="executor", shards=test_shards) as span:
+                test_run = self.test_executor.run(
+                    repo_root, args=test_args, fail_fast=fail_fast, shards=test_shards
+                )
+            self.logger.log(
+                "test_run",
+                {
+                    "command": test_run.command,
+                    "shards": test_run.shards,
+                    "passed": test_run.passed,
+                    "failed": test_run.failed,
+                    "errors": test_run.errors,
+                    "skipped": test_run.skipped,
+                    "returncode": test_run.returncode,
+                    "duration": test_run.duration,
+                    "cancelled": test_run.cancelled,
+                },
+            )
+            detail = (
+                f"{test_run.passed} passed, {test_run.failed + test_run.errors} failed "
+                f"across {test_run.shards} shard(s) in {test_run.duration:.2f}s"
+            )
+            if test_run.shards == 0 and test_run.returncode not in (0, 5) and test_run.shard_results:
+                collection = test_run.shard_results[0].stdout.splitlines()
+                detail = f"Test collection failed (exit {test_run.returncode}): " + " | ".join(collection[-5:])
+            actions.append(
+                ActionLog(
+                    action="Run tests",
+                    succeeded=test_run.returncode == 0,
+                    detail=detail,
+                    duration=span.duration,
+                )
+            )
+
+        with self.tracer.start("gui_action", category="executor", action="Execute task steps"):
+            self.gui_executor.perform_action("Execute task steps")
         summary = RunSummary(
-            status="completed",
+            status="failed" if any(not action.succeeded for action in actions) else "completed",
             task=task,
             plan=plan,
             actions=actions,
@@ -221,8 +513,12 @@ class Orchestrator:
             files_scanned=scan.file_count,
             file_types=scan.file_types,
             repo_root=str(repo_root),
+            repo_map=repo_map,
+            test_selection=test_selection,
             plan_only=False,
             shell_result=shell_result,
+            shell_results=shell_results,
+            test_run=test_run,
             log_path=str(self.logger.path),
             draft_path=draft_path,
             edit_path=edit_path,
@@ -233,17 +529,59 @@ class Orchestrator:
         return self._finalize_summary(summary)
 
     def _finalize_summary(self, summary: RunSummary) -> RunSummary:
-        self.logger.log_dataclass("run_summary", summary)
-        summary_path = Path("artifacts") / "run-summary.json"
-        summary_path.parent.mkdir(parents=True, exist_ok=True)
-        summary.run_history_path = str(self.run_history.history_path)
-        summary.run_summary_path = str(summary_path)
-        summary_path.write_text(json.dumps(asdict(summary), indent=2), encoding="utf-8")
-        history_entry = RunHistoryEntry(
-            timestamp=datetime.utcnow().isoformat() + "Z",
-            task=summary.task,
-            status=summary.status,
-            summary_path=summary.run_summary_path,
-        )
-        self.run_history.append(asdict(history_entry))
+        summary.profile_paths = self._stop_profiler()
+        if summary.status == "failed":
+            failed = [action.action for action in summary.actions if not action.succeeded]
+            flight_path = RECORDER.dump(dump_path(self.logger.path.stem))
+            summary.flight_recorder_path = str(flight_path)
+            self.logger.log("flight_recorder", {"path": str(flight_path), "failed_actions": failed})
+        with self.tracer.start("finalize", status=summary.status):
+            if self.tracer.enabled:
+                summary.trace_path = str(self._trace_path())
+            self.logger.log_dataclass("run_summary", summary)
+            summary_path = Path("artifacts") / "run-summary.json"
+            summary_path.parent.mkdir(parents=True, exist_ok=True)
+            summary.run_history_path = str(self.run_history.history_path)
+            summary.run_summary_path = str(summary_path)
+            summary_path.write_text(json.dumps(asdict(summary), indent=2), encoding="utf-8")
+            history_entry = RunHistoryEntry(
+                timestamp=datetime.utcnow().isoformat() + "Z",
+                task=summary.task,
+                status=summary.status,
+                summary_path=summary.run_summary_path,
+            )
+            self.run_history.append(asdict(history_entry))
+            RUNS.inc(status=summary.status)
+            if self.metrics_path is not None:
+                REGISTRY.write_textfile(self.metrics_path)
+        self._end_trace()
+        self.flush()
         return summary
+
+    def _stop_profiler(self) -> dict:
+        if self._profiler is None:
+            return {}
+        profiler, self._profiler = self._profiler, None
+        paths = profiler.stop()
+        self.logger.log("profile", paths)
+        return paths
+
+    def _trace_path(self) -> Path:
+        return Path("artifacts") / "traces" / f"{self.logger.path.stem}.trace.json"
+
+    def _end_trace(self) -> None:
+        """End the run span (closing any phase left open) and write the Chrome trace."""
+        self._run_span.end()
+        if self.tracer.enabled:
+            self.tracer.write_chrome_trace(self._trace_path())
+
+    def flush(self) -> None:
+        """Push buffered log and history lines to disk; called when each run ends."""
+        self.logger.flush()
+        self.run_history.flush()
+
+    def close(self) -> None:
+        """Stop background retention and release the log and history writers."""
+        self.retention.stop()
+        self.logger.close()
+        self.run_history.close()
@@ -0,0 +1,189 @@
+import difflib
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Histogram diff: anchors on the rarest lines shared by both sides. Lines that
+# occur more often than this are never used as anchors (matches git's limit).
+MAX_CHAIN_LENGTH = 64
+# Header used for the missing side of a file creation or deletion.
+DEV_NULL = "/dev/null"
+# Regions without a usable anchor fall back to difflib when they are small.
+FALLBACK_CELLS = 250_000
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def intern_lines(a: Sequence[str], b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    table: Dict[str, int] = {}
+    a_ids = [table.setdefault(line, len(table)) for line in a]
+    b_ids = [table.setdefault(line, len(table)) for line in b]
+    return a_ids, b_ids
+
+
+def _histogram_matches(a: List[int], b: List[int]) -> List[Tuple[int, int, int]]:
+    matches: List[Tuple[int, int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        start = 0
+        while a_lo + start < a_hi and b_lo + start < b_hi and a[a_lo + start] == b[b_lo + start]:
+            start += 1
+        if start:
+            matches.append((a_lo, b_lo, start))
+            a_lo += start
+            b_lo += start
+        end = 0
+        while a_hi - end > a_lo and b_hi - end > b_lo and a[a_hi - end - 1] == b[b_hi - end - 1]:
+            end += 1
+        if end:
+            matches.append((a_hi - end, b_hi - end, end))
+            a_hi -= end
+            b_hi -= end
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        occurrences: Dict[int, List[int]] = {}
+        for index in range(a_lo, a_hi):
+            occurrences.setdefault(a[index], []).append(index)
+
+        best = None
+        best_count = MAX_CHAIN_LENGTH + 1
+        best_length = 0
+        bi = b_lo
+        while bi < b_hi:
+            positions = occurrences.get(b[bi])
+            if not positions or len(positions) > best_count:
+                bi += 1
+                continue
+            next_bi = bi + 1
+            for ai in positions:
+                sa, sb = ai, bi
+                while sa > a_lo and sb > b_lo and a[sa - 1] == b[sb - 1]:
+                    sa -= 1
+                    sb -= 1
+                ea, eb = ai + 1, bi + 1
+                while ea < a_hi and eb < b_hi and a[ea] == b[eb]:
+                    ea += 1
+                    eb += 1
+                length = ea - sa
+                count = len(positions)
+                if count < best_count or (count == best_count and length > best_length):
+                    best = (sa, sb, length)
+                    best_count = count
+                    best_length = length
+                next_bi = max(next_bi, eb)
+            bi = next_bi
+
+        if best is not None:
+            sa, sb, length = best
+            matches.append(best)
+            stack.append((a_lo, sa, b_lo, sb))
+            stack.append((sa + length, a_hi, sb + length, b_hi))
+        elif (a_hi - a_lo) * (b_hi - b_lo) <= FALLBACK_CELLS:
+            matcher = difflib.SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                if size:
+                    matches.append((a_lo + i, b_lo + j, size))
+    matches.sort()
+    return matches
+
+
+def diff_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """Opcodes in difflib.SequenceMatcher.get_opcodes() format."""
+    a_ids, b_ids = intern_lines(a, b)
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for ai, bj, size in _histogram_matches(a_ids, b_ids) + [(len(a), len(b), 0)]:
+        if i < ai and j < bj:
+            opcodes.append(("replace", i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(("delete", i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(("insert", i, ai, j, bj))
+        if size:
+            if opcodes and opcodes[-1][0] == "equal":
+                tag, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(("equal", i1, ai + size, j1, bj + size))
+            else:
+                opcodes.append(("equal", ai, ai + size, bj, bj + size))
+        i, j = ai + size, bj + size
+    return opcodes
+
+
+def _grouped_opcodes(codes: List[Opcode], n: int) -> Iterator[List[Opcode]]:
+    codes = list(codes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    nn = n + n
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > nn:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff(
+    a: Sequence[str],
+    b: Sequence[str],
+    fromfile: str = "",
+    tofile: str = "",
+    n: int = 3,
+    lineterm: str = "\n",
+) -> Iterator[str]:
+    """Drop-in replacement for difflib.unified_diff using histogram diff.
+
+    Lines are interned to integer ids and a common prefix/suffix is trimmed
+    before anchoring, so large, mostly-unchanged files diff in near-linear time.
+    """
+    started = False
+    for group in _grouped_opcodes(diff_opcodes(a, b), n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}{lineterm}"
+            yield f"+++ {tofile}{lineterm}"
+        first, last = group[0], group[-1]
+        file1 = _format_range(first[1], last[2])
+        file2 = _format_range(first[3], last[4])
+        yield f"@@ -{file1} +{file2} @@{lineterm}"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in {"replace", "delete"}:
+                for line in a[i1:i2]:
+                    yield "-" + line
+            if tag in {"replace", "insert"}:
+                for line in b[j1:j2]:
+                    yield "+" + line
+
+
+def file_diff(old: Optional[str], new: Optional[str], fromfile: str, tofile: str) -> List[str]:
+    """Diff lines for one file section; None means the file does not exist on that side."""
+    return list(
+        unified_diff(
+            [] if old is None else old.splitlines(),
+            [] if new is None else new.splitlines(),
+            fromfile=DEV_NULL if old is None else fromfile,
+            tofile=DEV_NULL if new is None else tofile,
+            lineterm="",
+        )
+    )
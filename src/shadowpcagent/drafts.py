@@ -1,22 +1,53 @@
-from dataclasses import dataclass
-from datetime import datetime
+import hashlib
+import json
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from shadowpcagent.fileio import file_lock, write_files_atomically
+from shadowpcagent.patcher import SnapshotCache, UnifiedDiffApplier
+
+# Drafts written before the content-addressed store; still listed and collected.
+DRAFT_GLOB = "draft-*.patch"
+OBJECT_SUFFIX = ".patch.z"
+INDEX_NAME = "index.jsonl"
 
 
 @dataclass
 class DraftResult:
     path: Path
     diff: str
+    digest: str = ""
+    deduplicated: bool = False
+
+
+@dataclass
+class DraftStatus:
+    path: Path
+    status: str
+    targets: List[str] = field(default_factory=list)
+    detail: str = ""
+
+
+@dataclass
+class DraftGcResult:
+    removed: List[Path] = field(default_factory=list)
+    kept: int = 0
+    freed_bytes: int = 0
 
 
 class DraftManager:
-    def __init__(self, draft_dir: Path) -> None:
+    def __init__(self, draft_dir: Path, run_id: Optional[str] = None) -> None:
         self.draft_dir = draft_dir
         self.draft_dir.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+        self.index_path = self.draft_dir / INDEX_NAME
 
-    def write_note(self, note: str) -> DraftResult:
-        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-        path = self.draft_dir / f"draft-note-{timestamp}.patch"
+    def write_note(self, note: str, task: Optional[str] = None) -> DraftResult:
         diff = "\n".join(
             [
                 "--- draft/note.txt",
@@ -26,11 +57,148 @@ class DraftManager:
                 "+Status: Draft only (not applied).",
             ]
         )
-        path.write_text(diff, encoding="utf-8")
-        return DraftResult(path=path, diff=diff)
-
-    def write_diff(self, diff: str) -> DraftResult:
-        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-        path = self.draft_dir / f"draft-change-{timestamp}.patch"
-        path.write_text(diff, encoding="utf-8")
-        return DraftResult(path=path, diff=diff)
+        return self._store(diff, kind="note", task=task)
+
+    def write_diff(self, diff: str, task: Optional[str] = None) -> DraftResult:
+        return self._store(diff, kind="change", task=task)
+
+    def object_path(self, digest: str) -> Path:
+        return self.draft_dir / "objects" / digest[:2] / f"{digest}{OBJECT_SUFFIX}"
+
+    def _store(self, diff: str, kind: str, task: Optional[str]) -> DraftResult:
+        data = diff.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        deduplicated = path.exists()
+        if not deduplicated:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_files_atomically({path: zlib.compress(data, 6)})
+        record = {
+            "digest": digest,
+            "kind": kind,
+            "run": self.run_id,
+            "task": task,
+            "targets": list(dict.fromkeys(patch.target for patch in UnifiedDiffApplier().parse(diff))),
+            "size": len(data),
+            "stored_size": path.stat().st_size,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+        }
+        # gc() rewrites the index; the lock keeps this append out of that window.
+        with file_lock(self.index_path), self.index_path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record) + "\n")
+        return DraftResult(path=path, diff=diff, digest=digest, deduplicated=deduplicated)
+
+    def read(self, path: Path) -> str:
+        """Draft text for a store object or any plain patch file."""
+        if path.name.endswith(OBJECT_SUFFIX):
+            return zlib.decompress(path.read_bytes()).decode("utf-8")
+        return path.read_text(encoding="utf-8")
+
+    def index(self) -> List[dict]:
+        if not self.index_path.exists():
+            return []
+        with self.index_path.open("r", encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+
+    def list_drafts(self) -> List[Path]:
+        stored = {record["digest"]: self.object_path(record["digest"]) for record in self.index()}
+        objects = [path for path in stored.values() if path.exists()]
+        return sorted(self.draft_dir.glob(DRAFT_GLOB)) + objects
+
+    def gc(
+        self,
+        max_age: Optional[timedelta] = None,
+        max_count: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> DraftGcResult:
+        """Keep the most recently written drafts that fit every budget; delete the rest.
+
+        Drafts written at the same timestamp are ordered by their position in
+        the index, later entries counting as newer.
+        """
+        with file_lock(self.index_path):
+            return self._gc(max_age, max_count, max_bytes, now or datetime.utcnow())
+
+    def _gc(
+        self,
+        max_age: Optional[timedelta],
+        max_count: Optional[int],
+        max_bytes: Optional[int],
+        now: datetime,
+    ) -> DraftGcResult:
+        records = self.index()
+        last_written: Dict[Path, Tuple[datetime, int]] = {}
+        for position, record in enumerate(records):
+            written = datetime.fromisoformat(record["timestamp"].rstrip("Z"))
+            path = self.object_path(record["digest"])
+            last_written[path] = max((written, position), last_written.get(path, (written, position)))
+        for path in self.draft_dir.glob(DRAFT_GLOB):
+            last_written[path] = (datetime.utcfromtimestamp(path.stat().st_mtime), -1)
+
+        result = DraftGcResult()
+        kept_bytes = 0
+        for path, (written, _) in sorted(last_written.items(), key=lambda item: item[1], reverse=True):
+            if not path.exists():
+                continue
+            size = path.stat().st_size
+            keep = (
+                (max_age is None or now - written <= max_age)
+                and (max_count is None or result.kept < max_count)
+                and (max_bytes is None or kept_bytes + size <= max_bytes)
+            )
+            if keep:
+                result.kept += 1
+                kept_bytes += size
+                continue
+            path.unlink()
+            result.removed.append(path)
+            result.freed_bytes += size
+
+        if result.removed:
+            removed = set(result.removed)
+            survivors = [r for r in records if self.object_path(r["digest"]) not in removed]
+            write_files_atomically(
+                {self.index_path: "".join(json.dumps(r) + "\n" for r in survivors)}
+            )
+            for directory in {path.parent for path in removed}:
+                if directory.parent.name == "objects" and not any(directory.iterdir()):
+                    os.rmdir(directory)
+        return result
+
+    def triage(
+        self,
+        repo_root: Path,
+        drafts: Optional[List[Path]] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[DraftStatus]:
+        drafts = self.list_drafts() if drafts is None else drafts
+        cache = SnapshotCache()
+        applier = UnifiedDiffApplier(max_workers=1, reader=cache.read)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda draft: self._triage_one(applier, draft, repo_root), drafts))
+
+    def _triage_one(self, applier: UnifiedDiffApplier, draft: Path, repo_root: Path) -> DraftStatus:
+        try:
+            file_patches = applier.parse(self.read(draft))
+        except (OSError, UnicodeDecodeError, ValueError, IndexError, zlib.error) as exc:
+            return DraftStatus(path=draft, status="conflicts", detail=f"Unreadable draft: {exc}")
+        targets = [patch.target for patch in file_patches]
+        if not file_patches:
+            return DraftStatus(path=draft, status="conflicts", detail="No target path found in diff.")
+        try:
+            result = applier.plan_patches(file_patches, repo_root).result
+        except UnicodeDecodeError as exc:
+            return DraftStatus(path=draft, status="conflicts", targets=targets, detail=str(exc))
+        if result.validated:
+            detail = "clean"
+            if result.offset or result.fuzz:
+                detail = f"offset up to {result.offset} lines, fuzz {result.fuzz}"
+            return DraftStatus(path=draft, status="applies", targets=targets, detail=detail)
+        reverse = applier.plan_patches([patch.reversed() for patch in file_patches], repo_root).result
+        if reverse.validated:
+            return DraftStatus(path=draft, status="stale", targets=targets, detail="Already applied.")
+        missing = [f for f in result.files if f.error == "Target file does not exist."]
+        if result.files and len(missing) == len(result.files):
+            return DraftStatus(path=draft, status="stale", targets=targets, detail="Target files no longer exist.")
+        return DraftStatus(path=draft, status="conflicts", targets=targets, detail=result.error or "")
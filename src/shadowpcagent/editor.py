@@ -1,8 +1,19 @@
-from dataclasses import dataclass
+import fnmatch
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-import difflib
+from shadowpcagent.diffing import unified_diff
+from shadowpcagent.fileio import write_files_atomically
+from shadowpcagent.journal import UndoJournal
+from shadowpcagent.repostate import find_repo
+from shadowpcagent.tools.shadow_search.index import DEFAULT_DB_PATH, DEFAULT_IGNORE_DIRS
+from shadowpcagent.workspace import OverlayWorkspace
 
 
 @dataclass
@@ -22,42 +33,364 @@ class EditResult:
     error: Optional[str] = None
 
 
+@dataclass
+class BatchEditResult:
+    results: List[EditResult]
+    diff: str
+    applied: bool
+    changed: bool
+    error: Optional[str] = None
+
+
+@dataclass
+class CodemodRequest:
+    root: Path
+    pattern: str
+    replacement: str
+    path_glob: str = "**/*"
+    regex: bool = False
+    apply: bool = False
+    index_db_path: Optional[Path] = None
+    # Base for diff headers; defaults to the git work tree containing root.
+    repo_root: Optional[Path] = None
+
+
+@dataclass
+class CodemodFileResult:
+    path: Path
+    matches: int
+    seconds: float
+    error: Optional[str] = None
+
+
+@dataclass
+class CodemodResult:
+    diff: str
+    applied: bool
+    changed: bool
+    candidates: int
+    seconds: float
+    files: List[CodemodFileResult] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def _glob_matches(rel_path: str, path_glob: str) -> bool:
+    if fnmatch.fnmatchcase(rel_path, path_glob):
+        return True
+    return path_glob.startswith("**/") and fnmatch.fnmatchcase(rel_path, path_glob[3:])
+
+
+def _codemod_file(
+    path: str,
+    rel_path: str,
+    pattern: str,
+    replacement: str,
+    regex: bool,
+    data: Optional[bytes] = None,
+) -> Tuple[str, int, Optional[bytes], str, float, Optional[str]]:
+    started = time.perf_counter()
+    if data is None:
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+        except OSError as exc:
+            return path, 0, None, "", time.perf_counter() - started, str(exc)
+    if regex and data.isascii():
+        try:
+            found = re.search(pattern.encode("utf-8"), data) is not None
+        except re.error:
+            found = True
+    else:
+        found = regex or pattern.encode("utf-8") in data
+    if not found:
+        return path, 0, None, "", time.perf_counter() - started, None
+    try:
+        original = data.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        if regex and not _bytes_match(pattern, data):
+            # Binary file the regex prefilter could not rule out.
+            return path, 0, None, "", time.perf_counter() - started, None
+        return path, 0, None, "", time.perf_counter() - started, str(exc)
+    if regex:
+        updated, matches = re.subn(pattern, replacement, original)
+    else:
+        matches = original.count(pattern)
+        updated = original.replace(pattern, replacement)
+    diff = "\n".join(
+        unified_diff(
+            original.splitlines(),
+            updated.splitlines(),
+            fromfile=rel_path,
+            tofile=rel_path,
+            lineterm="",
+        )
+    )
+    # Re-encoded bytes keep the file's own line endings when written back.
+    new_data = updated.encode("utf-8") if updated != original else None
+    return path, matches, new_data, diff, time.perf_counter() - started, None
+
+
+def _bytes_match(pattern: str, data: bytes) -> bool:
+    try:
+        return re.search(pattern.encode("utf-8"), data) is not None
+    except re.error:
+        return True
+
+
+def _codemod_batch(
+    batch: List[Tuple[str, str]], pattern: str, replacement: str, regex: bool
+) -> List[Tuple[str, int, Optional[bytes], str, float, Optional[str]]]:
+    return [_codemod_file(path, rel, pattern, replacement, regex) for path, rel in batch]
+
+
 class FileEditor:
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        parallel_threshold: int = 64,
+        workspace: Optional[OverlayWorkspace] = None,
+        journal: Optional[UndoJournal] = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        self.workspace = workspace
+        self.journal = journal
+
+    def _read_text(self, path: Path) -> Optional[str]:
+        if self.workspace is not None:
+            return self.workspace.read_text(path)
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def _commit(self, updates: Dict[Path, Union[str, bytes]], source: str) -> None:
+        if self.workspace is None:
+            preimages = write_files_atomically(updates)
+            if self.journal is not None:
+                self.journal.record(source, preimages)
+            return
+        for path, text in updates.items():
+            self.workspace.write_text(path, text.decode("utf-8") if isinstance(text, bytes) else text)
+
     def apply_edit(self, request: EditRequest) -> EditResult:
-        if not request.path.exists():
-            return EditResult(
-                path=request.path,
-                diff="",
-                applied=False,
-                changed=False,
-                error="File not found.",
+        return self.apply_batch([request]).results[0]
+
+    def apply_batch(self, requests: List[EditRequest]) -> BatchEditResult:
+        contents: Dict[Path, str] = {}
+        originals: Dict[Path, str] = {}
+        results: List[EditResult] = []
+        for request in requests:
+            if request.path not in contents:
+                original = self._read_text(request.path)
+                if original is None:
+                    results.append(
+                        EditResult(
+                            path=request.path,
+                            diff="",
+                            applied=False,
+                            changed=False,
+                            error="File not found.",
+                        )
+                    )
+                    continue
+                originals[request.path] = original
+                contents[request.path] = original
+            before = contents[request.path]
+            after = before.replace(request.find_text, request.replace_text)
+            contents[request.path] = after
+            results.append(
+                EditResult(
+                    path=request.path,
+                    diff=self._diff(request.path, before, after),
+                    applied=False,
+                    changed=before != after,
+                )
             )
 
-        original = request.path.read_text(encoding="utf-8")
-        updated = original.replace(request.find_text, request.replace_text)
+        updates = {path: text for path, text in contents.items() if text != originals[path]}
         diff = "\n".join(
-            difflib.unified_diff(
+            self._diff(path, originals[path], text) for path, text in updates.items()
+        )
+        error = next((result.error for result in results if result.error), None)
+        apply = bool(requests) and all(request.apply for request in requests)
+        if not apply or not updates or error:
+            return BatchEditResult(
+                results=results, diff=diff, applied=False, changed=bool(updates), error=error
+            )
+
+        try:
+            self._commit(updates, "edit")
+        except OSError as exc:
+            message = f"Batch write failed and was rolled back: {exc}"
+            for result in results:
+                result.error = message
+            return BatchEditResult(
+                results=results, diff=diff, applied=False, changed=True, error=message
+            )
+        for result in results:
+            result.applied = result.changed
+        return BatchEditResult(results=results, diff=diff, applied=True, changed=True)
+
+    def _diff(self, path: Path, original: str, updated: str) -> str:
+        return "\n".join(
+            unified_diff(
                 original.splitlines(),
                 updated.splitlines(),
-                fromfile=str(request.path),
-                tofile=str(request.path),
+                fromfile=str(path),
+                tofile=str(path),
                 lineterm="",
             )
         )
 
-        changed = original != updated
-        if request.apply and changed:
-            request.path.write_text(updated, encoding="utf-8")
-            return EditResult(
-                path=request.path,
-                diff=diff,
-                applied=True,
-                changed=True,
+    def apply_codemod(
+        self, request: CodemodRequest, approve: Optional[Callable[[List[Path]], bool]] = None
+    ) -> CodemodResult:
+        """Rewrite matching files; with ``request.apply`` they are written only if
+        ``approve`` (given the paths about to change) returns True or is None."""
+        started = time.perf_counter()
+        if request.regex:
+            try:
+                re.compile(request.pattern)
+            except re.error as exc:
+                return CodemodResult(
+                    diff="",
+                    applied=False,
+                    changed=False,
+                    candidates=0,
+                    seconds=0.0,
+                    error=f"Invalid pattern: {exc}",
+                )
+        candidates = self._codemod_candidates(request)
+        outcomes = self._run_codemod(candidates, request)
+
+        files: List[CodemodFileResult] = []
+        diffs: List[str] = []
+        updates: List[Tuple[Path, bytes]] = []
+        for path, matches, new_data, diff, seconds, error in outcomes:
+            if not matches and error is None:
+                continue
+            files.append(
+                CodemodFileResult(path=Path(path), matches=matches, seconds=round(seconds, 6), error=error)
             )
+            if new_data is not None:
+                diffs.append(diff)
+                updates.append((Path(path), new_data))
 
-        return EditResult(
-            path=request.path,
-            diff=diff,
-            applied=False,
+        changed = bool(updates)
+        failed = [f for f in files if f.error is not None]
+        if failed:
+            # Like apply_batch: a codemod is written completely or not at all.
+            return CodemodResult(
+                diff="\n".join(diffs),
+                applied=False,
+                changed=changed,
+                candidates=len(candidates),
+                seconds=round(time.perf_counter() - started, 6),
+                files=files,
+                error=f"{len(failed)} file(s) failed; first: {failed[0].path}: {failed[0].error}",
+            )
+        write = request.apply and changed and (approve is None or approve([path for path, _ in updates]))
+        if write:
+            try:
+                self._commit(dict(updates), "codemod")
+            except OSError as exc:
+                return CodemodResult(
+                    diff="\n".join(diffs),
+                    applied=False,
+                    changed=changed,
+                    candidates=len(candidates),
+                    seconds=round(time.perf_counter() - started, 6),
+                    files=files,
+                    error=f"Codemod write failed and was rolled back: {exc}",
+                )
+        return CodemodResult(
+            diff="\n".join(diffs),
+            applied=write,
             changed=changed,
+            candidates=len(candidates),
+            seconds=round(time.perf_counter() - started, 6),
+            files=files,
         )
+
+    def _run_codemod(
+        self, candidates: List[Tuple[str, str]], request: CodemodRequest
+    ) -> List[Tuple[str, int, Optional[bytes], str, float, Optional[str]]]:
+        args = (request.pattern, request.replacement, request.regex)
+        if self.workspace is not None:
+            # Overlay contents live in this process, so the workspace path runs inline.
+            return [
+                _codemod_file(path, rel, *args, data=self.workspace.read_bytes(Path(path)) or b"")
+                for path, rel in candidates
+                if self.workspace.exists(Path(path))
+            ]
+        if len(candidates) < self.parallel_threshold:
+            return _codemod_batch(candidates, *args)
+        size = max(16, len(candidates) // ((os.cpu_count() or 1) * 4))
+        batches = [candidates[i : i + size] for i in range(0, len(candidates), size)]
+        outcomes = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(_codemod_batch, batch, *args) for batch in batches]
+            for future in futures:
+                outcomes.extend(future.result())
+        return outcomes
+
+    def _codemod_candidates(self, request: CodemodRequest) -> List[Tuple[str, str]]:
+        """(absolute path, path for diff headers) of every file under root matching path_glob."""
+        root = request.root.resolve()
+        prefix = str(root) + os.sep
+        repo = find_repo(root)
+        header_root = (request.repo_root or (repo[0] if repo else root)).resolve()
+        db_path = Path(request.index_db_path or DEFAULT_DB_PATH)
+        paths = _indexed_paths(db_path, root) if db_path.exists() else None
+        if not paths:
+            paths = []
+            for dirpath, dirnames, filenames in os.walk(str(root)):
+                dirnames[:] = [d for d in dirnames if d not in DEFAULT_IGNORE_DIRS]
+                paths.extend(os.path.join(dirpath, name) for name in filenames)
+        if self.workspace is not None:
+            staged = [str(path) for path in self.workspace.changes()]
+            paths.extend(path for path in staged if path.startswith(prefix))
+        candidates: List[Tuple[str, str]] = []
+        for path in sorted(set(paths)):
+            rel_path = path[len(prefix) :].replace(os.sep, "/")
+            if _glob_matches(rel_path, request.path_glob):
+                candidates.append((path, os.path.relpath(path, header_root).replace(os.sep, "/")))
+        return candidates
+
+
+def _indexed_paths(db_path: Path, root: Path) -> Optional[List[str]]:
+    """Files under ``root`` from the shadow_search index, or None when it is stale.
+
+    The index is stale if an indexed file is gone or any directory on the
+    way to an indexed file changed (files added, removed or renamed) after
+    the index was last written.
+    """
+    prefix = str(root) + os.sep
+    written = max(_mtime_ns(Path(f"{db_path}{suffix}")) for suffix in ("", "-wal"))
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            "SELECT path FROM files WHERE substr(path, 1, ?) = ?;",
+            (len(prefix), prefix),
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    paths = [row[0] for row in rows]
+    directories = {str(root)}
+    for path in paths:
+        parent = os.path.dirname(path)
+        while parent not in directories and parent.startswith(prefix):
+            directories.add(parent)
+            parent = os.path.dirname(parent)
+    if any(_mtime_ns(Path(directory)) > written for directory in directories):
+        return None
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    return paths
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return -1
@@ -1,8 +1,29 @@
-from dataclasses import dataclass
-from subprocess import CompletedProcess, run
-from typing import Iterable
+import asyncio
+import gzip
+import heapq
+import json
+import os
+import queue
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from subprocess import DEVNULL, PIPE, Popen, run
+from typing import IO, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
 
-from shadowpcagent.models import ShellResult
+from shadowpcagent.flight import RECORDER
+from shadowpcagent.metrics import SHELL_CACHE, SHELL_COMMANDS, SHELL_DURATION
+from shadowpcagent.models import ShellBatchResult, ShellResult, TestRunResult
+from shadowpcagent.repostate import index_stat, repo_fingerprint
 
 
 @dataclass
@@ -14,23 +35,591 @@ class Allowlist:
         return base in self.commands
 
 
+OUTPUT_CHUNK = 8192
+_SHELL_OPERATORS = set(";&|<>`$()\n")
+
+
+class OutputBuffer:
+    """Keeps the first ``head_bytes`` and last ``tail_bytes`` of a stream."""
+
+    def __init__(self, head_bytes: int, tail_bytes: int) -> None:
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self._head = bytearray()
+        self._tail: Deque[bytes] = deque()
+        self._tail_size = 0
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+
+    def append(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self._tail.append(data)
+        self._tail_size += len(data)
+        while self._tail_size - len(self._tail[0]) >= self.tail_bytes:
+            self.dropped_bytes += len(self._tail[0])
+            self._tail_size -= len(self._tail.popleft())
+        if self._tail_size > self.tail_bytes:
+            excess = self._tail_size - self.tail_bytes
+            self._tail[0] = self._tail[0][excess:]
+            self._tail_size -= excess
+            self.dropped_bytes += excess
+
+    def text(self) -> str:
+        head = bytes(self._head).decode("utf-8", errors="replace")
+        tail = b"".join(self._tail).decode("utf-8", errors="replace")
+        if self.dropped_bytes:
+            return f"{head}\n... [{self.dropped_bytes} bytes truncated] ...\n{tail}"
+        return head + tail
+
+
+def _pump(stream_name: str, pipe: IO[bytes], sink: "queue.Queue[Tuple[str, Optional[bytes]]]") -> None:
+    try:
+        for chunk in iter(lambda: pipe.readline(OUTPUT_CHUNK), b""):
+            sink.put((stream_name, chunk))
+    finally:
+        pipe.close()
+        sink.put((stream_name, None))
+
+
+def _new_process_group() -> dict:
+    if os.name == "posix":
+        return {"start_new_session": True}
+    return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def _kill_process_group(proc: Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], check=False, capture_output=True)
+    except (OSError, ProcessLookupError):
+        pass
+    if proc.poll() is None:
+        proc.kill()
+
+
 class ShellExecutor:
-    def __init__(self, allowlist: Iterable[str]) -> None:
+    """Runs allowlisted commands while streaming their output.
+
+    - stdout/stderr are read incrementally; only a head and tail of each is
+      kept in memory
+    - with ``output_dir`` the full interleaved output is spilled to a gzip
+      file, which is kept only when something was truncated
+    - ``timeout`` (wall clock) and ``idle_timeout`` (no output) kill the
+      whole process group
+    - ``on_progress`` receives at most one line per ``progress_interval``
+    - commands matching ``pure_commands`` (opt-in, no shell operators) are
+      cached per repo-state fingerprint plus the stat of every path named in
+      their arguments (so ``ls build`` sees entries added to an untracked
+      ``build/``; deeper changes under it are not noticed); hits come back
+      with ``cached=True``
+    - the fingerprint stats every tracked file, so it is memoised per
+      directory until invalidate() or a non-pure command runs; callers that
+      change the tree themselves (the orchestrator) must invalidate()
+    - setting the optional ``cancel`` event kills the running process group;
+      the result comes back with ``cancelled=True``
+    - safe to call from several threads at once (CommandPool does)
+    """
+
+    def __init__(
+        self,
+        allowlist: Iterable[str],
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        head_bytes: int = 64 * 1024,
+        tail_bytes: int = 64 * 1024,
+        output_dir: Optional[Path] = None,
+        on_progress: Optional[Callable[[dict], None]] = None,
+        progress_interval: float = 1.0,
+        pure_commands: Iterable[str] = (),
+        cache_size: int = 256,
+    ) -> None:
         self.allowlist = Allowlist(commands=set(allowlist))
+        self.pure_commands = {" ".join(command.split()) for command in pure_commands}
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], ShellResult]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._fingerprints: Dict[Path, Optional[str]] = {}
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.output_dir = output_dir
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
 
-    def run(self, command: str) -> ShellResult:
+    def is_pure(self, command: str) -> bool:
+        if any(char in command for char in _SHELL_OPERATORS):
+            return False
+        normalized = " ".join(command.split())
+        return any(normalized == pure or normalized.startswith(pure + " ") for pure in self.pure_commands)
+
+    def run(
+        self, command: str, cancel: Optional[threading.Event] = None, cwd: Optional[Path] = None
+    ) -> ShellResult:
         if not self.allowlist.allows(command):
             raise ValueError(f"Command not allowlisted: {command}")
-        completed: CompletedProcess[str] = run(
+        if not self.is_pure(command):
+            try:
+                return self._execute(command, cancel, cwd)
+            finally:
+                self.invalidate()
+        started = time.perf_counter()
+        base = (cwd or Path.cwd()).resolve()
+        state = self._cache_state(command, base)
+        if state is None:
+            return self._execute(command, cancel, cwd)
+        with self._cache_lock:
+            hit = self._cache.get((command, state))
+            if hit is not None:
+                self._cache.move_to_end((command, state))
+        if hit is not None:
+            SHELL_CACHE.inc(result="hit")
+            RECORDER.record("shell", "cache_hit", {"command": command, "state": state})
+            return replace(hit, cached=True, duration=round(time.perf_counter() - started, 6))
+        SHELL_CACHE.inc(result="miss")
+        index_before = index_stat(base)
+        result = self._execute(command, cancel, cwd)
+        if result.returncode == 0 and not result.timed_out and not result.cancelled:
+            keys = {(command, state)}
+            if index_stat(base) != index_before:
+                # Pure commands may still refresh the index (git status does), so
+                # the result is valid for the state after the run as well.
+                with self._cache_lock:
+                    self._fingerprints.pop(base, None)
+                keys.add((command, self._cache_state(command, base) or state))
+            with self._cache_lock:
+                for key in keys:
+                    self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def invalidate(self) -> None:
+        """Forget memoised repo fingerprints; the working tree may have changed."""
+        with self._cache_lock:
+            self._fingerprints.clear()
+
+    def _cache_state(self, command: str, base: Path) -> Optional[str]:
+        with self._cache_lock:
+            known = base in self._fingerprints
+            fingerprint = self._fingerprints.get(base)
+        if not known:
+            fingerprint = repo_fingerprint(base)
+            with self._cache_lock:
+                self._fingerprints[base] = fingerprint
+        if fingerprint is None:
+            return None
+        return "|".join([fingerprint, str(base), *_arg_stats(command, base)])
+
+    def _execute(
+        self, command: str, cancel: Optional[threading.Event] = None, cwd: Optional[Path] = None
+    ) -> ShellResult:
+        RECORDER.record("shell", "start", {"command": command})
+        started = time.perf_counter()
+        proc = Popen(
             command,
             shell=True,
-            check=False,
-            capture_output=True,
-            text=True,
+            cwd=str(cwd) if cwd is not None else None,
+            stdin=DEVNULL,
+            stdout=PIPE,
+            stderr=PIPE,
+            **_new_process_group(),
+        )
+        buffers = {
+            "stdout": OutputBuffer(self.head_bytes, self.tail_bytes),
+            "stderr": OutputBuffer(self.head_bytes, self.tail_bytes),
+        }
+        chunks: "queue.Queue[Tuple[str, Optional[bytes]]]" = queue.Queue()
+        readers = [
+            threading.Thread(target=_pump, args=(name, pipe, chunks), name=f"shell-{name}", daemon=True)
+            for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr))
+        ]
+        for reader in readers:
+            reader.start()
+
+        spill_path = None
+        spill = None
+        if self.output_dir is not None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            spill_path = self.output_dir / f"shell-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')}.log.gz"
+            spill = gzip.open(spill_path, "wb")
+
+        timed_out = None
+        cancelled = False
+        open_streams = len(readers)
+        last_output = started
+        last_progress = 0.0
+        lines = 0
+        try:
+            while open_streams:
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                    _kill_process_group(proc)
+                    break
+                now = time.perf_counter()
+                waits = [0.5 if cancel is None else 0.05]
+                if self.timeout is not None:
+                    waits.append(started + self.timeout - now)
+                if self.idle_timeout is not None:
+                    waits.append(last_output + self.idle_timeout - now)
+                try:
+                    name, chunk = chunks.get(timeout=max(0.0, min(waits)))
+                except queue.Empty:
+                    now = time.perf_counter()
+                    if self.timeout is not None and now - started >= self.timeout:
+                        timed_out = "wall"
+                    elif self.idle_timeout is not None and now - last_output >= self.idle_timeout:
+                        timed_out = "idle"
+                    if timed_out:
+                        _kill_process_group(proc)
+                        break
+                    continue
+                if chunk is None:
+                    open_streams -= 1
+                    continue
+                last_output = time.perf_counter()
+                buffers[name].append(chunk)
+                if spill is not None:
+                    spill.write(chunk)
+                lines += 1
+                if self.on_progress is not None and last_output - last_progress >= self.progress_interval:
+                    last_progress = last_output
+                    self.on_progress(
+                        {
+                            "command": command,
+                            "stream": name,
+                            "line": chunk.decode("utf-8", errors="replace").rstrip(),
+                            "lines": lines,
+                            "elapsed": round(last_output - started, 3),
+                        }
+                    )
+            returncode = proc.wait()
+        finally:
+            if proc.poll() is None:
+                _kill_process_group(proc)
+                proc.wait()
+            for reader in readers:
+                reader.join(timeout=1.0)
+            if spill is not None:
+                spill.close()
+
+        truncated = sum(buffer.dropped_bytes for buffer in buffers.values())
+        if spill_path is not None and not truncated:
+            spill_path.unlink()
+            spill_path = None
+        duration = time.perf_counter() - started
+        SHELL_DURATION.observe(duration)
+        SHELL_COMMANDS.inc(exit_code=returncode)
+        stdout = buffers["stdout"].text()
+        stderr = buffers["stderr"].text()
+        if timed_out:
+            limit = self.timeout if timed_out == "wall" else self.idle_timeout
+            stderr = (stderr + f"\n[{timed_out} timeout after {limit}s; process group killed]").strip()
+        if cancelled:
+            stderr = (stderr + "\n[cancelled; process group killed]").strip()
+        RECORDER.record(
+            "shell",
+            "exit",
+            {
+                "command": command,
+                "returncode": returncode,
+                "duration": duration,
+                "timed_out": timed_out,
+                "cancelled": cancelled,
+                "stdout_tail": stdout[-2000:],
+                "stderr_tail": stderr[-2000:],
+            },
         )
         return ShellResult(
             command=command,
-            returncode=completed.returncode,
-            stdout=completed.stdout.strip(),
-            stderr=completed.stderr.strip(),
+            returncode=returncode,
+            stdout=stdout.strip(),
+            stderr=stderr.strip(),
+            duration=round(duration, 6),
+            timed_out=timed_out,
+            cancelled=cancelled,
+            output_path=str(spill_path) if spill_path else None,
+            output_bytes=sum(buffer.total_bytes for buffer in buffers.values()),
+            truncated_bytes=truncated,
+        )
+
+
+def _arg_stats(command: str, base: Path) -> List[str]:
+    # Arguments naming paths: a directory's mtime changes when entries are
+    # added or removed, which the repo fingerprint misses for untracked dirs.
+    stats = []
+    for arg in command.split()[1:]:
+        if arg.startswith("-"):
+            continue
+        try:
+            stat = os.stat(os.path.join(base, arg))
+        except (OSError, ValueError):
+            stats.append(f"{arg}:missing")
+            continue
+        stats.append(f"{arg}:{stat.st_mtime_ns}:{stat.st_size}")
+    return stats
+
+
+class CommandPool:
+    """Runs independent allowlisted commands concurrently through a ShellExecutor.
+
+    Each command runs ``executor.run`` in a worker thread, at most
+    ``max_parallel`` at once, so timeouts, output spilling, progress and the
+    pure-command cache behave exactly as for a single command. With
+    ``fail_fast`` the first non-zero exit cancels everything still queued or
+    running (their process groups are killed); results keep the input order
+    either way.
+    """
+
+    def __init__(self, executor: ShellExecutor, max_parallel: int = 4) -> None:
+        if max_parallel < 1:
+            raise ValueError("max_parallel must be at least 1")
+        self.executor = executor
+        self.max_parallel = max_parallel
+
+    def run(self, commands: Sequence[str], fail_fast: bool = False) -> ShellBatchResult:
+        return asyncio.run(self.run_async(commands, fail_fast=fail_fast))
+
+    async def run_async(self, commands: Sequence[str], fail_fast: bool = False) -> ShellBatchResult:
+        for command in commands:
+            if not self.executor.allowlist.allows(command):
+                raise ValueError(f"Command not allowlisted: {command}")
+        started = time.perf_counter()
+        limit = asyncio.Semaphore(self.max_parallel)
+        cancel = threading.Event()
+        tasks = [asyncio.ensure_future(self._run_one(command, limit, cancel)) for command in commands]
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if fail_fast and not cancel.is_set() and any(
+                not task.result().cancelled and task.result().returncode != 0 for task in done
+            ):
+                # Running commands notice the event and kill their process
+                # groups; queued ones return without starting.
+                cancel.set()
+        return ShellBatchResult(
+            results=[task.result() for task in tasks],
+            duration=round(time.perf_counter() - started, 6),
+            cancelled=cancel.is_set(),
         )
+
+    async def _run_one(self, command: str, limit: asyncio.Semaphore, cancel: threading.Event) -> ShellResult:
+        async with limit:
+            if cancel.is_set():
+                RECORDER.record("shell", "cancelled", {"command": command})
+                return ShellResult(
+                    command=command, returncode=-1, stdout="", stderr="[cancelled by fail-fast]", cancelled=True
+                )
+            return await asyncio.to_thread(self.executor.run, command, cancel)
+
+
+def _command_line(argv: Sequence[str]) -> str:
+    return subprocess.list2cmdline(argv) if os.name == "nt" else shlex.join(argv)
+
+
+def _junit_key(node_id: str) -> tuple[str, str]:
+    parts = node_id.split("::")
+    module = parts[0][: -len(".py")] if parts[0].endswith(".py") else parts[0]
+    classname = ".".join([module.replace("/", ".")] + parts[1:-1])
+    return classname, parts[-1]
+
+
+class TestDurationStore:
+    __test__ = False
+
+    def __init__(self, path: Path, default_seconds: float = 1.0) -> None:
+        self.path = path
+        self.default_seconds = default_seconds
+        self.durations: Dict[str, float] = {}
+        if path.exists():
+            try:
+                self.durations = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                self.durations = {}
+
+    def estimate(self, test_id: str) -> float:
+        return self.durations.get(test_id, self.default_seconds)
+
+    def update(self, durations: Dict[str, float]) -> None:
+        self.durations.update({key: round(value, 4) for key, value in durations.items()})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.durations, sort_keys=True), encoding="utf-8")
+
+
+class ShardedTestExecutor:
+    """Splits collected tests into duration-balanced shards run concurrently.
+
+    - collection and every shard run through ShellExecutor, so ``timeout``,
+      ``idle_timeout`` and output spilling (``output_dir``) apply to each
+    - shard test ids are passed in an ``@file`` (pytest >= 8.2), keeping the
+      command line short however large the suite is
+    - with ``fail_fast`` the first failing shard kills the others
+    """
+
+    __test__ = False
+
+    def __init__(
+        self,
+        allowlist: Iterable[str],
+        durations_path: Path,
+        shards: Optional[int] = None,
+        python: str = sys.executable,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        output_dir: Optional[Path] = None,
+    ) -> None:
+        self.allowlist = Allowlist(commands=set(allowlist))
+        self.durations = TestDurationStore(durations_path)
+        self.shards = shards or os.cpu_count() or 1
+        self.python = python
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.output_dir = output_dir
+        self._pytest = _command_line([python, "-m", "pytest"])
+
+    def _shell(self, output_dir: Optional[Path]) -> ShellExecutor:
+        # run() checks "pytest" against the user's allowlist; this executor
+        # only ever starts our own interpreter.
+        return ShellExecutor(
+            allowlist={self._pytest.split()[0]},
+            timeout=self.timeout,
+            idle_timeout=self.idle_timeout,
+            output_dir=output_dir,
+        )
+
+    def collect(self, repo_root: Path, args: Sequence[str] = ()) -> List[str]:
+        """Test ids pytest would run; raises ValueError if collection fails."""
+        test_ids, collection = self._collect(repo_root, args)
+        if collection.returncode not in (0, 5):
+            raise ValueError(f"Test collection failed (exit {collection.returncode}):\n{collection.stdout}")
+        return test_ids
+
+    def _collect(self, repo_root: Path, args: Sequence[str]) -> Tuple[List[str], ShellResult]:
+        command = f"{self._pytest} {_command_line(['--collect-only', '-q', *args])}"
+        with tempfile.TemporaryDirectory(prefix="shadowpcagent-collect-") as tmp:
+            # A large suite lists more ids than the in-memory head and tail
+            # hold; the spilled full output is kept exactly when that happens.
+            result = self._shell(Path(tmp)).run(command, cwd=repo_root)
+            if result.output_path:
+                with gzip.open(result.output_path, "rt", encoding="utf-8", errors="replace") as spilled:
+                    lines = spilled.read().splitlines()
+            else:
+                lines = result.stdout.splitlines()
+        test_ids = [line.strip() for line in lines if "::" in line]
+        collection = replace(result, command=" ".join(["pytest", "--collect-only", *args]), output_path=None)
+        return test_ids, collection
+
+    def plan_shards(self, test_ids: Sequence[str], shards: int) -> List[List[str]]:
+        shards = max(1, min(shards, len(test_ids)))
+        heap = [(0.0, index) for index in range(shards)]
+        buckets: List[List[str]] = [[] for _ in range(shards)]
+        ordered = sorted(test_ids, key=lambda test_id: -self.durations.estimate(test_id))
+        for test_id in ordered:
+            load, index = heapq.heappop(heap)
+            buckets[index].append(test_id)
+            heapq.heappush(heap, (load + self.durations.estimate(test_id), index))
+        return [sorted(bucket) for bucket in buckets if bucket]
+
+    def run(
+        self,
+        repo_root: Path,
+        args: Sequence[str] = (),
+        fail_fast: bool = False,
+        shards: Optional[int] = None,
+    ) -> TestRunResult:
+        if not self.allowlist.allows("pytest"):
+            raise ValueError("Command not allowlisted: pytest")
+        started = time.monotonic()
+        command = " ".join(["pytest", *args])
+        test_ids, collection = self._collect(repo_root, args)
+        if collection.returncode not in (0, 5):
+            RECORDER.record("tests", "collection_failed", {"command": command, "returncode": collection.returncode})
+            return TestRunResult(
+                command=command,
+                shards=0,
+                returncode=collection.returncode,
+                duration=round(time.monotonic() - started, 3),
+                shard_results=[collection],
+            )
+        plan = self.plan_shards(test_ids, shards or self.shards)
+        if not plan:
+            return TestRunResult(command=command, shards=0, returncode=5)
+
+        with tempfile.TemporaryDirectory(prefix="shadowpcagent-shards-") as tmp:
+            commands: List[str] = []
+            reports: List[Path] = []
+            for index, shard in enumerate(plan):
+                report = Path(tmp) / f"shard-{index}.xml"
+                ids = Path(tmp) / f"shard-{index}.args"
+                ids.write_text("".join(f"{test_id}\n" for test_id in shard), encoding="utf-8")
+                argv = ["-q", f"--junitxml={report}", *(["-x"] if fail_fast else []), f"@{ids}"]
+                commands.append(f"{self._pytest} {_command_line(argv)}")
+                reports.append(report)
+
+            RECORDER.record("tests", "shards_started", {"command": command, "shards": [len(s) for s in plan]})
+            shell = self._shell(self.output_dir)
+            cancel = threading.Event()
+            results: List[Optional[ShellResult]] = [None] * len(plan)
+            with ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix="pytest-shard") as pool:
+                futures = {
+                    pool.submit(shell.run, shard_command, cancel, repo_root): index
+                    for index, shard_command in enumerate(commands)
+                }
+                for future in as_completed(futures):
+                    index = futures[future]
+                    shard_result = results[index] = future.result()
+                    RECORDER.record("tests", "shard_exit", {"shard": index, "returncode": shard_result.returncode})
+                    if fail_fast and shard_result.returncode not in (0, 5) and not shard_result.cancelled:
+                        cancel.set()
+            shard_results = [
+                replace(shard_result, command=f"pytest shard {index + 1}/{len(plan)} ({len(plan[index])} tests)")
+                for index, shard_result in enumerate(results)
+                if shard_result is not None
+            ]
+            result = self._merge(plan, reports, shard_results, command)
+
+        result.cancelled = any(shard.cancelled for shard in shard_results)
+        result.duration = round(time.monotonic() - started, 3)
+        return result
+
+    def _merge(
+        self,
+        plan: List[List[str]],
+        reports: List[Path],
+        shard_results: List[ShellResult],
+        command: str,
+    ) -> TestRunResult:
+        result = TestRunResult(command=command, shards=len(plan), shard_results=shard_results)
+        durations: Dict[str, float] = {}
+        for shard, report in zip(plan, reports):
+            if not report.exists():
+                continue
+            by_key = {_junit_key(test_id): test_id for test_id in shard}
+            for case in ElementTree.parse(report).getroot().iter("testcase"):
+                key = (case.get("classname", ""), case.get("name", ""))
+                test_id = by_key.get(key, "::".join(key))
+                durations[test_id] = float(case.get("time") or 0.0)
+                if case.find("failure") is not None:
+                    result.failed += 1
+                    result.failures.append(test_id)
+                elif case.find("error") is not None:
+                    result.errors += 1
+                    result.failures.append(test_id)
+                elif case.find("skipped") is not None:
+                    result.skipped += 1
+                else:
+                    result.passed += 1
+        self.durations.update(durations)
+        codes = [shard.returncode for shard in shard_results if not shard.cancelled]
+        result.returncode = next((code for code in codes if code not in (0, 5)), 0)
+        if result.returncode == 0 and all(code == 5 for code in codes):
+            result.returncode = 5
+        return result
@@ -0,0 +1,162 @@
+import contextlib
+import os
+import stat
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+def _read_umask() -> int:
+    # os.umask can only be read by setting it; do that once, at import time,
+    # rather than racing other threads on every write.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def _target_mode(path: Path) -> int:
+    """Permission bits for a rewrite of ``path``: its current mode, or the umask default for new files."""
+    try:
+        return stat.S_IMODE(path.stat().st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def _write_temp(path: Path, data: Union[str, bytes], mode: int, suffix: str) -> str:
+    """Temp file next to ``path`` holding ``data`` with ``mode``, flushed to disk."""
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=suffix)
+    try:
+        # mkstemp always creates 0600 files.
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, mode)
+        else:
+            os.chmod(tmp, mode)
+        if isinstance(data, bytes):
+            handle = os.fdopen(fd, "wb")
+        else:
+            handle = os.fdopen(fd, "w", encoding="utf-8")
+        with handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def _fsync_dirs(paths: List[Path]) -> None:
+    if os.name == "nt":
+        return
+    for directory in sorted({path.parent for path in paths}):
+        try:
+            fd = os.open(str(directory), os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _restore(path: Path, original: Optional[bytes], mode: int) -> None:
+    if original is None:
+        if path.exists():
+            path.unlink()
+        return
+    os.replace(_write_temp(path, original, mode, ".undo"), path)
+
+
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Exclusive lock on ``path`` + ".lock", held across threads and processes.
+
+    Used around read-modify-write cycles and appends to shared files that
+    are also rewritten whole (indexes, histories).
+    """
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    # flock() is per open file, so threads of one process also need a mutex.
+    with _THREAD_LOCKS_GUARD:
+        thread_lock = _THREAD_LOCKS.setdefault(str(lock_path.resolve()), threading.Lock())
+    with thread_lock:
+        fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if os.name == "nt":
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+def write_files_atomically(
+    contents: Mapping[Path, Optional[Union[str, bytes]]]
+) -> Dict[Path, Optional[bytes]]:
+    """Write every file or none of them.
+
+    New contents go to fsynced temp files next to their targets, then are
+    swapped in with os.replace. Existing files keep their permission bits and
+    new files get the umask default. A None value deletes the file; bytes are
+    written verbatim. If any step fails, already-replaced
+    files are restored from in-memory backups and the original OSError is
+    re-raised. On success the pre-images are returned (None for new files).
+    """
+    staged: List[Tuple[Path, Optional[str]]] = []
+    backups: Dict[Path, Optional[bytes]] = {}
+    modes: Dict[Path, int] = {}
+    committed: List[Path] = []
+    try:
+        for path, text in contents.items():
+            path = Path(path)
+            backups[path] = path.read_bytes() if path.exists() else None
+            modes[path] = _target_mode(path)
+            if text is None:
+                staged.append((path, None))
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            staged.append((path, _write_temp(path, text, modes[path], ".tmp")))
+
+        for path, tmp in staged:
+            if tmp is None:
+                if path.exists():
+                    path.unlink()
+            else:
+                os.replace(tmp, path)
+            committed.append(path)
+        _fsync_dirs([path for path, _ in staged])
+        return backups
+    except OSError:
+        for path in reversed(committed):
+            try:
+                _restore(path, backups[path], modes[path])
+            except OSError:
+                pass
+        raise
+    finally:
+        for _, tmp in staged:
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
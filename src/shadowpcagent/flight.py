@@ -0,0 +1,113 @@
+import itertools
+import json
+import threading
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from shadowpcagent.fileio import write_files_atomically
+
+DEFAULT_CAPACITY = 4096
+DEFAULT_FLIGHT_DIR = Path("artifacts") / "flight"
+
+
+class FlightRecorder:
+    """Fixed-size ring buffer of recent detailed events, dumped only on failure.
+
+    - slots are preallocated; record() claims one from an atomic counter and
+      overwrites it without locking or serializing anything
+    - payloads are kept by reference and only turned into JSON by dump()
+    - the oldest events are silently overwritten once ``capacity`` is reached
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, enabled: bool = True) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.enabled = enabled
+        self._seq = itertools.count()
+        self._slots: List[List[Any]] = [[-1, 0.0, "", "", "", None] for _ in range(capacity)]
+
+    def record(self, source: str, event: str, payload: Any = None) -> None:
+        if not self.enabled:
+            return
+        seq = next(self._seq)
+        slot = self._slots[seq % self.capacity]
+        slot[0] = -1  # mark as being written so a concurrent snapshot skips it
+        slot[1] = time.time()
+        slot[2] = threading.current_thread().name
+        slot[3] = source
+        slot[4] = event
+        slot[5] = payload
+        slot[0] = seq
+
+    def exception(self, source: str, exc: BaseException) -> None:
+        self.record(
+            source,
+            "exception",
+            {
+                "type": type(exc).__name__,
+                "error": str(exc),
+                "traceback": "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+            },
+        )
+
+    def snapshot(self) -> List[dict]:
+        """Buffered events, oldest first."""
+        slots = sorted((list(slot) for slot in self._slots if slot[0] >= 0), key=lambda slot: slot[0])
+        return [
+            {
+                "seq": seq,
+                "timestamp": timestamp,
+                "thread": thread,
+                "source": source,
+                "event": event,
+                "payload": payload,
+            }
+            for seq, timestamp, thread, source, event, payload in slots
+        ]
+
+    def dump(self, path: Path) -> Path:
+        lines = [json.dumps(record, default=str) for record in self.snapshot()]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_files_atomically({path: "\n".join(lines) + "\n" if lines else ""})
+        return path
+
+    def clear(self) -> None:
+        for slot in self._slots:
+            slot[0] = -1
+            slot[5] = None
+
+
+RECORDER = FlightRecorder()
+
+
+def dump_path(run_id: str, flight_dir: Optional[Path] = None) -> Path:
+    return (flight_dir or DEFAULT_FLIGHT_DIR) / f"{run_id}.jsonl"
+
+
+def recorded(
+    source: str,
+    fn: Callable[[], None],
+    recorder: FlightRecorder = RECORDER,
+    flight_dir: Optional[Path] = None,
+) -> Callable[[], None]:
+    """Wrap a worker so its start, finish and any exception are recorded.
+
+    An exception is dumped to ``<source>-<timestamp>.jsonl`` and re-raised.
+    """
+
+    def worker() -> None:
+        name = getattr(fn, "__qualname__", repr(fn))
+        recorder.record(source, "worker_start", {"worker": name})
+        try:
+            fn()
+        except BaseException as exc:
+            recorder.exception(source, exc)
+            recorder.dump(dump_path(datetime.utcnow().strftime(f"{source}-%Y%m%dT%H%M%S%fZ"), flight_dir))
+            raise
+        recorder.record(source, "worker_done", {"worker": name})
+
+    return worker
@@ -11,6 +11,10 @@ from pathlib import Path
 import tkinter as tk
 from tkinter import scrolledtext
 
+from shadowpcagent.flight import RECORDER, recorded
+from shadowpcagent.journal import UndoJournal
+from shadowpcagent.patcher import UnifiedDiffApplier
+
 
 DEFAULT_MODEL = "huihui_ai/qwen2.5-coder-abliterate:7b"
 LAST_PATCH_PATH: str | None = None
@@ -212,20 +216,21 @@ def start_gui() -> None:
     log_box.pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
 
     def run_in_thread(fn):
-        t = threading.Thread(target=fn, daemon=True)
+        t = threading.Thread(target=recorded("gui", fn), daemon=True)
         t.start()
 
-        p2 = subprocess.run(["git", "apply", str(patch_path)], cwd=target_var.get(), text=True, capture_output=True)
-        if p2.returncode != 0:
+        result = UnifiedDiffApplier(journal=UndoJournal.for_repo(Path(target_var.get()))).apply(patch_path.read_text(encoding="utf-8"), repo_root=Path(target_var.get()))
+        if not result.applied:
             _chat("Shadow", "Patch apply failed.")
-            _log(f"[GIT APPLY FAILED]\n{p2.stderr or ''}{p2.stdout or ''}\n")
+            _log(f"[PATCH APPLY FAILED]\n{result.error or ''}\n")
             return
 
     def _activity(line: str) -> None:
+        RECORDER.record("gui", "activity", line)
         root.after(0, lambda: _append_text(activity_feed, line))
 
         _chat("Shadow", f"Patch applied: {patch_path.name}")
-        _log("[GIT] Patch applied successfully\n")
+        _log("[PATCH] Patch applied successfully\n")
         _set_status("Patch applied")
 
     def _set_diff(text: str) -> None:
@@ -472,28 +477,21 @@ def start_gui() -> None:
         def worker():
             _set_status("Applying patch...")
             _activity(f"[SELF MODIFICATION] Applying patch file {patch_path.name}\n")
-            _log(f"\n[GIT] git apply --check {patch_path}\n")
-            p1 = subprocess.run(["git", "apply", "--check", str(patch_path)], cwd=str(repo_root), text=True, capture_output=True)
-            if p1.returncode != 0:
-                _log("[GIT] Patch check FAILED:\n")
-                if p1.stderr:
-                    _log(p1.stderr + ("\n" if not p1.stderr.endswith("\n") else ""))
-                if p1.stdout:
-                    _log(p1.stdout + ("\n" if not p1.stdout.endswith("\n") else ""))
+            _log(f"\n[PATCH] Validating {patch_path}\n")
+            result = UnifiedDiffApplier(journal=UndoJournal.for_repo(repo_root)).apply(patch_path.read_text(encoding="utf-8"), repo_root=repo_root)
+            if not result.validated:
+                _log("[PATCH] Patch check FAILED:\n")
+                _log(f"{result.error}\n")
                 _set_status("Patch check failed")
                 return
 
-            p2 = subprocess.run(["git", "apply", str(patch_path)], cwd=str(repo_root), text=True, capture_output=True)
-            if p2.returncode != 0:
-                _log("[GIT] Patch apply FAILED:\n")
-                if p2.stderr:
-                    _log(p2.stderr + ("\n" if not p2.stderr.endswith("\n") else ""))
-                if p2.stdout:
-                    _log(p2.stdout + ("\n" if not p2.stdout.endswith("\n") else ""))
+            if not result.applied:
+                _log("[PATCH] Patch apply FAILED (rolled back):\n")
+                _log(f"{result.error}\n")
                 _set_status("Patch apply failed")
                 return
 
-            _log("[GIT] Patch applied successfully.\n")
+            _log(f"[PATCH] Patch applied successfully to {len(result.files)} file(s).\n")
             _set_status("Patch applied successfully")
 
         run_in_thread(worker)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from shadowpcagent.fileio import file_lock, write_files_atomically
+
+DEFAULT_HISTORY_PATH = Path("artifacts") / "run-history.jsonl"
+INDEX_VERSION = 1
+TAIL_BLOCK = 8192
+
+
+def _empty_index() -> Dict[str, Any]:
+    return {
+        "version": INDEX_VERSION,
+        "head": None,
+        "size": 0,
+        "days": {},
+        "stats": {"total": 0, "by_status": {}, "by_task": {}},
+    }
+
+
+class RunHistory:
+    """Reader for run-history.jsonl backed by a small side index.
+
+    The index (``<history>.index.json``) records the byte offset where each
+    UTC day starts and rolling counts by status and task. It is caught up
+    incrementally from the last indexed offset when read, so its cost tracks
+    new records only; the counts stay cumulative across history rotation as
+    long as the index is refreshed before rotating (LogRetention does).
+    """
+
+    def __init__(self, history_path: Path) -> None:
+        self.history_path = history_path
+        self.index_path = history_path.with_name(history_path.name + ".index.json")
+
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return _empty_index()
+        return index if index.get("version") == INDEX_VERSION else _empty_index()
+
+    def refresh(self) -> Dict[str, Any]:
+        # Concurrent refreshes would each add the same new records to the stats.
+        with file_lock(self.index_path):
+            return self._refresh()
+
+    def _refresh(self) -> Dict[str, Any]:
+        index = self._load_index()
+        if not self.history_path.exists():
+            return index
+        with self.history_path.open("rb") as handle:
+            first = handle.readline()
+            head = hashlib.sha1(first).hexdigest() if first.endswith(b"\n") else None
+            size = os.fstat(handle.fileno()).st_size
+            if head != index["head"] or size < index["size"]:
+                # Rotated or rewritten: re-index offsets, keep cumulative stats.
+                index["head"], index["size"], index["days"] = head, 0, {}
+            if size == index["size"]:
+                return index
+            handle.seek(index["size"])
+            offset = index["size"]
+            stats = index["stats"]
+            for raw in handle:
+                if not raw.endswith(b"\n"):
+                    break
+                start = offset
+                offset += len(raw)
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                day = str(record.get("timestamp", ""))[:10]
+                index["days"].setdefault(day, start)
+                status = str(record.get("status", "unknown"))
+                task = str(record.get("task", ""))
+                stats["total"] += 1
+                stats["by_status"][status] = stats["by_status"].get(status, 0) + 1
+                per_task = stats["by_task"].setdefault(task, {"runs": 0, "by_status": {}})
+                per_task["runs"] += 1
+                per_task["by_status"][status] = per_task["by_status"].get(status, 0) + 1
+            index["size"] = offset
+        write_files_atomically({self.index_path: json.dumps(index, separators=(",", ":"))})
+        return index
+
+    def tail(self, limit: int = 20) -> List[dict]:
+        """Last ``limit`` records, newest first, read backward from EOF."""
+        if limit <= 0 or not self.history_path.exists():
+            return []
+        with self.history_path.open("rb") as handle:
+            handle.seek(0, os.SEEK_END)
+            position = handle.tell()
+            buffer = b""
+            while position > 0 and buffer.count(b"\n") <= limit:
+                step = min(TAIL_BLOCK, position)
+                position -= step
+                handle.seek(position)
+                buffer = handle.read(step) + buffer
+        lines = buffer.split(b"\n")
+        if position > 0:
+            lines = lines[1:]  # first piece may be a partial line
+        records: List[dict] = []
+        for raw in reversed(lines):
+            if len(records) == limit:
+                break
+            if not raw.strip():
+                continue
+            try:
+                records.append(json.loads(raw))
+            except ValueError:
+                continue
+        return records
+
+    def since(self, day: str, limit: Optional[int] = None) -> List[dict]:
+        """Records from the first day >= ``day`` (YYYY-MM-DD), oldest first."""
+        index = self.refresh()
+        offsets = [offset for d, offset in index["days"].items() if d >= day]
+        if not offsets:
+            return []
+        records: List[dict] = []
+        with self.history_path.open("rb") as handle:
+            handle.seek(min(offsets))
+            for raw in handle:
+                if limit is not None and len(records) >= limit:
+                    break
+                if raw.strip():
+                    try:
+                        records.append(json.loads(raw))
+                    except ValueError:
+                        continue
+        return records
+
+    def stats(self) -> Dict[str, Any]:
+        return self.refresh()["stats"]
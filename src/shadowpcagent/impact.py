@@ -0,0 +1,151 @@
+import os
+import sqlite3
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from shadowpcagent.editor import CodemodResult, EditResult
+from shadowpcagent.models import PatchResult, TestSelection
+from shadowpcagent.tools.shadow_search.symbols import build_symbol_index
+
+
+# Changes to these files can affect how any test is collected or run.
+GLOBAL_TEST_INPUTS = {
+    "conftest.py",
+    "pyproject.toml",
+    "setup.cfg",
+    "setup.py",
+    "tox.ini",
+    "pytest.ini",
+}
+
+# Relative to the repo being analysed, so selections for different repos
+# never share (or clobber) one symbol database.
+IMPACT_DB_RELPATH = Path("artifacts") / "impact-symbols.sqlite"
+
+
+def is_test_module(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def touched_paths(
+    *results: Union[EditResult, CodemodResult, PatchResult, None]
+) -> List[Path]:
+    """Absolute paths changed by ``results``; relative ones are taken from the CWD."""
+    paths: List[Path] = []
+    for result in results:
+        if isinstance(result, EditResult) and result.changed:
+            paths.append(Path(result.path))
+        elif isinstance(result, CodemodResult) and result.changed:
+            paths.extend(f.path for f in result.files if f.matches and f.error is None)
+        elif isinstance(result, PatchResult) and result.applied:
+            if result.files:
+                paths.extend(Path(f.path) for f in result.files)
+            elif result.path:
+                paths.append(Path(result.path))
+    return [path.resolve() for path in paths]
+
+
+class ImportGraph:
+    def __init__(self, modules: Dict[str, str], edges: Dict[str, Set[str]]) -> None:
+        self.modules = modules
+        self.edges = edges
+        self.reverse: Dict[str, Set[str]] = {}
+        for importer, imported in edges.items():
+            for target in imported:
+                self.reverse.setdefault(target, set()).add(importer)
+
+    @classmethod
+    def load(cls, db_path: Path, root: Path) -> "ImportGraph":
+        prefix = str(root) + os.sep
+        conn = sqlite3.connect(str(db_path))
+        try:
+            rows = conn.execute(
+                "SELECT path, module FROM files WHERE substr(path, 1, ?) = ?;",
+                (len(prefix), prefix),
+            ).fetchall()
+            modules = {module: path for path, module in rows}
+            edges: Dict[str, Set[str]] = {path: set() for path, _ in rows}
+            imports = conn.execute(
+                "SELECT path, module, name FROM imports WHERE substr(path, 1, ?) = ?;",
+                (len(prefix), prefix),
+            ).fetchall()
+        finally:
+            conn.close()
+        for path, module, name in imports:
+            candidates = [f"{module}.{name}", module] if name and module else [module or name]
+            for candidate in candidates:
+                target = modules.get(candidate)
+                if target is not None and target != path:
+                    edges[path].add(target)
+                    break
+        return cls(modules=modules, edges=edges)
+
+    def dependents(self, paths: Iterable[str]) -> Set[str]:
+        seen: Set[str] = set(paths)
+        queue = deque(seen)
+        while queue:
+            current = queue.popleft()
+            for importer in self.reverse.get(current, ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    queue.append(importer)
+        return seen
+
+
+class TestImpactSelector:
+    __test__ = False
+
+    def __init__(self, repo_root: Path, db_path: Optional[Path] = None) -> None:
+        self.repo_root = repo_root.resolve()
+        self.db_path = db_path or self.repo_root / IMPACT_DB_RELPATH
+
+    def refresh(self) -> ImportGraph:
+        build_symbol_index([self.repo_root], db_path=self.db_path)
+        return ImportGraph.load(self.db_path, self.repo_root)
+
+    def select(self, changed: Iterable[Path], graph: Optional[ImportGraph] = None) -> TestSelection:
+        """Tests that import ``changed``; relative paths are taken from repo_root."""
+        graph = graph or self.refresh()
+        changed_abs = sorted({str((self.repo_root / path).resolve()) for path in changed})
+        changed_rel = [self._relative(path) for path in changed_abs]
+        global_inputs = [p for p in changed_rel if os.path.basename(p) in GLOBAL_TEST_INPUTS]
+        if global_inputs:
+            return self._run_all(changed_rel, f"Global test input changed: {global_inputs[0]}")
+        # Data files, templates, non-Python sources and anything else the
+        # import graph cannot map could affect any test.
+        untracked = [
+            p for p, abs_path in zip(changed_rel, changed_abs)
+            if not p.endswith(".py") or abs_path not in graph.edges
+        ]
+        if untracked:
+            return self._run_all(changed_rel, f"File not in import graph: {untracked[0]}")
+
+        impacted = graph.dependents(p for p in changed_abs if p in graph.edges)
+        tests = sorted(self._relative(p) for p in impacted if is_test_module(p))
+        modules = sorted(
+            module for module, path in graph.modules.items() if path in impacted
+        )
+        return TestSelection(
+            changed_paths=changed_rel,
+            impacted_modules=modules,
+            tests=tests,
+            run_all=False,
+            reason=f"{len(tests)} test module(s) depend on {len(changed_rel)} changed file(s)",
+        )
+
+    def _run_all(self, changed_rel: List[str], reason: str) -> TestSelection:
+        return TestSelection(
+            changed_paths=changed_rel,
+            impacted_modules=[],
+            tests=[],
+            run_all=True,
+            reason=reason,
+        )
+
+    def _relative(self, path: str) -> str:
+        try:
+            return Path(path).relative_to(self.repo_root).as_posix()
+        except ValueError:
+            return path
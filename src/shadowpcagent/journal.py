@@ -0,0 +1,181 @@
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+from shadowpcagent.diffing import file_diff
+from shadowpcagent.fileio import write_files_atomically
+
+DEFAULT_JOURNAL_PATH = Path(".shadowpcagent") / "undo-journal.jsonl"
+
+
+@dataclass
+class UndoResult:
+    runs: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+    entries: int = 0
+    error: Optional[str] = None
+
+
+def content_hash(data: Optional[bytes]) -> Optional[str]:
+    return None if data is None else hashlib.sha256(data).hexdigest()
+
+
+def _read(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def new_run_id() -> str:
+    # Microseconds plus a random suffix: two applies in the same second (or
+    # from two processes) must not share a run id, or undo would merge them.
+    return datetime.utcnow().strftime("run-%Y%m%dT%H%M%S%fZ") + f"-{uuid.uuid4().hex[:6]}"
+
+
+def _restore_line_endings(text: str, eol: str, final_newline: bool) -> bytes:
+    lines = text.splitlines()
+    restored = eol.join(lines) + (eol if final_newline and lines else "")
+    return restored.encode("utf-8")
+
+
+class UndoJournal:
+    """Append-only record of applied changes that can be replayed backward.
+
+    Each entry stores, per file, a reverse diff (post-image -> pre-image) and
+    the content hashes of both images; undo() refuses to touch a file whose
+    current hash is not the recorded post-image.
+    """
+
+    def __init__(self, path: Path = DEFAULT_JOURNAL_PATH, run_id: Optional[str] = None) -> None:
+        self.path = path
+        self.run_id = run_id or new_run_id()
+
+    @classmethod
+    def for_repo(cls, repo_root: Path, run_id: Optional[str] = None) -> "UndoJournal":
+        """Journal kept inside ``repo_root`` rather than relative to the CWD."""
+        return cls(Path(repo_root).resolve() / DEFAULT_JOURNAL_PATH, run_id=run_id)
+
+    def record(self, source: str, preimages: Mapping[Path, Optional[bytes]]) -> Optional[dict]:
+        files = []
+        sections: List[str] = []
+        for path, before in sorted(preimages.items()):
+            path = Path(path).resolve()
+            after = _read(path)
+            if after == before:
+                continue
+            meta = {
+                "path": str(path),
+                "pre_hash": content_hash(before),
+                "post_hash": content_hash(after),
+            }
+            if before is not None:
+                meta["eol"] = "\r\n" if b"\r\n" in before else "\n"
+                meta["final_newline"] = before.endswith(b"\n")
+            files.append(meta)
+            sections.extend(
+                file_diff(
+                    None if after is None else after.decode("utf-8"),
+                    None if before is None else before.decode("utf-8"),
+                    fromfile=str(path),
+                    tofile=str(path),
+                )
+            )
+        if not files:
+            return None
+        entry = {
+            "type": "change",
+            "id": uuid.uuid4().hex,
+            "run": self.run_id,
+            "source": source,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "files": files,
+            "reverse_diff": "\n".join(sections) + "\n",
+        }
+        self._append(entry)
+        return entry
+
+    def entries(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        with self.path.open("r", encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+
+    def pending(self) -> List[dict]:
+        records = self.entries()
+        undone = {entry_id for r in records if r.get("type") == "undo" for entry_id in r["undoes"]}
+        return [r for r in records if r.get("type") == "change" and r["id"] not in undone]
+
+    def undo(self, to_run: Optional[str] = None) -> UndoResult:
+        """Undo the latest run, or every run back to and including ``to_run``."""
+        # Imported here: the patcher itself takes a journal.
+        from shadowpcagent.patcher import UnifiedDiffApplier
+
+        pending = self.pending()
+        if not pending:
+            return UndoResult(error="Nothing to undo.")
+        target = to_run or pending[-1]["run"]
+        start = next((i for i, entry in enumerate(pending) if entry["run"] == target), None)
+        if start is None:
+            return UndoResult(error=f"No undoable changes recorded for run {target}.")
+        selected = pending[start:]
+
+        current: Dict[str, Optional[bytes]] = {}
+
+        def state(path: Path) -> Optional[bytes]:
+            key = str(path)
+            if key not in current:
+                current[key] = _read(path)
+            return current[key]
+
+        applier = UnifiedDiffApplier(max_fuzz=0, reader=state, confine=False)
+        for entry in reversed(selected):
+            for meta in entry["files"]:
+                if content_hash(state(Path(meta["path"]))) != meta["post_hash"]:
+                    return UndoResult(
+                        error=f"{meta['path']} changed since {entry['run']}; refusing to undo."
+                    )
+            patches = applier.parse(entry["reverse_diff"])
+            plan = applier.plan_patches(patches, Path(".")) if patches else None
+            if plan is not None and not plan.validated:
+                return UndoResult(error=f"Reverse diff for {entry['run']} does not apply: {plan.result.error}")
+            new_texts = {str(item.path): item.new_text for item in (plan.files if plan else [])}
+            for meta in entry["files"]:
+                key = meta["path"]
+                if meta["pre_hash"] is None:
+                    restored = None
+                else:
+                    text = new_texts.get(key)
+                    if text is None:
+                        text = (current[key] or b"").decode("utf-8")
+                    restored = _restore_line_endings(text, meta["eol"], meta["final_newline"])
+                if content_hash(restored) != meta["pre_hash"]:
+                    return UndoResult(error=f"Reverse diff does not reproduce the pre-image of {key}.")
+                current[key] = restored
+
+        changed = {Path(key): data for key, data in current.items() if data != _read(Path(key))}
+        try:
+            write_files_atomically(changed)
+        except OSError as exc:
+            return UndoResult(error=f"Undo write failed and was rolled back: {exc}")
+        self._append(
+            {
+                "type": "undo",
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "undoes": [entry["id"] for entry in selected],
+            }
+        )
+        return UndoResult(
+            runs=list(dict.fromkeys(entry["run"] for entry in selected)),
+            files=sorted(str(path) for path in changed),
+            entries=len(selected),
+        )
+
+    def _append(self, record: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record) + "\n")
@@ -1,39 +1,204 @@
+import atexit
+import gzip
 import json
+import queue
+import threading
+import time
 from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import IO, Any, Iterator, List, Optional
+
+from shadowpcagent.flight import FlightRecorder
+
+_STOP = object()
+
+
+def open_log(path: Path) -> IO[str]:
+    """Open a JSONL log for reading whether or not it has been gzipped."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+def read_jsonl(path: Path) -> Iterator[dict]:
+    with open_log(path) as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def list_run_logs(log_dir: Path) -> List[Path]:
+    """Run logs in name (= start time) order, plain and gzipped alike."""
+    if not log_dir.exists():
+        return []
+    paths = list(log_dir.glob("run-*.jsonl")) + list(log_dir.glob("run-*.jsonl.gz"))
+    return sorted(paths, key=lambda p: p.name[: -len(".gz")] if p.suffix == ".gz" else p.name)
+
+
+class BufferedLineWriter:
+    """Appends lines to one file through a queue drained by a background thread.
+
+    The handle stays open; queued lines are written in batches once
+    ``flush_bytes`` accumulate or ``flush_interval`` seconds pass, and
+    immediately on flush(), close() or interpreter exit.
+    """
+
+    def __init__(self, path: Path, flush_bytes: int = 64 * 1024, flush_interval: float = 1.0) -> None:
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._handle = self.path.open("a", encoding="utf-8")
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=f"log-writer:{path.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, line: str) -> None:
+        if self._closed:
+            raise ValueError(f"Log writer for {self.path} is closed.")
+        self._queue.put(line)
+
+    def flush(self) -> None:
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self) -> None:
+        pending: List[str] = []
+        size = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, str):
+                pending.append(item)
+                size += len(item)
+                if size < self.flush_bytes and time.monotonic() < deadline:
+                    continue
+            if pending:
+                try:
+                    self._handle.write("".join(pending))
+                    self._handle.flush()
+                except OSError as exc:
+                    self._error = exc
+                pending = []
+                size = 0
+            deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                self._handle.close()
+                return
 
 
 class JsonlLogger:
-    def __init__(self, log_dir: Path) -> None:
+    def __init__(
+        self,
+        log_dir: Path,
+        buffered: bool = False,
+        flush_bytes: int = 64 * 1024,
+        flush_interval: float = 1.0,
+        recorder: Optional[FlightRecorder] = None,
+    ) -> None:
         self.log_dir = log_dir
+        self.recorder = recorder
         self.log_dir.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-        self.path = self.log_dir / f"run-{timestamp}.jsonl"
+        self.path = self._create_log_path()
+        self._writer = (
+            BufferedLineWriter(self.path, flush_bytes=flush_bytes, flush_interval=flush_interval)
+            if buffered
+            else None
+        )
+
+    def _create_log_path(self) -> Path:
+        # Names sort by start time; creating the file exclusively keeps two
+        # runs started in the same microsecond from sharing a log.
+        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        attempt = 0
+        while True:
+            suffix = f"-{attempt}" if attempt else ""
+            path = self.log_dir / f"run-{timestamp}{suffix}.jsonl"
+            try:
+                with path.open("x", encoding="utf-8"):
+                    return path
+            except FileExistsError:
+                attempt += 1
 
     def log(self, event: str, payload: dict[str, Any]) -> None:
+        if self.recorder is not None:
+            self.recorder.record("log", event, payload)
         record = {
             "event": event,
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "payload": payload,
         }
-        with self.path.open("a", encoding="utf-8") as handle:
-            handle.write(json.dumps(record) + "\n")
+        line = json.dumps(record) + "\n"
+        if self._writer is None:
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line)
+            return
+        self._writer.write(line)
+        if payload.get("error"):
+            # Make failures visible on disk right away.
+            self._writer.flush()
 
     def log_dataclass(self, event: str, payload: Any) -> None:
         self.log(event, asdict(payload))
 
+    def debug(self, event: str, payload: Any) -> None:
+        """Detail kept only in the flight recorder, never written to the run log."""
+        if self.recorder is not None:
+            self.recorder.record("debug", event, payload)
+
+    def flush(self) -> None:
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
 
 class RunHistoryLogger:
-    def __init__(self, history_path: Path) -> None:
+    def __init__(self, history_path: Path, buffered: bool = False) -> None:
         self.history_path = history_path
         self.history_path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = BufferedLineWriter(self.history_path) if buffered else None
 
     def append(self, payload: dict[str, Any]) -> None:
         record = {
             "timestamp": datetime.utcnow().isoformat() + "Z",
             **payload,
         }
-        with self.history_path.open("a", encoding="utf-8") as handle:
-            handle.write(json.dumps(record) + "\n")
+        line = json.dumps(record) + "\n"
+        if self._writer is None:
+            with self.history_path.open("a", encoding="utf-8") as handle:
+                handle.write(line)
+            return
+        self._writer.write(line)
+
+    def flush(self) -> None:
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
@@ -0,0 +1,305 @@
+import math
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from shadowpcagent.fileio import file_lock, write_files_atomically
+
+DEFAULT_METRICS_PATH = Path("artifacts") / "metrics" / "shadowpcagent.prom"
+DEFAULT_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+DEFAULT_COUNT_BUCKETS = (10, 50, 100, 200, 500, 1000, 5000, 10000, 50000, 100000)
+
+_SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)")
+_TYPE = re.compile(r"^# TYPE\s+(\S+)\s+(\S+)")
+
+Sample = Tuple[str, str, float]  # (sample name, rendered labels, value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _le(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(bound)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self.registry: Optional["MetricsRegistry"] = None
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {list(self.labelnames)}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _touch(self) -> None:
+        if self.registry is not None:
+            self.registry.updated = True
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self._touch()
+
+    def value(self, **labels: object) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _labels(list(zip(self.labelnames, key))), value) for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+        self._touch()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 1))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-1] += value
+        self._touch()
+
+    def count(self, **labels: object) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        samples: List[Sample] = []
+        for key, series in items:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0.0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                samples.append((f"{self.name}_bucket", _labels(pairs + [("le", _le(bound))]), cumulative))
+            samples.append((f"{self.name}_sum", _labels(pairs), series[-1]))
+            samples.append((f"{self.name}_count", _labels(pairs), cumulative))
+        return samples
+
+
+def read_textfile(path: Path) -> Dict[Tuple[str, str], float]:
+    """Counter and histogram samples from a textfile previously written by us."""
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except (OSError, ValueError):
+        return {}
+    cumulative = set()
+    samples: Dict[Tuple[str, str], float] = {}
+    for line in lines:
+        type_match = _TYPE.match(line)
+        if type_match:
+            if type_match.group(2) in ("counter", "histogram"):
+                cumulative.add(type_match.group(1))
+            continue
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name = match.group(1)
+        family = re.sub(r"_(bucket|sum|count)$", "", name)
+        if name in cumulative or family in cumulative:
+            try:
+                samples[(name, match.group(2) or "")] = float(match.group(3))
+            except ValueError:
+                continue
+    return samples
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms in Prometheus text format.
+
+    - write_textfile() replaces the target atomically, as node_exporter's
+      textfile collector expects
+    - counters and histograms are merged into what the file already holds:
+      under a file lock, each write adds only what this process counted
+      since its previous write, so totals survive short-lived processes and
+      several processes can share one textfile; gauges are last-writer-wins
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        # Per textfile: the cumulative samples this process has already added to it.
+        self._written: Dict[Path, Dict[Tuple[str, str], float]] = {}
+        self.updated = False
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with a different shape.")
+                return existing
+            metric.registry = self
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def _snapshot(self) -> List[Tuple[_Metric, List[Sample]]]:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return [(metric, metric.samples()) for metric in metrics]
+
+    def render(self, baseline: Optional[Dict[Tuple[str, str], float]] = None) -> str:
+        return self._render(self._snapshot(), baseline or {})
+
+    def _render(
+        self, snapshot: List[Tuple[_Metric, List[Sample]]], baseline: Dict[Tuple[str, str], float]
+    ) -> str:
+        lines: List[str] = []
+        for metric, samples in snapshot:
+            merged: Dict[Tuple[str, str], float] = {}
+            for name, labels, value in samples:
+                merged[(name, labels)] = value
+            if metric.kind != "gauge":
+                names = {metric.name, f"{metric.name}_bucket", f"{metric.name}_sum", f"{metric.name}_count"}
+                for key, value in baseline.items():
+                    if key[0] in names:
+                        merged[key] = merged.get(key, 0.0) + value
+            if not merged:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_format(value)}" for (name, labels), value in merged.items())
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_textfile(self, path: Path = DEFAULT_METRICS_PATH) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        snapshot = self._snapshot()
+        ours = {
+            (name, labels): value
+            for metric, samples in snapshot
+            if metric.kind != "gauge"
+            for name, labels, value in samples
+        }
+        with file_lock(path):
+            written = self._written.get(path, {})
+            # What other processes (and earlier runs) contributed to the file.
+            others = {key: max(0.0, value - written.get(key, 0.0)) for key, value in read_textfile(path).items()}
+            write_files_atomically({path: self._render(snapshot, others)})
+            self._written[path] = ours
+        return path
+
+    def start_textfile_writer(self, path: Path = DEFAULT_METRICS_PATH, interval: float = 15.0) -> "TextfileWriter":
+        writer = TextfileWriter(self, path, interval)
+        writer.start()
+        return writer
+
+
+class TextfileWriter(threading.Thread):
+    """Rewrites the textfile every ``interval`` seconds until stop()."""
+
+    def __init__(self, registry: MetricsRegistry, path: Path, interval: float) -> None:
+        super().__init__(name="metrics-textfile", daemon=True)
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.registry.write_textfile(self.path)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+        self.registry.write_textfile(self.path)
+
+
+REGISTRY = MetricsRegistry()
+
+RUNS = REGISTRY.counter("shadowpcagent_runs_total", "Agent runs by final status.", ["status"])
+SCAN_FILES = REGISTRY.histogram(
+    "shadowpcagent_scan_files", "Files seen by the workspace scan per run.", buckets=DEFAULT_COUNT_BUCKETS
+)
+SHELL_COMMANDS = REGISTRY.counter(
+    "shadowpcagent_shell_commands_total", "Shell commands run, by exit code.", ["exit_code"]
+)
+SHELL_DURATION = REGISTRY.histogram(
+    "shadowpcagent_shell_command_duration_seconds", "Wall time of allowlisted shell commands."
+)
+SHELL_CACHE = REGISTRY.counter(
+    "shadowpcagent_shell_cache_total", "Pure-command cache lookups by result.", ["result"]
+)
+PATCH_VALIDATION_FAILURES = REGISTRY.counter(
+    "shadowpcagent_patch_validation_failures_total", "Draft patches that failed validation."
+)
+INDEX_BUILDS = REGISTRY.histogram(
+    "shadowpcagent_index_build_duration_seconds", "shadow_search index build time.", ["index"]
+)
+INDEX_FILES = REGISTRY.counter("shadowpcagent_index_files_total", "Files processed by index builds.", ["index"])
+INDEX_FILES_PER_SECOND = REGISTRY.gauge(
+    "shadowpcagent_index_files_per_second", "Throughput of the latest index build.", ["index"]
+)
+
+
+def record_index_build(index: str, files: int, seconds: float) -> None:
+    INDEX_BUILDS.observe(seconds, index=index)
+    INDEX_FILES.inc(files, index=index)
+    INDEX_FILES_PER_SECOND.set(files / seconds if seconds > 0 else 0.0, index=index)
@@ -22,6 +22,7 @@ class ActionLog:
     action: str
     succeeded: bool
     detail: str
+    duration: Optional[float] = None
 
 
 @dataclass
@@ -30,6 +31,52 @@ class ShellResult:
     returncode: int
     stdout: str
     stderr: str
+    duration: float = 0.0
+    timed_out: Optional[str] = None
+    output_path: Optional[str] = None
+    output_bytes: int = 0
+    truncated_bytes: int = 0
+    cancelled: bool = False
+    cached: bool = False
+
+
+@dataclass
+class ShellBatchResult:
+    results: List[ShellResult] = field(default_factory=list)
+    duration: float = 0.0
+    cancelled: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return all(result.returncode == 0 and not result.cancelled for result in self.results)
+
+
+@dataclass
+class TestRunResult:
+    __test__ = False
+
+    command: str
+    shards: int
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    returncode: int = 0
+    duration: float = 0.0
+    cancelled: bool = False
+    failures: List[str] = field(default_factory=list)
+    shard_results: List[ShellResult] = field(default_factory=list)
+
+
+@dataclass
+class FilePatchResult:
+    path: str
+    validated: bool
+    error: Optional[str] = None
+    created: bool = False
+    deleted: bool = False
+    offsets: List[int] = field(default_factory=list)
+    fuzz: List[int] = field(default_factory=list)
 
 
 @dataclass
@@ -39,6 +86,49 @@ class PatchResult:
     error: Optional[str] = None
     dry_run: bool = False
     validated: bool = False
+    files: List[FilePatchResult] = field(default_factory=list)
+    offset: int = 0
+    fuzz: int = 0
+    # Sections with nothing to apply (mode changes, renames, binary files).
+    skipped: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TestSelection:
+    __test__ = False
+
+    changed_paths: List[str]
+    impacted_modules: List[str]
+    tests: List[str]
+    run_all: bool
+    reason: str
+
+    @property
+    def has_tests(self) -> bool:
+        return self.run_all or bool(self.tests)
+
+    def pytest_args(self) -> List[str]:
+        return [] if self.run_all else list(self.tests)
+
+
+@dataclass
+class LanguageStats:
+    files: int = 0
+    code: int = 0
+    comment: int = 0
+    blank: int = 0
+
+
+@dataclass
+class RepoMapSummary:
+    files: int
+    languages: Dict[str, LanguageStats]
+    build_tools: Dict[str, List[str]]
+    test_dirs: List[str]
+    path: Optional[str] = None
+    seconds: float = 0.0
+    cached_files: int = 0
+    truncated: bool = False
 
 
 @dataclass
@@ -61,6 +151,7 @@ class RunSummary:
     repo_root: str
     plan_only: bool
     shell_result: Optional[ShellResult] = None
+    shell_results: List[ShellResult] = field(default_factory=list)
     log_path: Optional[str] = None
     draft_path: Optional[str] = None
     edit_path: Optional[str] = None
@@ -69,3 +160,9 @@ class RunSummary:
     applied_patch_path: Optional[str] = None
     run_summary_path: Optional[str] = None
     run_history_path: Optional[str] = None
+    repo_map: Optional[RepoMapSummary] = None
+    test_selection: Optional[TestSelection] = None
+    test_run: Optional[TestRunResult] = None
+    trace_path: Optional[str] = None
+    profile_paths: Dict[str, str] = field(default_factory=dict)
+    flight_recorder_path: Optional[str] = None
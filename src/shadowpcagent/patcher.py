@@ -1,8 +1,17 @@
-from dataclasses import dataclass
+import bisect
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
-from shadowpcagent.models import PatchResult
+from shadowpcagent.fileio import write_files_atomically
+from shadowpcagent.journal import UndoJournal
+from shadowpcagent.models import FilePatchResult, PatchResult
+from shadowpcagent.workspace import OverlayWorkspace
+
+DEV_NULL = "/dev/null"
 
 
 @dataclass
@@ -14,97 +23,391 @@ class Hunk:
     lines: List[str]
 
 
+@dataclass
+class Placement:
+    offset: int
+    fuzz: int
+
+
+@dataclass
+class FilePatch:
+    old_path: Optional[str]
+    new_path: Optional[str]
+    hunks: List[Hunk] = field(default_factory=list)
+    # Came from a ``diff --git`` section, which may legitimately carry no hunks
+    # (mode change, rename, binary file).
+    git: bool = False
+
+    @property
+    def target(self) -> str:
+        return self.new_path or self.old_path or ""
+
+    @property
+    def is_new(self) -> bool:
+        return self.old_path is None
+
+    @property
+    def is_delete(self) -> bool:
+        return self.new_path is None
+
+    def reversed(self) -> "FilePatch":
+        swap = {"+": "-", "-": "+"}
+        hunks = [
+            Hunk(
+                original_start=hunk.new_start,
+                original_count=hunk.new_count,
+                new_start=hunk.original_start,
+                new_count=hunk.original_count,
+                lines=[swap.get(line[:1], line[:1]) + line[1:] for line in hunk.lines],
+            )
+            for hunk in self.hunks
+        ]
+        return FilePatch(old_path=self.new_path, new_path=self.old_path, hunks=hunks, git=self.git)
+
+
+@dataclass
+class PlannedFile:
+    patch: FilePatch
+    path: Path
+    new_text: Optional[str]
+    fingerprint: Optional[str] = None
+    error: Optional[str] = None
+    placements: List[Placement] = field(default_factory=list)
+
+
+@dataclass
+class PatchPlan:
+    result: PatchResult
+    files: List[PlannedFile] = field(default_factory=list)
+
+    @property
+    def validated(self) -> bool:
+        return self.result.validated
+
+
+def fingerprint_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_file_bytes(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _fingerprint_of(data: Optional[bytes]) -> Optional[str]:
+    return None if data is None else fingerprint_bytes(data)
+
+
+class SnapshotCache:
+    """Thread-safe read-once cache of file contents, shared by several appliers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._path_locks: Dict[Path, threading.Lock] = {}
+        self._contents: Dict[Path, Optional[bytes]] = {}
+        self.reads = 0
+
+    def read(self, path: Path) -> Optional[bytes]:
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+        with path_lock:
+            if path not in self._contents:
+                self._contents[path] = read_file_bytes(path)
+                with self._lock:
+                    self.reads += 1
+            return self._contents[path]
+
+
+def _strip_prefix(path: str, prefix: str) -> str:
+    return path[len(prefix) :] if path.startswith(prefix) else path
+
+
+def _header_path(line: str) -> Optional[str]:
+    value = line[4:].split("\t", 1)[0].strip()
+    if value.startswith('"') and value.endswith('"') and len(value) > 1:
+        value = value[1:-1]
+    return None if value == DEV_NULL else value
+
+
+def _within(path: Path, root: Path) -> bool:
+    try:
+        path.relative_to(root)
+    except ValueError:
+        return False
+    return True
+
+
 class UnifiedDiffApplier:
+    """Parses and applies unified diffs under ``repo_root``.
+
+    Diff paths (relative, or absolute as FileEditor writes them) must resolve
+    inside ``repo_root``, symlinks and ``..`` included, unless ``confine`` is
+    False, which only the undo journal uses for diffs it writes itself.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_fuzz: int = 2,
+        reader: Optional[Callable[[Path], Optional[bytes]]] = None,
+        workspace: Optional[OverlayWorkspace] = None,
+        journal: Optional[UndoJournal] = None,
+        confine: bool = True,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_fuzz = max_fuzz
+        self.workspace = workspace
+        self.journal = journal
+        self.confine = confine
+        self.reader = reader or (workspace.read_bytes if workspace is not None else read_file_bytes)
+
     def apply(self, diff_text: str, repo_root: Path, dry_run: bool = False) -> PatchResult:
-        target_path = self._extract_target_path(diff_text)
-        if target_path is None:
-            return PatchResult(
-                path="",
-                applied=False,
-                error="No target path found in diff.",
-                dry_run=dry_run,
-                validated=False,
-            )
-        path = (repo_root / target_path).resolve()
-        if not path.exists():
-            return PatchResult(
-                path=str(path),
-                applied=False,
-                error="Target file does not exist.",
-                dry_run=dry_run,
-                validated=False,
+        plan = self.plan(diff_text, repo_root)
+        if dry_run or not plan.validated:
+            plan.result.dry_run = dry_run
+            return plan.result
+        return self.apply_plan(plan)
+
+    def plan(self, diff_text: str, repo_root: Path) -> PatchPlan:
+        return self.plan_patches(self.parse(diff_text), repo_root)
+
+    def plan_patches(self, file_patches: List[FilePatch], repo_root: Path) -> PatchPlan:
+        if not file_patches:
+            return PatchPlan(
+                result=PatchResult(
+                    path="",
+                    applied=False,
+                    error="No target path found in diff.",
+                    dry_run=True,
+                    validated=False,
+                )
             )
-        hunks = self._parse_hunks(diff_text)
-        if not hunks:
-            return PatchResult(
-                path=str(path),
-                applied=False,
-                error="No hunks found.",
-                dry_run=dry_run,
-                validated=False,
+        first_path = str((repo_root / file_patches[0].target).resolve())
+        # Mode-only, rename-only and binary sections have nothing for us to apply.
+        skipped = [patch.target for patch in file_patches if patch.git and not patch.hunks]
+        file_patches = [patch for patch in file_patches if patch.target not in skipped]
+        if not file_patches:
+            return PatchPlan(
+                result=PatchResult(path=first_path, applied=False, dry_run=True, validated=True, skipped=skipped)
             )
-        original_lines = path.read_text(encoding="utf-8").splitlines()
-        try:
-            updated_lines = self._apply_hunks(original_lines, hunks)
-        except ValueError as exc:
-            return PatchResult(
-                path=str(path),
-                applied=False,
-                error=str(exc),
-                dry_run=dry_run,
-                validated=False,
+        targets = [patch.target for patch in file_patches]
+        duplicate = next((t for t in targets if targets.count(t) > 1), None)
+        if duplicate is not None:
+            return PatchPlan(
+                result=PatchResult(
+                    path=first_path,
+                    applied=False,
+                    error=f"Duplicate file section in diff: {duplicate}",
+                    dry_run=True,
+                    validated=False,
+                )
             )
-        if dry_run:
-            return PatchResult(
-                path=str(path),
-                applied=False,
-                dry_run=True,
-                validated=True,
+
+        planned = self._validate_all(file_patches, repo_root)
+        files = [
+            FilePatchResult(
+                path=str(item.path),
+                validated=item.error is None,
+                error=item.error,
+                created=item.patch.is_new,
+                deleted=item.patch.is_delete,
+                offsets=[placement.offset for placement in item.placements],
+                fuzz=[placement.fuzz for placement in item.placements],
             )
-        path.write_text("\n".join(updated_lines) + "\n", encoding="utf-8")
-        return PatchResult(
-            path=str(path),
-            applied=True,
-            dry_run=False,
-            validated=True,
+            for item in planned
+        ]
+        failed = next((item for item in planned if item.error), None)
+        error = None
+        if failed is not None:
+            error = failed.error if len(planned) == 1 else f"{failed.patch.target}: {failed.error}"
+        result = PatchResult(
+            path=first_path,
+            applied=False,
+            error=error,
+            dry_run=True,
+            validated=failed is None,
+            files=files,
+            offset=max((abs(o) for f in files for o in f.offsets), default=0),
+            fuzz=max((z for f in files for z in f.fuzz), default=0),
+            skipped=skipped,
         )
+        return PatchPlan(result=result, files=planned)
 
-    def _extract_target_path(self, diff_text: str) -> Optional[str]:
-        for line in diff_text.splitlines():
-            if line.startswith("+++ "):
-                target = line.replace("+++ ", "", 1).strip()
-                return target
-        return None
+    def apply_plan(self, plan: PatchPlan) -> PatchResult:
+        """Write a validated plan after checking no target changed since it was built.
 
-    def _parse_hunks(self, diff_text: str) -> List[Hunk]:
-        hunks: List[Hunk] = []
+        With a workspace the new contents are staged in its overlay instead of disk.
+        """
+        base = plan.result
+        outcome = PatchResult(
+            path=base.path,
+            applied=False,
+            error=base.error,
+            dry_run=False,
+            validated=base.validated,
+            files=base.files,
+            offset=base.offset,
+            fuzz=base.fuzz,
+            skipped=base.skipped,
+        )
+        if not plan.validated:
+            return outcome
+        current = self.workspace.read_bytes if self.workspace is not None else read_file_bytes
+        stale = next(
+            (item for item in plan.files if _fingerprint_of(current(item.path)) != item.fingerprint), None
+        )
+        if stale is not None:
+            outcome.validated = False
+            outcome.error = f"{stale.patch.target}: Target changed since validation."
+            return outcome
+        if self.workspace is not None:
+            for item in plan.files:
+                if item.new_text is None:
+                    self.workspace.delete(item.path)
+                else:
+                    self.workspace.write_text(item.path, item.new_text)
+            outcome.applied = True
+            return outcome
+        try:
+            preimages = write_files_atomically({item.path: item.new_text for item in plan.files})
+        except OSError as exc:
+            outcome.error = f"Patch write failed and was rolled back: {exc}"
+            return outcome
+        if self.journal is not None:
+            self.journal.record("patch", preimages)
+        outcome.applied = True
+        return outcome
+
+    def parse(self, diff_text: str) -> List[FilePatch]:
         lines = diff_text.splitlines()
+        patches: List[FilePatch] = []
+        current: Optional[FilePatch] = None
+        git_paths: Optional[tuple] = None
         index = 0
         while index < len(lines):
             line = lines[index]
-            if line.startswith("@@"):
-                header = line.strip("@ ").split(" ")
-                original_info = header[0].lstrip("-")
-                new_info = header[1].lstrip("+")
-                original_start, original_count = self._parse_range(original_info)
-                new_start, new_count = self._parse_range(new_info)
+            if line.startswith("diff --git "):
+                parts = line[len("diff --git ") :].split(" b/", 1)
+                old = _strip_prefix(parts[0], "a/")
+                new = parts[1] if len(parts) > 1 else old
+                git_paths = (old, new)
+                current = FilePatch(old_path=old, new_path=new, git=True)
+                patches.append(current)
                 index += 1
-                hunk_lines: List[str] = []
-                while index < len(lines) and not lines[index].startswith("@@"):
-                    hunk_lines.append(lines[index])
-                    index += 1
-                hunks.append(
-                    Hunk(
-                        original_start=original_start,
-                        original_count=original_count,
-                        new_start=new_start,
-                        new_count=new_count,
-                        lines=hunk_lines,
-                    )
-                )
+            elif line.startswith("--- ") and index + 1 < len(lines) and lines[index + 1].startswith("+++ "):
+                old = _header_path(line)
+                new = _header_path(lines[index + 1])
+                if git_paths is not None or (
+                    (old or "a/").startswith("a/") and (new or "b/").startswith("b/")
+                ):
+                    old = _strip_prefix(old, "a/") if old else None
+                    new = _strip_prefix(new, "b/") if new else None
+                if current is None or current.hunks or git_paths is None:
+                    current = FilePatch(old_path=old, new_path=new)
+                    patches.append(current)
+                else:
+                    current.old_path, current.new_path = old, new
+                git_paths = None
+                index += 2
+            elif line.startswith("@@") and current is not None:
+                hunk, index = self._parse_hunk(lines, index)
+                current.hunks.append(hunk)
             else:
                 index += 1
-        return hunks
+        return [patch for patch in patches if patch.target]
+
+    def _parse_hunk(self, lines: List[str], index: int) -> tuple:
+        header = lines[index].strip("@ ").split(" ")
+        original_start, original_count = self._parse_range(header[0].lstrip("-"))
+        new_start, new_count = self._parse_range(header[1].lstrip("+"))
+        index += 1
+        hunk_lines: List[str] = []
+        remaining_old, remaining_new = original_count, new_count
+        while index < len(lines) and (remaining_old > 0 or remaining_new > 0):
+            line = lines[index]
+            if line.startswith("\\"):
+                index += 1
+                continue
+            if line.startswith("@@") or line.startswith("diff --git "):
+                break
+            if line.startswith("-") and not line.startswith("--- "):
+                remaining_old -= 1
+            elif line.startswith("+") and not line.startswith("+++ "):
+                remaining_new -= 1
+            elif line.startswith(" ") or line == "":
+                line = line or " "
+                remaining_old -= 1
+                remaining_new -= 1
+            elif line.startswith("--- ") or line.startswith("+++ "):
+                if line.startswith("--- ") and remaining_old > 0:
+                    remaining_old -= 1
+                elif line.startswith("+++ ") and remaining_new > 0:
+                    remaining_new -= 1
+                else:
+                    break
+            else:
+                break
+            hunk_lines.append(line)
+            index += 1
+        while index < len(lines) and lines[index].startswith("\\"):
+            index += 1
+        hunk = Hunk(
+            original_start=original_start,
+            original_count=original_count,
+            new_start=new_start,
+            new_count=new_count,
+            lines=hunk_lines,
+        )
+        return hunk, index
+
+    def _validate_all(self, file_patches: List[FilePatch], repo_root: Path) -> List[PlannedFile]:
+        if len(file_patches) == 1:
+            return [self._validate(file_patches[0], repo_root)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(lambda patch: self._validate(patch, repo_root), file_patches))
+
+    def _validate(self, patch: FilePatch, repo_root: Path) -> PlannedFile:
+        path = (repo_root / patch.target).resolve()
+        if self.confine and not _within(path, repo_root.resolve()):
+            return PlannedFile(patch=patch, path=path, new_text=None, error="Target is outside the repository.")
+        if not patch.hunks:
+            return PlannedFile(patch=patch, path=path, new_text=None, error="No hunks found.")
+        data = self.reader(path)
+        if patch.is_new:
+            if data is not None:
+                return PlannedFile(patch=patch, path=path, new_text=None, error="Target file already exists.")
+            original_lines: List[str] = []
+            fingerprint = None
+        elif data is None:
+            return PlannedFile(patch=patch, path=path, new_text=None, error="Target file does not exist.")
+        else:
+            fingerprint = fingerprint_bytes(data)
+            try:
+                original_lines = data.decode("utf-8").splitlines()
+            except UnicodeDecodeError as exc:
+                return PlannedFile(patch=patch, path=path, new_text=None, error=f"Target is not UTF-8: {exc}")
+        placements: List[Placement] = []
+        try:
+            updated_lines = self._apply_hunks(original_lines, patch.hunks, placements)
+        except ValueError as exc:
+            return PlannedFile(patch=patch, path=path, new_text=None, error=str(exc))
+        if patch.is_delete:
+            if updated_lines:
+                return PlannedFile(
+                    patch=patch, path=path, new_text=None, error="Deleted file still has content."
+                )
+            return PlannedFile(
+                patch=patch, path=path, new_text=None, fingerprint=fingerprint, placements=placements
+            )
+        return PlannedFile(
+            patch=patch,
+            path=path,
+            new_text="\n".join(updated_lines) + "\n",
+            fingerprint=fingerprint,
+            placements=placements,
+        )
 
     def _parse_range(self, value: str) -> tuple[int, int]:
         if "," in value:
@@ -112,27 +415,99 @@ class UnifiedDiffApplier:
             return int(start), int(count)
         return int(value), 1
 
-    def _apply_hunks(self, original_lines: List[str], hunks: List[Hunk]) -> List[str]:
-        updated = original_lines[:]
-        offset = 0
-        for hunk in hunks:
-            start_index = hunk.original_start - 1 + offset
-            original_index = start_index
-            new_chunk: List[str] = []
-            for line in hunk.lines:
-                if line.startswith(" "):
-                    expected = line[1:]
-                    if original_index >= len(updated) or updated[original_index] != expected:
-                        raise ValueError("Context mismatch while applying patch.")
-                    new_chunk.append(expected)
-                    original_index += 1
-                elif line.startswith("-"):
-                    expected = line[1:]
-                    if original_index >= len(updated) or updated[original_index] != expected:
-                        raise ValueError("Deletion mismatch while applying patch.")
-                    original_index += 1
-                elif line.startswith("+"):
-                    new_chunk.append(line[1:])
-            updated[start_index:original_index] = new_chunk
-            offset += len(new_chunk) - (original_index - start_index)
-        return updated
+    def _apply_hunks(
+        self, original_lines: List[str], hunks: List[Hunk], placements: Optional[List[Placement]] = None
+    ) -> List[str]:
+        """Place each hunk like GNU patch: exact position first, then the nearest
+        offset, then with up to ``max_fuzz`` outer context lines ignored.
+
+        Candidate positions come from a line -> positions index built once per
+        file, so a drifted hunk is found without rescanning the file.
+        """
+        index: Dict[str, List[int]] = {}
+        for position, line in enumerate(original_lines):
+            index.setdefault(line, []).append(position)
+
+        output: List[str] = []
+        cursor = 0
+        drift = 0
+        for number, hunk in enumerate(hunks, start=1):
+            expected_start = hunk.original_start if hunk.original_count == 0 else hunk.original_start - 1
+            placed = None
+            for fuzz in range(self.max_fuzz + 1):
+                trimmed = self._trim_context(hunk.lines, fuzz)
+                if trimmed is None:
+                    break
+                old, new, top = trimmed
+                position = self._locate(original_lines, index, old, expected_start + drift + top, cursor)
+                if position is not None:
+                    placed = (position, old, new, top, fuzz)
+                    break
+            if placed is None:
+                raise ValueError(f"Hunk #{number} does not apply: context mismatch while applying patch.")
+            position, old, new, top, fuzz = placed
+            offset = position - top - expected_start
+            drift = offset
+            output.extend(original_lines[cursor:position])
+            output.extend(new)
+            cursor = position + len(old)
+            if placements is not None:
+                placements.append(Placement(offset=offset, fuzz=fuzz))
+        output.extend(original_lines[cursor:])
+        return output
+
+    def _trim_context(self, lines: List[str], fuzz: int) -> Optional[tuple]:
+        body = [line if line else " " for line in lines if line[:1] in (" ", "-", "+", "")]
+        leading = 0
+        while leading < len(body) and body[leading].startswith(" "):
+            leading += 1
+        trailing = 0
+        while trailing < len(body) - leading and body[len(body) - 1 - trailing].startswith(" "):
+            trailing += 1
+        if fuzz and leading < fuzz and trailing < fuzz:
+            return None
+        top = min(fuzz, leading)
+        bottom = min(fuzz, trailing)
+        kept = body[top : len(body) - bottom]
+        old = [line[1:] for line in kept if line[0] in (" ", "-")]
+        new = [line[1:] for line in kept if line[0] in (" ", "+")]
+        return old, new, top
+
+    def _locate(
+        self,
+        lines: List[str],
+        index: Dict[str, List[int]],
+        old: List[str],
+        expected: int,
+        floor: int,
+    ) -> Optional[int]:
+        limit = len(lines) - len(old)
+        expected = min(max(expected, floor), max(limit, floor))
+        if not old:
+            return expected if floor <= expected <= len(lines) else None
+        if limit < floor:
+            return None
+        if lines[expected : expected + len(old)] == old:
+            return expected
+        # Anchor on the rarest line of the hunk and only test positions it allows.
+        anchor_at = min(range(len(old)), key=lambda k: len(index.get(old[k], ())))
+        positions = index.get(old[anchor_at])
+        if not positions:
+            return None
+        right = bisect.bisect_left(positions, expected + anchor_at)
+        left = right - 1
+        while left >= 0 or right < len(positions):
+            use_left = right >= len(positions) or (
+                left >= 0 and expected + anchor_at - positions[left] <= positions[right] - expected - anchor_at
+            )
+            if use_left:
+                candidate = positions[left] - anchor_at
+                left -= 1
+            else:
+                candidate = positions[right] - anchor_at
+                right += 1
+            if candidate < floor or candidate > limit:
+                continue
+            if lines[candidate : candidate + len(old)] == old:
+                return candidate
+        return None
@@ -0,0 +1,113 @@
+import cProfile
+import io
+import pstats
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from shadowpcagent.fileio import write_files_atomically
+
+PROFILE_MODES = ("cpu", "mem", "both")
+DEFAULT_PROFILE_DIR = Path("artifacts") / "profiles"
+
+
+def profile_run_id() -> str:
+    return datetime.utcnow().strftime("run-%Y%m%dT%H%M%S%fZ")
+
+
+class Profiler:
+    """Wraps a block with cProfile and/or tracemalloc and writes artifacts.
+
+    - cpu: ``cpu.prof`` (load with pstats/snakeviz) and ``cpu-top.txt``
+    - mem: ``mem-top.txt`` with peak usage and the top allocation sites
+    - cProfile only sees the thread that called start()
+    """
+
+    def __init__(self, mode: str, output_dir: Path, top: int = 30) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode} (expected one of {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.top = top
+        self._cpu: Optional[cProfile.Profile] = None
+        self._owns_tracemalloc = False
+        self.paths: Dict[str, str] = {}
+
+    @property
+    def cpu(self) -> bool:
+        return self.mode in ("cpu", "both")
+
+    @property
+    def mem(self) -> bool:
+        return self.mode in ("mem", "both")
+
+    def start(self) -> "Profiler":
+        if self.mem:
+            self._owns_tracemalloc = not tracemalloc.is_tracing()
+            if self._owns_tracemalloc:
+                tracemalloc.start(25)
+            else:
+                tracemalloc.reset_peak()
+        if self.cpu:
+            self._cpu = cProfile.Profile()
+            self._cpu.enable()
+        return self
+
+    def stop(self) -> Dict[str, str]:
+        outputs: Dict[Path, str] = {}
+        if self._cpu is not None:
+            self._cpu.disable()
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            prof_path = self.output_dir / "cpu.prof"
+            self._cpu.dump_stats(str(prof_path))
+            outputs[self.output_dir / "cpu-top.txt"] = self._cpu_summary()
+            self.paths["cpu_profile"] = str(prof_path)
+            self.paths["cpu_top"] = str(self.output_dir / "cpu-top.txt")
+            self._cpu = None
+        if self.mem and tracemalloc.is_tracing():
+            outputs[self.output_dir / "mem-top.txt"] = self._mem_summary()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            self.paths["mem_top"] = str(self.output_dir / "mem-top.txt")
+        if outputs:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            write_files_atomically(outputs)
+        return dict(self.paths)
+
+    def _cpu_summary(self) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(self._cpu, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        stream.write("\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        return stream.getvalue()
+
+    def _mem_summary(self) -> str:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            )
+        )
+        lines = [
+            f"current: {current / 1024:.1f} KiB",
+            f"peak: {peak / 1024:.1f} KiB",
+            "",
+            f"top {self.top} allocation sites (by size):",
+        ]
+        for index, stat in enumerate(snapshot.statistics("lineno")[: self.top], start=1):
+            frame = stat.traceback[0]
+            lines.append(
+                f"{index:>3}. {frame.filename}:{frame.lineno}  {stat.size / 1024:.1f} KiB in {stat.count} block(s)"
+            )
+        return "\n".join(lines) + "\n"
+
+    def __enter__(self) -> "Profiler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
@@ -0,0 +1,420 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from shadowpcagent.models import LanguageStats, RepoMapSummary
+from shadowpcagent.tools.shadow_search.index import DEFAULT_IGNORE_DIRS
+
+
+# language -> (line comment prefixes, block comment delimiters)
+COMMENT_SYNTAX: Dict[str, Tuple[Tuple[str, ...], Optional[Tuple[str, str]]]] = {
+    "Python": (("#",), None),
+    "PowerShell": (("#",), ("<#", "#>")),
+    "Shell": (("#",), None),
+    "Ruby": (("#",), None),
+    "Perl": (("#",), None),
+    "R": (("#",), None),
+    "YAML": (("#",), None),
+    "TOML": (("#",), None),
+    "INI": ((";", "#"), None),
+    "Make": (("#",), None),
+    "CMake": (("#",), None),
+    "Dockerfile": (("#",), None),
+    "C": (("//",), ("/*", "*/")),
+    "C++": (("//",), ("/*", "*/")),
+    "C#": (("//",), ("/*", "*/")),
+    "Java": (("//",), ("/*", "*/")),
+    "Kotlin": (("//",), ("/*", "*/")),
+    "Scala": (("//",), ("/*", "*/")),
+    "Go": (("//",), ("/*", "*/")),
+    "Rust": (("//",), ("/*", "*/")),
+    "Swift": (("//",), ("/*", "*/")),
+    "JavaScript": (("//",), ("/*", "*/")),
+    "TypeScript": (("//",), ("/*", "*/")),
+    "PHP": (("//", "#"), ("/*", "*/")),
+    "CSS": ((), ("/*", "*/")),
+    "SCSS": (("//",), ("/*", "*/")),
+    "SQL": (("--",), ("/*", "*/")),
+    "Lua": (("--",), None),
+    "Haskell": (("--",), ("{-", "-}")),
+    "HTML": ((), ("<!--", "-->")),
+    "XML": ((), ("<!--", "-->")),
+    "Markdown": ((), None),
+    "JSON": ((), None),
+    "Text": ((), None),
+    "Batch": (("REM ", "rem ", "::"), None),
+}
+
+EXTENSION_LANGUAGES: Dict[str, str] = {
+    ".py": "Python",
+    ".pyi": "Python",
+    ".ps1": "PowerShell",
+    ".psm1": "PowerShell",
+    ".psd1": "PowerShell",
+    ".sh": "Shell",
+    ".bash": "Shell",
+    ".zsh": "Shell",
+    ".rb": "Ruby",
+    ".pl": "Perl",
+    ".r": "R",
+    ".yml": "YAML",
+    ".yaml": "YAML",
+    ".toml": "TOML",
+    ".ini": "INI",
+    ".cfg": "INI",
+    ".mk": "Make",
+    ".cmake": "CMake",
+    ".c": "C",
+    ".h": "C",
+    ".cc": "C++",
+    ".cpp": "C++",
+    ".cxx": "C++",
+    ".hpp": "C++",
+    ".hh": "C++",
+    ".cs": "C#",
+    ".java": "Java",
+    ".kt": "Kotlin",
+    ".kts": "Kotlin",
+    ".scala": "Scala",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".swift": "Swift",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".mjs": "JavaScript",
+    ".cjs": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".php": "PHP",
+    ".css": "CSS",
+    ".scss": "SCSS",
+    ".sql": "SQL",
+    ".lua": "Lua",
+    ".hs": "Haskell",
+    ".html": "HTML",
+    ".htm": "HTML",
+    ".xml": "XML",
+    ".md": "Markdown",
+    ".rst": "Text",
+    ".txt": "Text",
+    ".json": "JSON",
+    ".bat": "Batch",
+    ".cmd": "Batch",
+}
+
+FILENAME_LANGUAGES: Dict[str, str] = {
+    "Makefile": "Make",
+    "GNUmakefile": "Make",
+    "CMakeLists.txt": "CMake",
+    "Dockerfile": "Dockerfile",
+}
+
+BUILD_TOOL_MARKERS: Dict[str, str] = {
+    "pyproject.toml": "pyproject",
+    "setup.py": "setuptools",
+    "setup.cfg": "setuptools",
+    "requirements.txt": "pip",
+    "Pipfile": "pipenv",
+    "poetry.lock": "poetry",
+    "tox.ini": "tox",
+    "noxfile.py": "nox",
+    "package.json": "npm",
+    "yarn.lock": "yarn",
+    "pnpm-lock.yaml": "pnpm",
+    "Cargo.toml": "cargo",
+    "go.mod": "go",
+    "pom.xml": "maven",
+    "build.gradle": "gradle",
+    "build.gradle.kts": "gradle",
+    "Makefile": "make",
+    "CMakeLists.txt": "cmake",
+    "meson.build": "meson",
+    "WORKSPACE": "bazel",
+    "BUILD.bazel": "bazel",
+    "Gemfile": "bundler",
+    "composer.json": "composer",
+}
+
+BUILD_TOOL_SUFFIXES: Dict[str, str] = {
+    ".csproj": "dotnet",
+    ".sln": "dotnet",
+}
+
+TEST_DIR_NAMES = {"test", "tests", "testing", "__tests__", "spec", "specs"}
+
+MAP_VERSION = 1
+MAP_COLUMNS = ["path", "language", "size", "mtime_ns", "code", "comment", "blank"]
+BINARY_SNIFF_BYTES = 8192
+
+
+@dataclass
+class FileStats:
+    path: str
+    language: str
+    size: int
+    mtime_ns: int
+    code: int
+    comment: int
+    blank: int
+
+    def as_row(self) -> list:
+        return [
+            self.path,
+            self.language,
+            self.size,
+            self.mtime_ns,
+            self.code,
+            self.comment,
+            self.blank,
+        ]
+
+
+@dataclass
+class RepoMap:
+    root: Path
+    files: List[FileStats]
+    build_tools: Dict[str, List[str]]
+    test_dirs: List[str]
+    seconds: float = 0.0
+    cached_files: int = 0
+    truncated: bool = False
+
+    def languages(self) -> Dict[str, LanguageStats]:
+        totals: Dict[str, LanguageStats] = {}
+        for stats in self.files:
+            entry = totals.setdefault(stats.language, LanguageStats())
+            entry.files += 1
+            entry.code += stats.code
+            entry.comment += stats.comment
+            entry.blank += stats.blank
+        return dict(sorted(totals.items(), key=lambda item: -item[1].code))
+
+    def summary(self, path: Optional[Path] = None) -> RepoMapSummary:
+        return RepoMapSummary(
+            files=len(self.files),
+            languages=self.languages(),
+            build_tools=self.build_tools,
+            test_dirs=self.test_dirs,
+            path=str(path) if path else None,
+            seconds=round(self.seconds, 3),
+            cached_files=self.cached_files,
+            truncated=self.truncated,
+        )
+
+    def to_json(self) -> str:
+        data = {
+            "version": MAP_VERSION,
+            "root": str(self.root),
+            "columns": MAP_COLUMNS,
+            "files": [stats.as_row() for stats in self.files],
+            "build_tools": self.build_tools,
+            "test_dirs": self.test_dirs,
+        }
+        return json.dumps(data, separators=(",", ":"))
+
+
+def classify_language(name: str) -> Optional[str]:
+    language = FILENAME_LANGUAGES.get(name)
+    if language:
+        return language
+    return EXTENSION_LANGUAGES.get(os.path.splitext(name)[1].lower())
+
+
+def count_lines(text: str, language: str) -> Tuple[int, int, int]:
+    line_prefixes, block = COMMENT_SYNTAX.get(language, ((), None))
+    code = comment = blank = 0
+    in_block = False
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            blank += 1
+            continue
+        if in_block:
+            comment += 1
+            if block and block[1] in line:
+                in_block = False
+            continue
+        if line_prefixes and line.startswith(line_prefixes):
+            comment += 1
+            continue
+        if block and line.startswith(block[0]):
+            comment += 1
+            in_block = block[1] not in line[len(block[0]) :]
+            continue
+        code += 1
+    return code, comment, blank
+
+
+def _analyze_file(full_path: str, rel_path: str, size: int, mtime_ns: int) -> Optional[FileStats]:
+    language = classify_language(os.path.basename(full_path))
+    if language is None:
+        return None
+    try:
+        with open(full_path, "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return None
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    code, comment, blank = count_lines(data.decode("utf-8", errors="replace"), language)
+    return FileStats(
+        path=rel_path,
+        language=language,
+        size=size,
+        mtime_ns=mtime_ns,
+        code=code,
+        comment=comment,
+        blank=blank,
+    )
+
+
+def _analyze_batch(batch: List[Tuple[str, str, int, int]]) -> List[Optional[FileStats]]:
+    return [_analyze_file(*item) for item in batch]
+
+
+class RepoMapBuilder:
+    def __init__(
+        self,
+        artifact_path: Optional[Path] = None,
+        max_workers: Optional[int] = None,
+        parallel_threshold: int = 256,
+        batch_size: int = 256,
+        ignore_dirnames: Optional[set[str]] = None,
+    ) -> None:
+        self.artifact_path = artifact_path
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        self.batch_size = batch_size
+        self.ignore_dirnames = ignore_dirnames or set(DEFAULT_IGNORE_DIRS)
+
+    def build(self, root: Path, max_files: Optional[int] = None) -> RepoMap:
+        """Map ``root``; stops after ``max_files`` walked files when given.
+
+        Files whose size and mtime match the previous artifact reuse their
+        stats, and the artifact is only rewritten when something changed.
+        """
+        started = time.perf_counter()
+        root = root.resolve()
+        previous = self._load_artifact(root)
+        cache = {row[0]: FileStats(*row) for row in previous.get("files", [])}
+        files: List[FileStats] = []
+        pending: List[Tuple[str, str, int, int]] = []
+        build_tools: Dict[str, set[str]] = {}
+        test_dirs: set[str] = set()
+        cached_files = 0
+        artifact = str(self.artifact_path.resolve()) if self.artifact_path else None
+        walked = 0
+        truncated = False
+
+        for full_path, rel_path, size, mtime_ns in self._walk(root):
+            if full_path == artifact:
+                continue
+            if max_files is not None and walked >= max_files:
+                truncated = True
+                break
+            walked += 1
+            name = os.path.basename(rel_path)
+            rel_dir = os.path.dirname(rel_path) or "."
+            tool = BUILD_TOOL_MARKERS.get(name) or BUILD_TOOL_SUFFIXES.get(
+                os.path.splitext(name)[1]
+            )
+            if tool:
+                build_tools.setdefault(tool, set()).add(rel_dir)
+            test_dir = _test_dir(rel_path)
+            if test_dir:
+                test_dirs.add(test_dir)
+            if classify_language(name) is None:
+                continue
+            cached = cache.get(rel_path)
+            if cached is not None and cached.size == size and cached.mtime_ns == mtime_ns:
+                files.append(cached)
+                cached_files += 1
+                continue
+            pending.append((full_path, rel_path, size, mtime_ns))
+
+        files.extend(stats for stats in self._analyze(pending) if stats is not None)
+        files.sort(key=lambda stats: stats.path)
+        repo_map = RepoMap(
+            root=root,
+            files=files,
+            build_tools={tool: sorted(dirs) for tool, dirs in sorted(build_tools.items())},
+            test_dirs=sorted(test_dirs),
+            cached_files=cached_files,
+            truncated=truncated,
+        )
+        repo_map.seconds = time.perf_counter() - started
+        unchanged = (
+            not pending
+            and len(files) == len(cache)
+            and previous.get("build_tools") == repo_map.build_tools
+            and previous.get("test_dirs") == repo_map.test_dirs
+        )
+        if self.artifact_path is not None and not unchanged:
+            self.artifact_path.parent.mkdir(parents=True, exist_ok=True)
+            self.artifact_path.write_text(repo_map.to_json(), encoding="utf-8")
+        return repo_map
+
+    def _analyze(self, pending: List[Tuple[str, str, int, int]]) -> List[Optional[FileStats]]:
+        if len(pending) < self.parallel_threshold:
+            return _analyze_batch(pending)
+        batches = [
+            pending[index : index + self.batch_size]
+            for index in range(0, len(pending), self.batch_size)
+        ]
+        results: List[Optional[FileStats]] = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch_result in pool.map(_analyze_batch, batches):
+                results.extend(batch_result)
+        return results
+
+    def _walk(self, root: Path) -> Iterator[Tuple[str, str, int, int]]:
+        stack = [str(root)]
+        prefix_len = len(str(root)) + 1
+        while stack:
+            current = stack.pop()
+            try:
+                # Sorted so a max_files cut is the same from run to run.
+                entries = sorted(os.scandir(current), key=lambda entry: entry.name, reverse=True)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.ignore_dirnames:
+                            stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        rel_path = entry.path[prefix_len:].replace(os.sep, "/")
+                        yield entry.path, rel_path, st.st_size, st.st_mtime_ns
+                except OSError:
+                    continue
+
+    def _load_artifact(self, root: Path) -> dict:
+        if self.artifact_path is None or not self.artifact_path.exists():
+            return {}
+        try:
+            data = json.loads(self.artifact_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != MAP_VERSION or data.get("root") != str(root):
+            return {}
+        return data
+
+
+def _test_dir(rel_path: str) -> Optional[str]:
+    parts = rel_path.split("/")
+    for index, part in enumerate(parts[:-1]):
+        if part in TEST_DIR_NAMES:
+            return "/".join(parts[: index + 1])
+    stem, ext = os.path.splitext(parts[-1])
+    if ext == ".py":
+        is_test = stem.startswith("test_") or stem.endswith("_test")
+    else:
+        is_test = stem.endswith((".test", ".spec", "_test"))
+    if is_test:
+        return "/".join(parts[:-1]) or "."
+    return None
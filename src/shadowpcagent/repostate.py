@@ -0,0 +1,203 @@
+import hashlib
+import os
+import struct
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+_HEADER = struct.Struct(">4sLL")
+_STAT = struct.Struct(">10L")
+_FLAG_EXTENDED = 0x4000
+_NAME_MASK = 0x0FFF
+
+
+@dataclass
+class IndexEntry:
+    path: str
+    mtime_ns: int
+    size: int
+
+
+def find_repo(start: Path) -> Optional[Tuple[Path, Path]]:
+    """(work tree root, git dir) for ``start``, following ``gitdir:`` files."""
+    for candidate in [start, *start.parents]:
+        dot_git = candidate / ".git"
+        if dot_git.is_dir():
+            return candidate, dot_git
+        if dot_git.is_file():
+            content = dot_git.read_text(encoding="utf-8").strip()
+            if content.startswith("gitdir:"):
+                target = Path(content[len("gitdir:"):].strip())
+                return candidate, target if target.is_absolute() else (candidate / target).resolve()
+    return None
+
+
+def read_head(git_dir: Path) -> Optional[str]:
+    """Commit id HEAD points at, read from refs without running git."""
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    if not head.startswith("ref:"):
+        return head
+    ref = head[len("ref:"):].strip()
+    common = git_dir
+    commondir = git_dir / "commondir"
+    if commondir.exists():
+        common = (git_dir / commondir.read_text(encoding="utf-8").strip()).resolve()
+    for base in (git_dir, common):
+        try:
+            return (base / ref).read_text(encoding="utf-8").strip()
+        except OSError:
+            continue
+    try:
+        for line in (common / "packed-refs").read_text(encoding="utf-8").splitlines():
+            if line.endswith(" " + ref):
+                return line.split(" ", 1)[0]
+    except OSError:
+        pass
+    return f"unborn:{ref}"
+
+
+def read_index(path: Path) -> List[IndexEntry]:
+    """Entries of a git index file (versions 2-4, SHA-1 object ids).
+
+    Raises ValueError for anything it does not understand.
+    """
+    data = path.read_bytes()
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"Unsupported git index: {signature!r} v{version}")
+    offset = _HEADER.size
+    entries: List[IndexEntry] = []
+    previous = b""
+    for _ in range(count):
+        start = offset
+        fields = _STAT.unpack_from(data, offset)
+        offset += _STAT.size + 20  # stat fields + object id
+        (flags,) = struct.unpack_from(">H", data, offset)
+        offset += 2
+        if flags & _FLAG_EXTENDED:
+            if version < 3:
+                raise ValueError("Extended flags in a v2 index")
+            offset += 2
+        if version == 4:
+            strip, offset = _read_varint(data, offset)
+            end = data.index(b"\0", offset)
+            name = previous[: len(previous) - strip] + data[offset:end]
+            offset = end + 1
+        else:
+            length = flags & _NAME_MASK
+            end = data.index(b"\0", offset) if length == _NAME_MASK else offset + length
+            name = data[offset:end]
+            # Entries are NUL-padded to a multiple of eight bytes.
+            offset = start + ((end - start + 8) // 8) * 8
+        previous = name
+        path = name.decode("utf-8", errors="surrogateescape")
+        entries.append(IndexEntry(path=path, mtime_ns=fields[2] * 10**9 + fields[3], size=fields[9]))
+    return entries
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    # git's offset encoding (varint.c), used for v4 path prefixes.
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
+
+
+def _stat_key(path: Path) -> Tuple[int, int]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return (-1, -1)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _unchanged(entry: IndexEntry, mtime_ns: int, size: int) -> bool:
+    if size != entry.size:
+        return False
+    if entry.mtime_ns % 10**9 == 0:
+        # Built without nanosecond timestamps: compare whole seconds.
+        return mtime_ns // 10**9 == entry.mtime_ns // 10**9
+    return mtime_ns == entry.mtime_ns
+
+
+def _dirty_from_index(root: Path, index_path: Path) -> Tuple[Dict[str, Tuple[int, int]], Dict[str, int]]:
+    index_mtime = index_path.stat().st_mtime_ns
+    dirty: Dict[str, Tuple[int, int]] = {}
+    directories: Dict[str, int] = {}
+    for entry in read_index(index_path):
+        mtime_ns, size = _stat_key(root / entry.path)
+        # Files touched at or after the index write are "racy" (as in git)
+        # and always counted as dirty.
+        if not _unchanged(entry, mtime_ns, size) or mtime_ns >= index_mtime:
+            dirty[entry.path] = (mtime_ns, size)
+        parent = os.path.dirname(entry.path)
+        while parent not in directories:
+            directories[parent] = _stat_key(root / parent)[0]
+            if not parent:
+                break
+            parent = os.path.dirname(parent)
+    return dirty, directories
+
+
+def _dirty_from_status(root: Path) -> Optional[Dict[str, Tuple[int, int]]]:
+    try:
+        completed = subprocess.run(
+            ["git", "status", "--porcelain", "-z", "--untracked-files=all"],
+            cwd=str(root),
+            capture_output=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    if completed.returncode != 0:
+        return None
+    dirty: Dict[str, Tuple[int, int]] = {}
+    for item in completed.stdout.decode("utf-8", errors="surrogateescape").split("\0"):
+        if len(item) > 3:
+            dirty[item[3:]] = _stat_key(root / item[3:])
+    return dirty
+
+
+def index_stat(start: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of the git index for ``start``; cheap, unlike repo_fingerprint."""
+    repo = find_repo(start.resolve())
+    return None if repo is None else _stat_key(repo[1] / "index")
+
+
+def repo_fingerprint(start: Path) -> Optional[str]:
+    """Hash of HEAD, index mtime and the dirty set of the repo containing ``start``.
+
+    The dirty set comes from comparing the git index with the working tree
+    in-process. Directory mtimes of tracked paths are included so files
+    being created or deleted also change the fingerprint. If the index cannot
+    be parsed, ``git status`` is used instead. Returns None outside a git
+    repository. This stats every tracked file; callers memoise it.
+    """
+    repo = find_repo(start.resolve())
+    if repo is None:
+        return None
+    root, git_dir = repo
+    index_path = git_dir / "index"
+    digest = hashlib.sha1()
+    digest.update(f"head:{read_head(git_dir)}\n".encode("utf-8"))
+    digest.update(f"index:{_stat_key(index_path)}\n".encode("utf-8"))
+    try:
+        dirty, directories = _dirty_from_index(root, index_path)
+    except (OSError, ValueError, struct.error):
+        status = _dirty_from_status(root)
+        if status is None:
+            return None
+        dirty, directories = status, {}
+    for path, key in sorted(dirty.items()):
+        digest.update(f"dirty:{path}:{key}\n".encode("utf-8", errors="surrogateescape"))
+    for path, mtime_ns in sorted(directories.items()):
+        digest.update(f"dir:{path}:{mtime_ns}\n".encode("utf-8", errors="surrogateescape"))
+    return digest.hexdigest()
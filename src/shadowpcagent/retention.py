@@ -0,0 +1,183 @@
+import gzip
+import os
+import shutil
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from shadowpcagent.history import RunHistory
+
+DEFAULT_MAX_TOTAL_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE = timedelta(days=90)
+DEFAULT_HISTORY_MAX_BYTES = 8 * 1024 * 1024
+# A log written to more recently than this may belong to another live agent.
+DEFAULT_COMPRESS_GRACE = timedelta(minutes=15)
+
+
+@dataclass
+class RetentionResult:
+    compressed: List[Path] = field(default_factory=list)
+    swept: List[Path] = field(default_factory=list)
+    rotated: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+    freed_bytes: int = 0
+
+
+def gzip_file(path: Path) -> Path:
+    """Compress ``path`` to ``path.gz`` via a temp file, then remove the original.
+
+    The archive keeps the original mtime so age budgets still apply to it.
+    """
+    target = path.with_name(path.name + ".gz")
+    tmp = path.with_name(f".{path.name}.gz.tmp")
+    stat = path.stat()
+    with path.open("rb") as source, gzip.open(tmp, "wb") as sink:
+        shutil.copyfileobj(source, sink)
+    os.utime(tmp, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp, target)
+    path.unlink()
+    return target
+
+
+class LogRetention:
+    """Keeps run logs and run history inside size and age budgets.
+
+    - ``run-*.jsonl`` logs and rotated history segments are gzipped once
+      nothing has written to them for ``compress_grace``; other agents'
+      live logs are only known by their recent mtime
+    - ``run-history.jsonl`` is rotated to ``run-history-<timestamp>.jsonl``
+      once it exceeds ``history_max_bytes``
+    - archived files are deleted oldest-first past ``max_age`` or while the
+      total exceeds ``max_total_bytes``; the active log and live history are
+      never touched
+    - ``.*.gz.tmp`` leftovers of an interrupted compression are deleted once
+      idle for ``compress_grace``
+    - start() runs the compression pass on a daemon thread; stop() ends it
+      after the file in progress so interpreter exit cannot cut one short
+    """
+
+    def __init__(
+        self,
+        log_dir: Path,
+        history_path: Optional[Path] = None,
+        max_total_bytes: Optional[int] = DEFAULT_MAX_TOTAL_BYTES,
+        max_age: Optional[timedelta] = DEFAULT_MAX_AGE,
+        history_max_bytes: Optional[int] = DEFAULT_HISTORY_MAX_BYTES,
+        compress_grace: timedelta = DEFAULT_COMPRESS_GRACE,
+    ) -> None:
+        self.log_dir = log_dir
+        self.history_path = history_path
+        self.max_total_bytes = max_total_bytes
+        self.max_age = max_age
+        self.history_max_bytes = history_max_bytes
+        self.compress_grace = compress_grace
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def rotate_history(self) -> Optional[Path]:
+        path = self.history_path
+        if path is None or self.history_max_bytes is None or not path.exists():
+            return None
+        if path.stat().st_size <= self.history_max_bytes:
+            return None
+        # The index is only caught up on read; count the tail before it moves.
+        RunHistory(path).refresh()
+        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        rotated = path.with_name(f"{path.stem}-{timestamp}{path.suffix}")
+        os.replace(path, rotated)
+        return rotated
+
+    def _closed_plain(self, active: Optional[Path], now: datetime) -> List[Path]:
+        paths = list(self.log_dir.glob("run-*.jsonl")) if self.log_dir.exists() else []
+        if self.history_path is not None and self.history_path.parent.exists():
+            paths.extend(self.history_path.parent.glob(f"{self.history_path.stem}-*{self.history_path.suffix}"))
+        skip = {p.resolve() for p in (active, self.history_path) if p is not None}
+        closed = []
+        for path in paths:
+            try:
+                idle = now - datetime.utcfromtimestamp(path.stat().st_mtime) >= self.compress_grace
+            except OSError:
+                continue
+            if idle and path.resolve() not in skip:
+                closed.append(path)
+        return sorted(closed)
+
+    def _stale_temps(self, now: datetime) -> List[Path]:
+        paths = list(self.log_dir.glob(".run-*.jsonl.gz.tmp")) if self.log_dir.exists() else []
+        if self.history_path is not None and self.history_path.parent.exists():
+            paths.extend(
+                self.history_path.parent.glob(f".{self.history_path.stem}-*{self.history_path.suffix}.gz.tmp")
+            )
+        stale = []
+        for path in paths:
+            try:
+                # A fresh one may belong to another agent compressing right now.
+                if now - datetime.utcfromtimestamp(path.stat().st_mtime) >= self.compress_grace:
+                    stale.append(path)
+            except OSError:
+                continue
+        return sorted(stale)
+
+    def _archived(self) -> List[Path]:
+        paths = list(self.log_dir.glob("run-*.jsonl.gz")) if self.log_dir.exists() else []
+        if self.history_path is not None and self.history_path.parent.exists():
+            paths.extend(self.history_path.parent.glob(f"{self.history_path.stem}-*{self.history_path.suffix}.gz"))
+        return paths
+
+    def run(
+        self, active: Optional[Path] = None, now: Optional[datetime] = None, rotate: bool = True
+    ) -> RetentionResult:
+        result = RetentionResult()
+        now = now or datetime.utcnow()
+        for path in self._stale_temps(now):
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            result.swept.append(path)
+        rotated = self.rotate_history() if rotate else None
+        if rotated is not None:
+            result.rotated.append(rotated)
+        for path in self._closed_plain(active, now):
+            if self._stopped.is_set():
+                return result
+            try:
+                result.compressed.append(gzip_file(path))
+            except OSError:
+                # Still open elsewhere (e.g. on Windows); try again next run.
+                continue
+
+        archived = sorted(
+            ((p, p.stat()) for p in self._archived()), key=lambda item: item[1].st_mtime, reverse=True
+        )
+        total = 0
+        for path, stat in archived:
+            age = now - datetime.utcfromtimestamp(stat.st_mtime)
+            expired = self.max_age is not None and age > self.max_age
+            over_budget = self.max_total_bytes is not None and total + stat.st_size > self.max_total_bytes
+            if expired or over_budget:
+                path.unlink()
+                result.removed.append(path)
+                result.freed_bytes += stat.st_size
+            else:
+                total += stat.st_size
+        return result
+
+    def start(self, active: Optional[Path] = None) -> threading.Thread:
+        """Rotate history now (cheap) and compress/prune on a background thread."""
+        self.rotate_history()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self.run, kwargs={"active": active, "rotate": False}, name="log-retention", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        """Let the background pass finish its current file and wait for it."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
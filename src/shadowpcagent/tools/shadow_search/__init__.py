@@ -1,3 +1,4 @@
 ﻿"""Local file search tool (SQLite path index)."""
 from .index import build_sqlite_index
-from .query import search_sqlite
+from .query import search_sqlite, search_symbols
+from .symbols import build_symbol_index
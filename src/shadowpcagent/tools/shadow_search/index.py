@@ -7,6 +7,8 @@ import time
 from pathlib import Path
 from typing import Iterable, Sequence
 
+from shadowpcagent.metrics import record_index_build
+
 # repo_root = ...\ShadowPCAgent (because this file lives at src/shadowpcagent/tools/shadow_search/index.py)
 REPO_ROOT = Path(__file__).resolve().parents[4]
 DATA_DIR = REPO_ROOT / "data"
@@ -173,11 +175,13 @@ def build_sqlite_index(
             )
             conn.commit()
 
+        seconds = time.time() - t0
+        record_index_build("files", count, seconds)
         return {
             "db_path": str(dbp),
             "roots": [str(r) for r in roots_n],
             "files_indexed": count,
-            "seconds": round(time.time() - t0, 3),
+            "seconds": round(seconds, 3),
             "reset": reset,
         }
     finally:
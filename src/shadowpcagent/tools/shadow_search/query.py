@@ -1,10 +1,12 @@
 ﻿from __future__ import annotations
 
+import difflib
 import sqlite3
 from pathlib import Path
 from typing import Sequence
 
 from .index import DEFAULT_DB_PATH
+from .symbols import DEFAULT_SYMBOL_DB_PATH
 
 
 def search_sqlite(
@@ -33,3 +35,89 @@ def search_sqlite(
         return [{"path": r[0]} for r in rows]
     finally:
         conn.close()
+
+
+def _symbol_row(row: Sequence, match: str) -> dict:
+    return {
+        "qualname": row[0],
+        "name": row[1],
+        "kind": row[2],
+        "signature": row[3],
+        "path": row[4],
+        "lineno": row[5],
+        "end_lineno": row[6],
+        "match": match,
+    }
+
+
+def search_symbols(
+    term: str,
+    limit: int = 50,
+    db_path: str | Path | None = None,
+    *,
+    fuzzy: bool = True,
+) -> list[dict]:
+    """
+    Symbol lookup (case-insensitive) over the Python symbol index.
+
+    Tries, in order: exact qualname/name, qualname/name prefix (index range
+    scans), then a fuzzy subsequence match ranked by similarity.
+    Returns: [{"qualname", "name", "kind", "signature", "path", "lineno", ...}]
+    """
+    term = term.strip().strip("`")
+    if not term:
+        return []
+
+    dbp = Path(db_path) if db_path else Path(DEFAULT_SYMBOL_DB_PATH)
+    if not dbp.exists():
+        return []
+
+    columns = "qualname, name, kind, signature, path, lineno, end_lineno"
+    conn = sqlite3.connect(str(dbp))
+    try:
+        out: list[dict] = []
+        seen: set[tuple] = set()
+
+        def collect(rows: Sequence[Sequence], match: str) -> None:
+            for row in rows:
+                key = (row[4], row[5], row[0])
+                if key in seen or len(out) >= limit:
+                    continue
+                seen.add(key)
+                out.append(_symbol_row(row, match))
+
+        field = "qualname" if "." in term else "name"
+        collect(
+            conn.execute(
+                f"SELECT {columns} FROM symbols WHERE {field} = ? ORDER BY path, lineno LIMIT ?;",
+                (term, int(limit)),
+            ).fetchall(),
+            "exact",
+        )
+        if len(out) < limit:
+            prefix = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            collect(
+                conn.execute(
+                    f"SELECT {columns} FROM symbols WHERE {field} LIKE ? ESCAPE '\\' "
+                    f"ORDER BY length({field}), path LIMIT ?;",
+                    (prefix, int(limit)),
+                ).fetchall(),
+                "prefix",
+            )
+        if fuzzy and len(out) < limit:
+            leaf = term.rsplit(".", 1)[-1]
+            pattern = "%" + "%".join(ch for ch in leaf if ch not in "%_\\") + "%"
+            candidates = conn.execute(
+                f"SELECT {columns} FROM symbols WHERE name LIKE ? LIMIT ?;",
+                (pattern, int(limit) * 20),
+            ).fetchall()
+            lowered = term.lower()
+            candidates.sort(
+                key=lambda row: -difflib.SequenceMatcher(
+                    None, lowered, (row[0] if "." in term else row[1]).lower()
+                ).ratio()
+            )
+            collect(candidates, "fuzzy")
+        return out
+    finally:
+        conn.close()
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import ast
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Sequence
+
+from shadowpcagent.metrics import record_index_build
+
+from .index import DATA_DIR, DEFAULT_IGNORE_DIRS, _norm_roots
+
+# Lives next to the path index (data/shadow_search.sqlite).
+DEFAULT_SYMBOL_DB_PATH = DATA_DIR / "shadow_symbols.sqlite"
+
+SOURCE_ROOT_DIRNAMES = {"src", "lib"}
+
+SymbolRow = tuple  # (path, name, qualname, kind, signature, lineno, end_lineno, parent)
+ImportRow = tuple  # (path, module, name, alias, lineno)
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            module TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            error TEXT
+        );
+        CREATE TABLE IF NOT EXISTS symbols (
+            path TEXT NOT NULL,
+            name TEXT NOT NULL COLLATE NOCASE,
+            qualname TEXT NOT NULL COLLATE NOCASE,
+            kind TEXT NOT NULL,
+            signature TEXT NOT NULL,
+            lineno INTEGER NOT NULL,
+            end_lineno INTEGER NOT NULL,
+            parent TEXT
+        );
+        CREATE TABLE IF NOT EXISTS imports (
+            path TEXT NOT NULL,
+            module TEXT NOT NULL,
+            name TEXT,
+            alias TEXT,
+            lineno INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_files_module ON files(module);
+        CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name);
+        CREATE INDEX IF NOT EXISTS idx_symbols_qualname ON symbols(qualname);
+        CREATE INDEX IF NOT EXISTS idx_symbols_path ON symbols(path);
+        CREATE INDEX IF NOT EXISTS idx_imports_module ON imports(module);
+        CREATE INDEX IF NOT EXISTS idx_imports_path ON imports(path);
+        """
+    )
+
+
+def module_name_for(path: Path, root: Path) -> str:
+    """Dotted module name for a .py file, treating src/ and lib/ as source roots."""
+    try:
+        parts = list(path.relative_to(root).parts)
+    except ValueError:
+        parts = [path.name]
+    if len(parts) > 1 and parts[0] in SOURCE_ROOT_DIRNAMES:
+        parts = parts[1:]
+    parts[-1] = parts[-1][: -len(".py")] if parts[-1].endswith(".py") else parts[-1]
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _resolve_relative(module: str, is_package: bool, level: int, target: str | None) -> str:
+    if level == 0:
+        return target or ""
+    parts = module.split(".")
+    keep = len(parts) - level + (1 if is_package else 0)
+    base = parts[: max(keep, 0)]
+    if target:
+        base.append(target)
+    return ".".join(base)
+
+
+def _signature(node: ast.AST) -> str:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        sig = f"({ast.unparse(node.args)})"
+        if node.returns is not None:
+            sig += f" -> {ast.unparse(node.returns)}"
+        return sig
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases]
+        bases += [ast.unparse(k) for k in node.keywords]
+        return f"({', '.join(bases)})" if bases else ""
+    return ""
+
+
+def _parse_file(path: str, module: str) -> tuple[str, list[SymbolRow], list[ImportRow], str | None]:
+    try:
+        with open(path, "rb") as handle:
+            tree = ast.parse(handle.read(), filename=path)
+    except (OSError, SyntaxError, ValueError) as exc:
+        return path, [], [], f"{type(exc).__name__}: {exc}"
+
+    is_package = os.path.basename(path) == "__init__.py"
+    symbols: list[SymbolRow] = []
+    imports: list[ImportRow] = []
+
+    def visit(body: list[ast.stmt], parent: str | None) -> None:
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = f"{parent}.{node.name}" if parent else node.name
+                if isinstance(node, ast.ClassDef):
+                    kind = "class"
+                elif parent and not parent.endswith(">"):
+                    kind = "method"
+                else:
+                    kind = "function"
+                symbols.append(
+                    (
+                        path,
+                        node.name,
+                        qualname,
+                        kind,
+                        _signature(node),
+                        node.lineno,
+                        getattr(node, "end_lineno", node.lineno) or node.lineno,
+                        parent,
+                    )
+                )
+                child_parent = qualname if kind == "class" else f"{qualname}.<locals>"
+                visit(node.body, child_parent)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and parent is None:
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        end = getattr(node, "end_lineno", node.lineno) or node.lineno
+                        symbols.append(
+                            (path, target.id, target.id, "variable", "", node.lineno, end, None)
+                        )
+            elif isinstance(node, (ast.If, ast.Try, ast.With)):
+                nested = list(node.body) + list(getattr(node, "orelse", []))
+                nested += list(getattr(node, "finalbody", []))
+                for handler in getattr(node, "handlers", []):
+                    nested.extend(handler.body)
+                visit(nested, parent)
+
+    visit(tree.body, None)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append((path, alias.name, None, alias.asname, node.lineno))
+        elif isinstance(node, ast.ImportFrom):
+            target = _resolve_relative(module, is_package, node.level, node.module)
+            for alias in node.names:
+                imports.append((path, target, alias.name, alias.asname, node.lineno))
+
+    return path, symbols, imports, None
+
+
+def _parse_batch(batch: list[tuple[str, str]]) -> list[tuple[str, list, list, str | None]]:
+    return [_parse_file(path, module) for path, module in batch]
+
+
+def _iter_python_files(
+    root: Path, ignore_dirnames: set[str], follow_symlinks: bool
+) -> list[tuple[Path, int, int]]:
+    out: list[tuple[Path, int, int]] = []
+    if root.is_file():
+        if root.suffix == ".py":
+            st = root.stat()
+            out.append((root, st.st_mtime_ns, st.st_size))
+        return out
+    for dirpath, dirnames, filenames in os.walk(str(root), topdown=True, followlinks=follow_symlinks):
+        dirnames[:] = [d for d in dirnames if d not in ignore_dirnames]
+        for fn in filenames:
+            if not fn.endswith(".py"):
+                continue
+            fp = Path(dirpath) / fn
+            try:
+                st = fp.stat()
+            except OSError:
+                continue
+            out.append((fp, st.st_mtime_ns, st.st_size))
+    return out
+
+
+def _under_roots(path: str, roots: Sequence[Path]) -> bool:
+    # Component-wise: refreshing /a/b must not touch files indexed under /a/bc.
+    for root in roots:
+        prefix = str(root)
+        if path == prefix or path.startswith(prefix if prefix.endswith(os.sep) else prefix + os.sep):
+            return True
+    return False
+
+
+def build_symbol_index(
+    roots: Sequence[str | os.PathLike],
+    db_path: str | os.PathLike | None = None,
+    *,
+    reset: bool = False,
+    ignore_dirnames: set[str] | None = None,
+    follow_symlinks: bool = False,
+    max_workers: int | None = None,
+    parallel_threshold: int = 64,
+    batch_size: int = 64,
+) -> dict:
+    """
+    Build (or incrementally refresh) a SQLite index of Python definitions.
+
+    - Stores: definitions (qualname, kind, signature, line span) and imports
+    - Only files whose (mtime_ns, size) changed are reparsed
+    - Default DB: <repo>/data/shadow_symbols.sqlite
+    """
+    t0 = time.time()
+
+    roots_n = _norm_roots(roots)
+    if not roots_n:
+        raise ValueError("roots must not be empty")
+    ignore_dirnames = ignore_dirnames or set(DEFAULT_IGNORE_DIRS)
+
+    dbp = Path(db_path).expanduser() if db_path else DEFAULT_SYMBOL_DB_PATH
+    dbp.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(str(dbp))
+    try:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        _ensure_schema(conn)
+        if reset:
+            conn.executescript("DELETE FROM files; DELETE FROM symbols; DELETE FROM imports;")
+
+        known = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute("SELECT path, mtime_ns, size FROM files;")
+        }
+        seen: set[str] = set()
+        pending: list[tuple[str, str]] = []
+        stats: dict[str, tuple[int, int]] = {}
+        modules: dict[str, str] = {}
+
+        for root in roots_n:
+            if not root.exists():
+                continue
+            base = root.parent if root.is_file() else root
+            for fp, mtime_ns, size in _iter_python_files(root, ignore_dirnames, follow_symlinks):
+                key = str(fp)
+                seen.add(key)
+                if known.get(key) == (mtime_ns, size):
+                    continue
+                module = module_name_for(fp, base)
+                pending.append((key, module))
+                stats[key] = (mtime_ns, size)
+                modules[key] = module
+
+        removed = [p for p in known if _under_roots(p, roots_n) and p not in seen]
+        stale = removed + [path for path, _ in pending if path in known]
+        for path in stale:
+            conn.execute("DELETE FROM symbols WHERE path = ?;", (path,))
+            conn.execute("DELETE FROM imports WHERE path = ?;", (path,))
+            conn.execute("DELETE FROM files WHERE path = ?;", (path,))
+
+        if len(pending) < parallel_threshold:
+            results = _parse_batch(pending)
+        else:
+            batches = [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
+            results = []
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                for chunk in pool.map(_parse_batch, batches):
+                    results.extend(chunk)
+
+        symbol_count = 0
+        errors = 0
+        for path, symbols, imports, error in results:
+            mtime_ns, size = stats[path]
+            conn.execute(
+                "INSERT OR REPLACE INTO files(path, module, mtime_ns, size, error) VALUES (?, ?, ?, ?, ?);",
+                (path, modules[path], mtime_ns, size, error),
+            )
+            conn.executemany(
+                "INSERT INTO symbols(path, name, qualname, kind, signature, lineno, end_lineno, parent) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                symbols,
+            )
+            conn.executemany(
+                "INSERT INTO imports(path, module, name, alias, lineno) VALUES (?, ?, ?, ?, ?);",
+                imports,
+            )
+            symbol_count += len(symbols)
+            errors += 1 if error else 0
+        conn.commit()
+
+        seconds = time.time() - t0
+        record_index_build("symbols", len(results), seconds)
+        return {
+            "db_path": str(dbp),
+            "roots": [str(r) for r in roots_n],
+            "files_seen": len(seen),
+            "files_parsed": len(results),
+            "files_removed": len(removed),
+            "symbols_indexed": symbol_count,
+            "parse_errors": errors,
+            "seconds": round(seconds, 3),
+            "reset": reset,
+        }
+    finally:
+        conn.close()
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from shadowpcagent.fileio import write_files_atomically
+
+
+class Span:
+    """One timed phase; use as a context manager or call end() explicitly."""
+
+    __slots__ = ("tracer", "name", "category", "args", "start_ns", "end_ns", "depth", "parent", "tid")
+
+    def __init__(
+        self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any], depth: int, parent: Optional[str]
+    ) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.depth = depth
+        self.parent = parent
+        self.tid = threading.get_ident()
+        self.end_ns: Optional[int] = None
+        self.start_ns = time.perf_counter_ns()
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def end(self) -> Optional[float]:
+        if self.end_ns is None:
+            self.end_ns = time.perf_counter_ns()
+            self.tracer._finish(self)
+        return self.duration
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.end()
+
+    def record(self, origin_ns: int) -> dict:
+        return {
+            "name": self.name,
+            "category": self.category,
+            "parent": self.parent,
+            "depth": self.depth,
+            "start": round((self.start_ns - origin_ns) / 1e9, 6),
+            "duration": round(self.duration or 0.0, 6),
+            "args": self.args,
+        }
+
+
+class _NoopSpan:
+    """Returned by a disabled tracer; every operation is free."""
+
+    __slots__ = ()
+    duration = None
+
+    def end(self) -> None:
+        return None
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Nestable, monotonic spans for one run.
+
+    - spans nest per thread; each records its parent name and depth
+    - finished spans are kept for to_chrome_trace() and passed to ``sink``
+    - when disabled, start() returns a shared no-op span
+    """
+
+    def __init__(self, enabled: bool = True, sink: Optional[Callable[[dict], None]] = None) -> None:
+        self.enabled = enabled
+        self.sink = sink
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new trace; spans left open by a previous run are dropped."""
+        self.origin_ns = time.perf_counter_ns()
+        self._local.stack = []
+        with self._lock:
+            self.spans: List[Span] = []
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start(self, name: str, category: str = "phase", **args: Any):
+        if not self.enabled:
+            return NOOP_SPAN
+        stack = self._stack()
+        parent = stack[-1].name if stack else None
+        span = Span(self, name, category, args, depth=len(stack), parent=parent)
+        stack.append(span)
+        return span
+
+    span = start
+
+    def _finish(self, span: Span) -> None:
+        stack = self._stack()
+        if span in stack:
+            # Ending an outer span also closes anything left open inside it.
+            del stack[stack.index(span):]
+        with self._lock:
+            self.spans.append(span)
+        if self.sink is not None:
+            self.sink(span.record(self.origin_ns))
+
+    def to_chrome_trace(self) -> dict:
+        """Trace Event Format ("X" complete events, microseconds) for chrome://tracing or Perfetto."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s.start_ns, s.depth))
+        events: List[dict] = [
+            {"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": "shadowpcagent"}}
+        ]
+        for span in spans:
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": (span.start_ns - self.origin_ns) / 1000,
+                    "dur": ((span.end_ns or span.start_ns) - span.start_ns) / 1000,
+                    "pid": self.pid,
+                    "tid": span.tid,
+                    "args": span.args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_files_atomically({path: json.dumps(self.to_chrome_trace(), default=str)})
+        return path
@@ -0,0 +1,302 @@
+import gzip
+import hashlib
+import json
+import re
+import sqlite3
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+from shadowpcagent.logging_utils import list_run_logs
+
+DEFAULT_WAREHOUSE_PATH = Path(".shadowpcagent") / "log-warehouse.sqlite"
+
+_RELATIVE_TIME = re.compile(r"^(\d+)([dhm])$")
+_UNITS = {"d": "days", "h": "hours", "m": "minutes"}
+
+
+@dataclass
+class LogQuery:
+    event: Optional[str] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    status: Optional[str] = None
+    run: Optional[str] = None
+    contains: Optional[str] = None
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    def where(self) -> Tuple[str, list]:
+        clauses: List[str] = []
+        params: list = []
+        for column, value in (("event", self.event), ("status", self.status), ("run", self.run)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if self.since:
+            clauses.append("ts >= ?")
+            params.append(self.since)
+        if self.until:
+            clauses.append("ts < ?")
+            params.append(self.until)
+        if self.contains:
+            clauses.append("payload LIKE ?")
+            params.append(f"%{self.contains}%")
+        for name, value in self.fields.items():
+            clauses.append("CAST(json_extract(payload, ?) AS TEXT) = ?")
+            params.extend([f"$.{name}", value])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS sources (
+            path TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            head TEXT NOT NULL,
+            offset INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            source TEXT NOT NULL,
+            run TEXT,
+            event TEXT NOT NULL,
+            ts TEXT NOT NULL,
+            status TEXT,
+            error TEXT,
+            duration REAL,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_event_ts ON events(event, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+        CREATE INDEX IF NOT EXISTS idx_events_run ON events(run);
+        CREATE INDEX IF NOT EXISTS idx_events_status ON events(status);
+        CREATE INDEX IF NOT EXISTS idx_events_source ON events(source);
+        """
+    )
+
+
+def _logical_path(path: Path) -> str:
+    resolved = str(path.resolve())
+    return resolved[: -len(".gz")] if resolved.endswith(".gz") else resolved
+
+
+def _open_binary(path: Path) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+
+
+def _head(path: Path) -> Optional[str]:
+    """Hash of the first complete line; identifies a file across renames."""
+    try:
+        with _open_binary(path) as handle:
+            first = handle.readline()
+    except (OSError, EOFError):
+        return None
+    return hashlib.sha1(first).hexdigest() if first.endswith(b"\n") else None
+
+
+def _current_head(key: str) -> Optional[str]:
+    for candidate in (Path(key), Path(key + ".gz")):
+        if candidate.exists():
+            return _head(candidate)
+    return None
+
+
+def _row(source: str, kind: str, run: Optional[str], record: dict) -> tuple:
+    if kind == "history":
+        payload = {k: v for k, v in record.items() if k != "timestamp"}
+        event = "run_history"
+    else:
+        payload = record.get("payload") or {}
+        event = record.get("event", "")
+    status = payload.get("status") if isinstance(payload, dict) else None
+    error = payload.get("error") if isinstance(payload, dict) else None
+    duration = payload.get("duration") if isinstance(payload, dict) else None
+    return (
+        source,
+        run,
+        event,
+        record.get("timestamp", ""),
+        status if isinstance(status, str) else None,
+        str(error) if error else None,
+        float(duration) if isinstance(duration, (int, float)) else None,
+        json.dumps(payload),
+    )
+
+
+def parse_time(value: Optional[str], now: Optional[datetime] = None) -> Optional[str]:
+    """ISO timestamp bound for queries; also accepts relative '7d', '24h', '30m'."""
+    if not value:
+        return None
+    match = _RELATIVE_TIME.match(value.strip())
+    if match:
+        now = now or datetime.utcnow()
+        delta = timedelta(**{_UNITS[match.group(2)]: int(match.group(1))})
+        return (now - delta).isoformat() + "Z"
+    return value
+
+
+class LogWarehouse:
+    def __init__(self, db_path: Path = DEFAULT_WAREHOUSE_PATH) -> None:
+        self.db_path = db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute("PRAGMA journal_mode=WAL;")
+        _ensure_schema(conn)
+        return conn
+
+    def ingest(self, log_dir: Path, history_path: Optional[Path] = None) -> dict:
+        """Load new lines from run logs and run history; each line is loaded once.
+
+        Sources are tracked by logical path (without ``.gz``) and the
+        uncompressed byte offset already read, so compressed or rotated files
+        are not loaded twice.
+        """
+        started = time.perf_counter()
+        sources: List[Tuple[Path, str]] = [(p, "run") for p in list_run_logs(log_dir)]
+        if history_path is not None:
+            parent = history_path.parent
+            rotated = sorted(parent.glob(f"{history_path.stem}-*{history_path.suffix}*"))
+            live = [history_path] if history_path.exists() else []
+            sources.extend((p, "history") for p in rotated + live)
+
+        conn = self._connect()
+        files_loaded = 0
+        events_loaded = 0
+        try:
+            known = {row[0]: row for row in conn.execute("SELECT path, kind, head, offset FROM sources;")}
+            for path, kind in sources:
+                loaded = self._ingest_one(conn, known, path, kind)
+                if loaded:
+                    files_loaded += 1
+                    events_loaded += loaded
+        finally:
+            conn.close()
+        return {
+            "files_seen": len(sources),
+            "files_loaded": files_loaded,
+            "events_loaded": events_loaded,
+            "seconds": round(time.perf_counter() - started, 6),
+            "db_path": str(self.db_path),
+        }
+
+    def _ingest_one(self, conn: sqlite3.Connection, known: Dict[str, tuple], path: Path, kind: str) -> int:
+        key = _logical_path(path)
+        head = _head(path)
+        if head is None:
+            return 0
+        offset = 0
+        if key in known and known[key][2] == head:
+            offset = known[key][3]
+            if path.suffix != ".gz" and path.stat().st_size < offset:
+                offset = 0
+                conn.execute("DELETE FROM events WHERE source = ?;", (key,))
+        else:
+            # A renamed file (e.g. rotated history) keeps its rows and progress.
+            moved = next(
+                (
+                    row for row in known.values()
+                    if row[0] != key and row[1] == kind and row[2] == head and _current_head(row[0]) != head
+                ),
+                None,
+            )
+            if key in known:
+                conn.execute("DELETE FROM events WHERE source = ?;", (key,))
+            if moved is not None:
+                offset = moved[3]
+                conn.execute("UPDATE events SET source = ? WHERE source = ?;", (key, moved[0]))
+                conn.execute("DELETE FROM sources WHERE path = ?;", (moved[0],))
+                del known[moved[0]]
+
+        run = Path(key).stem if kind == "run" else None
+        rows = []
+        with _open_binary(path) as handle:
+            handle.seek(offset)
+            for raw in handle:
+                if not raw.endswith(b"\n"):
+                    break  # still being written; pick it up next time
+                offset += len(raw)
+                if not raw.strip():
+                    continue
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                rows.append(_row(key, kind, run, record))
+        with conn:
+            conn.executemany(
+                "INSERT INTO events(source, run, event, ts, status, error, duration, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                rows,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sources(path, kind, head, offset) VALUES (?, ?, ?, ?);",
+                (key, kind, head, offset),
+            )
+        known[key] = (key, kind, head, offset)
+        return len(rows)
+
+    def query(self, query: LogQuery, limit: int = 100) -> List[dict]:
+        where, params = query.where()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT run, event, ts, status, error, duration, payload FROM events{where} "
+                "ORDER BY ts DESC LIMIT ?;",
+                params + [int(limit)],
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "run": r[0],
+                "event": r[1],
+                "timestamp": r[2],
+                "status": r[3],
+                "error": r[4],
+                "duration": r[5],
+                "payload": json.loads(r[6]),
+            }
+            for r in rows
+        ]
+
+    def runs(self, query: LogQuery) -> List[str]:
+        where, params = query.where()
+        where = f"{where} AND run IS NOT NULL" if where else " WHERE run IS NOT NULL"
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT run FROM events{where} GROUP BY run ORDER BY MIN(ts);", params
+            ).fetchall()
+        finally:
+            conn.close()
+        return [r[0] for r in rows]
+
+    def stats(self, query: LogQuery, field_name: str) -> dict:
+        """count/min/median/mean/max of a numeric column or payload field."""
+        where, params = query.where()
+        if field_name == "duration":
+            expression, select_params = "duration", []
+        else:
+            expression, select_params = "json_extract(payload, ?)", [f"$.{field_name}"]
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT {expression} FROM events{where};", select_params + params).fetchall()
+        finally:
+            conn.close()
+        values = [float(r[0]) for r in rows if isinstance(r[0], (int, float))]
+        if not values:
+            return {"field": field_name, "count": 0}
+        return {
+            "field": field_name,
+            "count": len(values),
+            "min": min(values),
+            "median": statistics.median(values),
+            "mean": statistics.fmean(values),
+            "max": max(values),
+        }
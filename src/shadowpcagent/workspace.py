@@ -1,6 +1,10 @@
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from shadowpcagent.diffing import file_diff
+from shadowpcagent.fileio import write_files_atomically
 
 
 @dataclass
@@ -29,3 +33,109 @@ class WorkspaceScanner:
             if len(files) >= max_files:
                 break
         return WorkspaceScan(root=self.root, files=files, file_types=file_types)
+
+
+def _read_disk(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+class OverlayWorkspace:
+    """Copy-on-write view of a repository.
+
+    Reads fall through to disk once and are cached; writes and deletes stay in
+    memory until commit(), which checks the on-disk base is unchanged and then
+    writes every file atomically.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root.resolve()
+        self._lock = threading.Lock()
+        self._base: Dict[Path, Optional[bytes]] = {}
+        self._overlay: Dict[Path, Optional[str]] = {}
+
+    def resolve(self, path: Path) -> Path:
+        path = Path(path)
+        return (path if path.is_absolute() else self.root / path).resolve()
+
+    def _base_bytes(self, key: Path) -> Optional[bytes]:
+        if key not in self._base:
+            self._base[key] = _read_disk(key)
+        return self._base[key]
+
+    def read_bytes(self, path: Path) -> Optional[bytes]:
+        key = self.resolve(path)
+        with self._lock:
+            if key in self._overlay:
+                text = self._overlay[key]
+                return None if text is None else text.encode("utf-8")
+            return self._base_bytes(key)
+
+    def read_text(self, path: Path) -> Optional[str]:
+        data = self.read_bytes(path)
+        return None if data is None else data.decode("utf-8")
+
+    def exists(self, path: Path) -> bool:
+        return self.read_bytes(path) is not None
+
+    def write_text(self, path: Path, text: str) -> None:
+        self._stage(path, text)
+
+    def delete(self, path: Path) -> None:
+        self._stage(path, None)
+
+    def _stage(self, path: Path, text: Optional[str]) -> None:
+        key = self.resolve(path)
+        with self._lock:
+            self._base_bytes(key)
+            self._overlay[key] = text
+
+    def changes(self) -> Dict[Path, Optional[str]]:
+        with self._lock:
+            return {
+                key: text
+                for key, text in self._overlay.items()
+                if (None if text is None else text.encode("utf-8")) != self._base[key]
+            }
+
+    def diff(self) -> str:
+        """One git-style diff of every staged change, relative to the root."""
+        sections: List[str] = []
+        for key, text in sorted(self.changes().items()):
+            base = self._base[key]
+            rel = self._relative(key)
+            old = None if base is None else base.decode("utf-8")
+            body = file_diff(old, text, fromfile=f"a/{rel}", tofile=f"b/{rel}")
+            if body:
+                sections.append(f"diff --git a/{rel} b/{rel}")
+                sections.extend(body)
+        return "\n".join(sections) + "\n" if sections else ""
+
+    def commit(self) -> List[Path]:
+        """Write all staged changes to disk at once and clear the overlay.
+
+        Raises ValueError if a file changed on disk since it was first read,
+        and OSError (after rolling back) if the write itself fails.
+        """
+        updates = self.changes()
+        for key in updates:
+            if _read_disk(key) != self._base[key]:
+                raise ValueError(f"Workspace base changed on disk: {self._relative(key)}")
+        write_files_atomically(updates)
+        with self._lock:
+            for key, text in updates.items():
+                self._base[key] = None if text is None else text.encode("utf-8")
+            self._overlay.clear()
+        return sorted(updates)
+
+    def discard(self) -> None:
+        with self._lock:
+            self._overlay.clear()
+
+    def _relative(self, key: Path) -> str:
+        try:
+            return key.relative_to(self.root).as_posix()
+        except ValueError:
+            return key.as_posix()
@@ -0,0 +1,275 @@
+import importlib
+import json
+import sys
+import tracemalloc
+import types
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent.config import AgentConfig
+from shadowpcagent.editor import CodemodRequest, EditRequest
+
+
+class FakeGuiExecutor:
+    def __init__(self) -> None:
+        self.actions = []
+
+    def perform_action(self, action: str) -> types.SimpleNamespace:
+        self.actions.append(action)
+        return types.SimpleNamespace(action=action, succeeded=True, timestamp="2026-01-01T00:00:00Z")
+
+
+@pytest.fixture
+def core(monkeypatch: pytest.MonkeyPatch):
+    # The real GUI module needs tkinter and a display; the orchestrator only
+    # needs something with perform_action().
+    monkeypatch.setitem(sys.modules, "shadowpcagent.gui", types.SimpleNamespace(GuiExecutor=FakeGuiExecutor))
+    monkeypatch.delitem(sys.modules, "shadowpcagent.core", raising=False)
+    module = importlib.import_module("shadowpcagent.core")
+    yield module
+    sys.modules.pop("shadowpcagent.core", None)
+
+
+def test_orchestrator_run_smoke(core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    target = repo / "app.py"
+    target.write_text("value = 1\n", encoding="utf-8")
+    orchestrator = core.Orchestrator(
+        allowlist={sys.executable},
+        log_dir=tmp_path / "logs",
+        draft_dir=tmp_path / "drafts",
+        metrics_path=tmp_path / "metrics.prom",
+    )
+
+    summary = orchestrator.run(
+        task="bump value",
+        approve_sensitive=False,
+        repo_root=repo,
+        command=f"{sys.executable} -c pass",
+        draft_note=None,
+        edit_request=EditRequest(path=target, find_text="1", replace_text="2", apply=True),
+        max_files=50,
+        plan_only=False,
+        apply_draft_path=None,
+        dry_run_apply=False,
+    )
+
+    assert summary.status == "completed"
+    assert all(action.succeeded for action in summary.actions), summary.actions
+    assert target.read_text(encoding="utf-8") == "value = 2\n"
+    assert summary.test_selection is None  # run_tests is off: no index rebuild
+    assert orchestrator.gui_executor.actions == ["Open application", "Execute task steps"]
+    assert summary.flight_recorder_path is None
+    trace = json.loads(Path(summary.trace_path).read_text(encoding="utf-8"))
+    assert "Orchestrator.run" in {event["name"] for event in trace["traceEvents"]}
+    assert Path(summary.run_summary_path).exists()
+    assert "shadowpcagent_runs_total" in (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+    assert "run_summary" in orchestrator.logger.path.read_text(encoding="utf-8")
+    orchestrator.close()
+    assert not orchestrator.logger._writer._thread.is_alive()
+    assert not orchestrator.run_history._writer._thread.is_alive()
+    assert orchestrator.retention._thread is None
+
+
+def test_orchestrator_can_run_twice(core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    orchestrator = core.Orchestrator(
+        allowlist={sys.executable}, log_dir=tmp_path / "logs", draft_dir=tmp_path / "drafts", metrics_path=None
+    )
+
+    for task in ("first", "second"):
+        summary = orchestrator.run(
+            task=task,
+            approve_sensitive=False,
+            repo_root=tmp_path,
+            command=f"{sys.executable} -c pass",
+            draft_note=None,
+            edit_request=None,
+            max_files=10,
+            plan_only=False,
+            apply_draft_path=None,
+            dry_run_apply=False,
+        )
+        assert summary.status == "completed"
+    orchestrator.close()
+
+    history = (tmp_path / "artifacts" / "run-history.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["task"] for line in history] == ["first", "second"]
+
+
+def test_failed_action_marks_run_failed_and_dumps_flight_recorder(
+    core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    orchestrator = core.Orchestrator(
+        allowlist={sys.executable}, log_dir=tmp_path / "logs", draft_dir=tmp_path / "drafts", metrics_path=None
+    )
+
+    summary = orchestrator.run(
+        task="fail",
+        approve_sensitive=False,
+        repo_root=tmp_path,
+        command=f"{sys.executable} -c \"raise SystemExit(3)\"",
+        draft_note=None,
+        edit_request=None,
+        max_files=10,
+        plan_only=False,
+        apply_draft_path=None,
+        dry_run_apply=False,
+    )
+
+    assert summary.status == "failed"
+    assert Path(summary.flight_recorder_path).exists()
+
+
+def test_fail_fast_commands_cancels_remaining_commands(
+    core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    orchestrator = core.Orchestrator(
+        allowlist={sys.executable}, log_dir=tmp_path / "logs", draft_dir=tmp_path / "drafts", metrics_path=None
+    )
+    sleep = f"{sys.executable} -c \"import time; time.sleep(30)\""
+
+    summary = orchestrator.run(
+        task="checks",
+        approve_sensitive=False,
+        repo_root=tmp_path,
+        command=f"{sys.executable} -c \"raise SystemExit(1)\"",
+        draft_note=None,
+        edit_request=None,
+        max_files=10,
+        plan_only=False,
+        apply_draft_path=None,
+        dry_run_apply=False,
+        commands=[sleep],
+        fail_fast_commands=True,
+    )
+
+    assert [result.cancelled for result in summary.shell_results] == [False, True]
+    assert summary.status == "failed"
+def test_failed_run_closes_phase_spans_and_writes_trace(
+    core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    orchestrator = core.Orchestrator(
+        allowlist={sys.executable}, log_dir=tmp_path / "logs", draft_dir=tmp_path / "drafts", metrics_path=None
+    )
+
+    def explode(*args, **kwargs):
+        raise RuntimeError("map failed")
+
+    monkeypatch.setattr(orchestrator.repo_mapper, "build", explode)
+    with pytest.raises(RuntimeError, match="map failed"):
+        orchestrator.run(
+            task="explode",
+            approve_sensitive=False,
+            repo_root=tmp_path,
+            command=f"{sys.executable} -c pass",
+            draft_note=None,
+            edit_request=None,
+            max_files=10,
+            plan_only=False,
+            apply_draft_path=None,
+            dry_run_apply=False,
+        )
+
+    trace_path = tmp_path / "artifacts" / "traces" / f"{orchestrator.logger.path.stem}.trace.json"
+    events = {event["name"]: event for event in json.loads(trace_path.read_text(encoding="utf-8"))["traceEvents"]}
+    assert events["repo_map"]["args"]["error"] == "RuntimeError"
+    assert events["Orchestrator.run"]["args"]["error"] == "RuntimeError"
+    assert orchestrator.tracer._stack() == []
+
+
+def test_from_config_shares_pure_command_cache_with_pool(
+    core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    config = AgentConfig(
+        allowlist={"git"},
+        max_files=10,
+        log_dir=tmp_path / "logs",
+        draft_dir=tmp_path / "drafts",
+        pure_commands={"git status"},
+    )
+
+    orchestrator = core.Orchestrator.from_config(config, metrics_path=None)
+    orchestrator.close()
+
+    assert orchestrator.shell_executor.is_pure("git status --short")
+    assert orchestrator.command_pool.executor is orchestrator.shell_executor
+
+
+def test_failed_run_stops_the_profiler_and_links_it_from_the_dump(
+    core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    orchestrator = core.Orchestrator(
+        allowlist={sys.executable},
+        log_dir=tmp_path / "logs",
+        draft_dir=tmp_path / "drafts",
+        metrics_path=None,
+        profile="both",
+    )
+
+    def explode(*args, **kwargs):
+        raise RuntimeError("map failed")
+
+    monkeypatch.setattr(orchestrator.repo_mapper, "build", explode)
+    with pytest.raises(RuntimeError):
+        orchestrator.run(
+            task="explode",
+            approve_sensitive=False,
+            repo_root=tmp_path,
+            command=f"{sys.executable} -c pass",
+            draft_note=None,
+            edit_request=None,
+            max_files=10,
+            plan_only=False,
+            apply_draft_path=None,
+            dry_run_apply=False,
+        )
+
+    assert orchestrator._profiler is None
+    assert not tracemalloc.is_tracing()
+    dump = tmp_path / "artifacts" / "flight" / f"{orchestrator.logger.path.stem}.jsonl"
+    events = [json.loads(line) for line in dump.read_text(encoding="utf-8").splitlines()]
+    (profile,) = [e for e in events if (e["source"], e["event"]) == ("orchestrator", "profile")]
+    assert Path(profile["payload"]["cpu_profile"]).exists()
+
+
+def test_codemod_leaves_unapproved_sensitive_files_untouched(
+    core, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    repo = tmp_path / "repo"
+    (repo / "deploy").mkdir(parents=True)
+    plain = repo / "app.py"
+    secret = repo / "deploy" / "settings.py"
+    plain.write_text("HOST = 'old'\n", encoding="utf-8")
+    secret.write_text("HOST = 'old'\n", encoding="utf-8")
+    orchestrator = core.Orchestrator(
+        allowlist={sys.executable}, log_dir=tmp_path / "logs", draft_dir=tmp_path / "drafts", metrics_path=None
+    )
+
+    summary = orchestrator.run(
+        task="rename host",
+        approve_sensitive=False,
+        repo_root=repo,
+        command=f"{sys.executable} -c pass",
+        draft_note=None,
+        edit_request=None,
+        max_files=10,
+        plan_only=False,
+        apply_draft_path=None,
+        dry_run_apply=False,
+        codemod_request=CodemodRequest(root=repo, pattern="'old'", replacement="'new'", apply=True),
+    )
+
+    assert summary.status == "approval_required"
+    assert secret.read_text(encoding="utf-8") == "HOST = 'old'\n"
+    assert plain.read_text(encoding="utf-8") == "HOST = 'old'\n"
+    assert "+HOST = 'new'" in summary.edit_diff
@@ -0,0 +1,40 @@
+import difflib
+import random
+
+from shadowpcagent.diffing import diff_opcodes, unified_diff
+
+
+def _rebuild(a: list[str], b: list[str]) -> list[str]:
+    out: list[str] = []
+    for tag, i1, i2, j1, j2 in diff_opcodes(a, b):
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            out.extend(b[j1:j2])
+    return out
+
+
+def test_unified_diff_matches_difflib_format() -> None:
+    a = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota"]
+    b = ["alpha", "beta", "GAMMA", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+    expected = list(difflib.unified_diff(a, b, "f.txt", "f.txt", lineterm=""))
+    assert list(unified_diff(a, b, "f.txt", "f.txt", lineterm="")) == expected
+
+
+def test_unified_diff_is_empty_for_identical_input() -> None:
+    assert list(unified_diff(["x"], ["x"])) == []
+    assert list(unified_diff([], [])) == []
+
+
+def test_opcodes_reconstruct_target_for_random_edits() -> None:
+    rng = random.Random(0)
+    for _ in range(500):
+        a = [rng.choice("abcdefg") for _ in range(rng.randint(0, 40))]
+        b = a[:]
+        for _ in range(rng.randint(0, 6)):
+            if b and rng.random() < 0.5:
+                del b[rng.randrange(len(b))]
+            else:
+                b.insert(rng.randint(0, len(b)), rng.choice("axyz"))
+        assert _rebuild(a, b) == b
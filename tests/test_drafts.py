@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from shadowpcagent import cli
+from shadowpcagent.drafts import DraftManager
+from shadowpcagent.editor import EditRequest, FileEditor
+from shadowpcagent.patcher import UnifiedDiffApplier
+
+
+def _diff(path: str, old: str, new: str) -> str:
+    return f"--- a/{path}\n+++ b/{path}\n@@ -1 +1 @@\n-{old}\n+{new}\n"
+
+
+def test_triage_reports_applies_conflicts_and_stale(tmp_path: Path) -> None:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.txt").write_text("alpha\n", encoding="utf-8")
+    (repo / "b.txt").write_text("beta (rebased)\n", encoding="utf-8")
+    (repo / "c.txt").write_text("gamma done\n", encoding="utf-8")
+    drafts = tmp_path / "drafts"
+    drafts.mkdir()
+    (drafts / "draft-change-1.patch").write_text(_diff("a.txt", "alpha", "ALPHA"), encoding="utf-8")
+    (drafts / "draft-change-2.patch").write_text(_diff("a.txt", "alpha", "Alpha"), encoding="utf-8")
+    (drafts / "draft-change-3.patch").write_text(_diff("b.txt", "beta", "BETA"), encoding="utf-8")
+    (drafts / "draft-change-4.patch").write_text(_diff("c.txt", "gamma", "gamma done"), encoding="utf-8")
+    (drafts / "draft-change-5.patch").write_text(_diff("gone.txt", "x", "y"), encoding="utf-8")
+
+    statuses = DraftManager(draft_dir=drafts).triage(repo, max_workers=4)
+
+    assert [(s.path.name, s.status) for s in statuses] == [
+        ("draft-change-1.patch", "applies"),
+        ("draft-change-2.patch", "applies"),
+        ("draft-change-3.patch", "conflicts"),
+        ("draft-change-4.patch", "stale"),
+        ("draft-change-5.patch", "stale"),
+    ]
+    assert statuses[3].detail == "Already applied."
+    assert (repo / "a.txt").read_text(encoding="utf-8") == "alpha\n"
+
+
+def test_drafts_triage_command_prints_table(tmp_path: Path, capsys) -> None:
+    (tmp_path / "a.txt").write_text("alpha\n", encoding="utf-8")
+    drafts = tmp_path / "drafts"
+    drafts.mkdir()
+    (drafts / "draft-change-1.patch").write_text(_diff("a.txt", "alpha", "ALPHA"), encoding="utf-8")
+
+    code = cli.main(["drafts", "triage", "--draft-dir", str(drafts), "--repo-root", str(tmp_path)])
+
+    out = capsys.readouterr().out
+    assert code == 0
+    assert "applies    draft-change-1.patch  clean [a.txt]" in out
+    assert "1 applies, 0 conflicts, 0 stale" in out
+
+
+def test_identical_drafts_are_stored_once_and_compressed(tmp_path: Path) -> None:
+    manager = DraftManager(draft_dir=tmp_path / "drafts", run_id="run-1")
+    diff = _diff("a.txt", "alpha", "ALPHA") * 50
+
+    first = manager.write_diff(diff, task="upper")
+    second = manager.write_diff(diff, task="upper again")
+
+    assert first.path == second.path
+    assert second.deduplicated is True
+    assert first.path.stat().st_size < len(diff)
+    assert manager.read(first.path) == diff
+    assert [r["task"] for r in manager.index()] == ["upper", "upper again"]
+    assert manager.index()[0]["targets"] == ["a.txt"]
+    assert manager.list_drafts() == [first.path]
+
+
+def test_gc_enforces_count_and_age_budgets(tmp_path: Path, monkeypatch) -> None:
+    # Every draft gets the same timestamp, so only index order tells them apart.
+    frozen = datetime(2026, 1, 1)
+    monkeypatch.setattr(
+        "shadowpcagent.drafts.datetime", type("FrozenDatetime", (datetime,), {"utcnow": staticmethod(lambda: frozen)})
+    )
+    manager = DraftManager(draft_dir=tmp_path / "drafts")
+    paths = [manager.write_diff(_diff(f"f{i}.txt", "a", "b")).path for i in range(4)]
+
+    result = manager.gc(max_count=3)
+    assert result.removed == [paths[0]]
+    assert not paths[0].exists()
+    assert len(manager.index()) == 3
+
+    result = manager.gc(max_age=timedelta(days=1), now=frozen + timedelta(days=2))
+    assert sorted(result.removed) == sorted(paths[1:])
+    assert manager.index() == []
+    assert manager.list_drafts() == []
+
+
+def test_concurrent_writes_survive_gc(tmp_path: Path) -> None:
+    manager = DraftManager(draft_dir=tmp_path / "drafts")
+    old = (datetime.utcnow() - timedelta(days=7)).timestamp()
+
+    def expire_legacy_draft(i: int) -> None:
+        legacy = manager.draft_dir / f"draft-old-{i}.patch"
+        legacy.write_text(_diff("old.txt", "a", "b"), encoding="utf-8")
+        os.utime(legacy, (old, old))
+        manager.gc(max_age=timedelta(days=1))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        writes = [pool.submit(manager.write_diff, _diff(f"f{i}.txt", "a", "b")) for i in range(60)]
+        gcs = [pool.submit(expire_legacy_draft, i) for i in range(20)]
+        paths = [future.result().path for future in writes]
+        for future in gcs:
+            future.result()
+
+    assert sorted(r["digest"] for r in manager.index()) == sorted(p.name.split(".")[0] for p in paths)
+
+
+def test_editor_drafts_with_absolute_paths_triage_and_apply(tmp_path: Path) -> None:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    target = repo / "app.py"
+    target.write_text("value = 1\n", encoding="utf-8")
+    edit = FileEditor().apply_edit(EditRequest(path=target, find_text="1", replace_text="2", apply=False))
+    manager = DraftManager(draft_dir=tmp_path / "drafts")
+    draft = manager.write_diff(edit.diff).path
+
+    (status,) = manager.triage(repo)
+    result = UnifiedDiffApplier().apply(manager.read(draft), repo_root=repo)
+
+    assert status.status == "applies", status.detail
+    assert result.applied, result.error
+    assert target.read_text(encoding="utf-8") == "value = 2\n"
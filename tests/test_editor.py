@@ -0,0 +1,194 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent.editor import CodemodRequest, EditRequest, FileEditor
+from shadowpcagent.tools.shadow_search.index import build_sqlite_index
+
+
+def _make_tree(root: Path) -> None:
+    (root / "pkg").mkdir()
+    (root / "pkg" / "a.py").write_text("old_name = 1\nprint(old_name)\n", encoding="utf-8")
+    (root / "pkg" / "b.py").write_text("value = 2\n", encoding="utf-8")
+    (root / "notes.md").write_text("old_name in docs\n", encoding="utf-8")
+
+
+def test_codemod_drafts_combined_diff_for_matching_files(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    request = CodemodRequest(
+        root=tmp_path,
+        pattern="old_name",
+        replacement="new_name",
+        path_glob="**/*.py",
+        index_db_path=tmp_path / "missing.sqlite",
+    )
+
+    result = FileEditor().apply_codemod(request)
+
+    assert result.changed is True
+    assert result.applied is False
+    assert result.candidates == 2
+    assert [(f.path.name, f.matches) for f in result.files] == [("a.py", 2)]
+    assert "--- pkg/a.py" in result.diff
+    assert "+print(new_name)" in result.diff
+    assert "old_name" in (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8")
+
+
+def test_codemod_regex_in_process_pool_applies(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    request = CodemodRequest(
+        root=tmp_path,
+        pattern=r"\b(old|value)\b",
+        replacement=r"\1_v2",
+        regex=True,
+        apply=True,
+        index_db_path=tmp_path / "missing.sqlite",
+    )
+
+    result = FileEditor(max_workers=2, parallel_threshold=1).apply_codemod(request)
+
+    assert result.applied is True
+    assert sorted(f.path.name for f in result.files) == ["b.py"]
+    assert (tmp_path / "pkg" / "b.py").read_text(encoding="utf-8") == "value_v2 = 2\n"
+
+
+def test_codemod_keeps_crlf_and_uses_repo_relative_headers(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    (tmp_path / "pkg" / "crlf.py").write_bytes(b"old_name = 1\r\nprint(old_name)\r\n")
+    request = CodemodRequest(
+        root=tmp_path / "pkg",
+        pattern="old_name",
+        replacement="new_name",
+        apply=True,
+        index_db_path=tmp_path / "missing.sqlite",
+        repo_root=tmp_path,
+    )
+
+    result = FileEditor().apply_codemod(request)
+
+    assert result.applied is True
+    assert (tmp_path / "pkg" / "crlf.py").read_bytes() == b"new_name = 1\r\nprint(new_name)\r\n"
+    assert "--- pkg/a.py" in result.diff
+
+
+def test_codemod_walks_tree_when_index_is_stale(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    db_path = tmp_path / "index.sqlite"
+    build_sqlite_index([tmp_path], db_path=db_path)
+    (tmp_path / "pkg" / "a.py").unlink()
+    os.utime(tmp_path / "pkg", ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+    (tmp_path / "pkg" / "c.py").write_text("old_name = 3\n", encoding="utf-8")
+    request = CodemodRequest(
+        root=tmp_path, pattern="old_name", replacement="new_name", path_glob="**/*.py", index_db_path=db_path
+    )
+
+    result = FileEditor().apply_codemod(request)
+
+    assert result.error is None
+    assert [f.path.name for f in result.files] == ["c.py"]
+
+
+def test_codemod_reports_file_errors_and_writes_nothing(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    (tmp_path / "pkg" / "latin1.py").write_bytes(b"old_name = '\xe9'\n")
+    request = CodemodRequest(
+        root=tmp_path,
+        pattern="old_name",
+        replacement="new_name",
+        apply=True,
+        index_db_path=tmp_path / "missing.sqlite",
+    )
+
+    result = FileEditor().apply_codemod(request)
+
+    assert result.applied is False
+    assert result.error is not None and "latin1.py" in result.error
+    assert "old_name" in (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8")
+
+
+def test_apply_batch_writes_all_files_and_combines_diff(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    a, b = tmp_path / "pkg" / "a.py", tmp_path / "pkg" / "b.py"
+    requests = [
+        EditRequest(path=a, find_text="old_name", replace_text="mid_name", apply=True),
+        EditRequest(path=b, find_text="value", replace_text="amount", apply=True),
+        EditRequest(path=a, find_text="mid_name", replace_text="new_name", apply=True),
+    ]
+
+    result = FileEditor().apply_batch(requests)
+
+    assert result.applied is True
+    assert a.read_text(encoding="utf-8") == "new_name = 1\nprint(new_name)\n"
+    assert b.read_text(encoding="utf-8") == "amount = 2\n"
+    assert result.diff.count(f"--- {a}") == 1
+    assert "mid_name" not in result.diff
+
+
+def test_apply_batch_rolls_back_when_a_write_fails(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _make_tree(tmp_path)
+    a, b = tmp_path / "pkg" / "a.py", tmp_path / "pkg" / "b.py"
+    real_replace = os.replace
+
+    def flaky_replace(src: str, dst: str) -> None:
+        if Path(dst) == b:
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", flaky_replace)
+    result = FileEditor().apply_batch(
+        [
+            EditRequest(path=a, find_text="old_name", replace_text="new_name", apply=True),
+            EditRequest(path=b, find_text="value", replace_text="amount", apply=True),
+        ]
+    )
+
+    assert result.applied is False
+    assert "rolled back" in (result.error or "")
+    assert a.read_text(encoding="utf-8") == "old_name = 1\nprint(old_name)\n"
+    assert sorted(p.name for p in (tmp_path / "pkg").iterdir()) == ["a.py", "b.py"]
+
+
+def test_apply_batch_does_not_write_when_any_file_is_missing(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    a = tmp_path / "pkg" / "a.py"
+    result = FileEditor().apply_batch(
+        [
+            EditRequest(path=a, find_text="old_name", replace_text="new_name", apply=True),
+            EditRequest(path=tmp_path / "nope.py", find_text="x", replace_text="y", apply=True),
+        ]
+    )
+
+    assert (result.applied, result.error) == (False, "File not found.")
+    assert "old_name" in a.read_text(encoding="utf-8")
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_atomic_writes_keep_file_modes_and_restore_them_on_rollback(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _make_tree(tmp_path)
+    a, b = tmp_path / "pkg" / "a.py", tmp_path / "pkg" / "b.py"
+    a.chmod(0o755)
+    FileEditor().apply_edit(EditRequest(path=a, find_text="old_name", replace_text="new_name", apply=True))
+    assert a.stat().st_mode & 0o777 == 0o755
+
+    real_replace = os.replace
+
+    def flaky_replace(src: str, dst: str) -> None:
+        if Path(dst) == b and src.endswith(".tmp"):
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", flaky_replace)
+    FileEditor().apply_batch(
+        [
+            EditRequest(path=a, find_text="new_name", replace_text="other", apply=True),
+            EditRequest(path=b, find_text="value", replace_text="amount", apply=True),
+        ]
+    )
+    assert "new_name" in a.read_text(encoding="utf-8")
+    assert a.stat().st_mode & 0o777 == 0o755
@@ -0,0 +1,204 @@
+import gzip
+import time
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent import cli
+from shadowpcagent.executors import CommandPool, ShardedTestExecutor, ShellExecutor
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_plan_shards_balances_by_historical_duration(tmp_path: Path) -> None:
+    durations = tmp_path / "test-durations.json"
+    durations.write_text('{"t::slow": 10.0, "t::mid": 6.0, "t::a": 3.0, "t::b": 3.0}')
+    executor = ShardedTestExecutor(["pytest"], durations_path=durations, shards=2)
+
+    plan = executor.plan_shards(["t::a", "t::b", "t::mid", "t::slow"], 2)
+
+    assert sorted(plan) == [["t::a", "t::b", "t::mid"], ["t::slow"]]
+
+
+def test_run_merges_shard_results_and_records_durations(tmp_path: Path) -> None:
+    _write(tmp_path / "tests" / "test_one.py", "def test_a():\n    pass\n\ndef test_b():\n    pass\n")
+    _write(tmp_path / "tests" / "test_two.py", "def test_c():\n    assert False\n")
+    durations = tmp_path / "test-durations.json"
+    executor = ShardedTestExecutor(["pytest"], durations_path=durations, shards=2)
+
+    result = executor.run(tmp_path, args=["tests"])
+
+    assert (result.shards, result.passed, result.failed) == (2, 2, 1)
+    assert result.failures == ["tests/test_two.py::test_c"]
+    assert result.returncode == 1
+    assert "tests/test_one.py::test_a" in durations.read_text()
+
+
+def test_run_drains_chatty_shards_and_reports_collection_errors(tmp_path: Path) -> None:
+    # Far more output than a pipe buffer holds; an unread pipe would hang.
+    _write(tmp_path / "tests" / "test_loud.py", "def test_loud():\n    print('x' * 200000)\n    assert False\n")
+    executor = ShardedTestExecutor(["pytest"], durations_path=tmp_path / "d.json", shards=1)
+
+    result = executor.run(tmp_path, args=["tests"])
+    assert (result.failed, result.returncode) == (1, 1)
+    assert "xxxx" in result.shard_results[0].stdout
+
+    _write(tmp_path / "tests" / "test_broken.py", "import not_a_module_anywhere\n")
+    result = executor.run(tmp_path, args=["tests"])
+    assert (result.shards, result.returncode) == (0, 2)
+    assert "not_a_module_anywhere" in result.shard_results[0].stdout
+    with pytest.raises(ValueError, match="Test collection failed"):
+        executor.collect(tmp_path, ["tests"])
+
+
+def test_run_handles_suites_larger_than_the_output_buffers(tmp_path: Path) -> None:
+    # ~180 KiB of collected ids: more than the executor keeps in memory, and
+    # more than a Windows command line could carry.
+    _write(
+        tmp_path / "tests" / "test_many.py",
+        "import pytest\n\n@pytest.mark.parametrize('n', range(1200), ids=lambda n: f'case-{n:0120d}')\n"
+        "def test_p(n):\n    pass\n",
+    )
+    executor = ShardedTestExecutor(["pytest"], durations_path=tmp_path / "d.json", shards=2)
+
+    assert len(executor.collect(tmp_path, ["tests"])) == 1200
+    result = executor.run(tmp_path, args=["tests"])
+    assert (result.shards, result.passed, result.returncode) == (2, 1200, 0)
+
+
+def test_fail_fast_and_idle_timeout_stop_shards(tmp_path: Path) -> None:
+    _write(tmp_path / "tests" / "test_fail.py", "def test_fail():\n    assert False\n")
+    _write(tmp_path / "tests" / "test_slow.py", "import time\n\ndef test_slow():\n    time.sleep(30)\n")
+    executor = ShardedTestExecutor(["pytest"], durations_path=tmp_path / "d.json", shards=2)
+
+    result = executor.run(tmp_path, args=["tests"], fail_fast=True)
+    assert result.cancelled and result.returncode == 1
+    assert result.duration < 20
+
+    executor = ShardedTestExecutor(["pytest"], durations_path=tmp_path / "d.json", shards=1, idle_timeout=2.0)
+    result = executor.run(tmp_path, args=["tests/test_slow.py"])
+    assert result.shard_results[0].timed_out == "idle"
+    assert result.returncode != 0
+
+
+def test_run_requires_allowlisted_pytest(tmp_path: Path) -> None:
+    executor = ShardedTestExecutor(["git"], durations_path=tmp_path / "d.json")
+    with pytest.raises(ValueError, match="Command not allowlisted: pytest"):
+        executor.run(tmp_path)
+
+
+def test_shell_streams_output_with_bounded_buffers(tmp_path: Path) -> None:
+    progress = []
+    executor = ShellExecutor(
+        allowlist={"python"},
+        head_bytes=100,
+        tail_bytes=100,
+        output_dir=tmp_path / "shell",
+        on_progress=progress.append,
+        progress_interval=0.0,
+    )
+    script = "import sys\nfor i in range(2000): print(f'line {i:04d}')\nprint('oops', file=sys.stderr)\n"
+    (tmp_path / "chatty.py").write_text(script, encoding="utf-8")
+
+    result = executor.run(f"python {tmp_path / 'chatty.py'}")
+
+    assert result.returncode == 0
+    assert result.stdout.startswith("line 0000")
+    assert result.stdout.endswith("line 1999")
+    assert "bytes truncated" in result.stdout
+    assert result.stderr == "oops"
+    assert result.output_bytes == 2000 * 10 + 5
+    assert result.truncated_bytes > 0
+    with gzip.open(result.output_path, "rt", encoding="utf-8") as handle:
+        assert handle.read().count("line ") == 2000
+    assert progress[0]["line"] == "line 0000" and progress[-1]["lines"] >= 2000
+
+
+def test_shell_small_output_keeps_no_spill_file(tmp_path: Path) -> None:
+    executor = ShellExecutor(allowlist={"python"}, output_dir=tmp_path / "shell")
+
+    result = executor.run("python -c \"print('hi')\"")
+
+    assert (result.stdout, result.output_path, result.timed_out) == ("hi", None, None)
+    assert list((tmp_path / "shell").iterdir()) == []
+
+
+def test_shell_idle_and_wall_timeouts_kill_the_process_group(tmp_path: Path) -> None:
+    script = tmp_path / "hang.py"
+    script.write_text(
+        "import subprocess, sys, time\n"
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+        "print('started', flush=True)\n"
+        "time.sleep(30)\n",
+        encoding="utf-8",
+    )
+
+    started = time.monotonic()
+    idle = ShellExecutor(allowlist={"python"}, idle_timeout=0.5).run(f"python {script}")
+    wall = ShellExecutor(allowlist={"python"}, timeout=0.5).run(f"python {script}")
+
+    assert time.monotonic() - started < 10
+    assert idle.timed_out == "idle" and idle.returncode != 0
+    assert idle.stdout == "started"
+    assert "idle timeout" in idle.stderr
+    assert wall.timed_out == "wall"
+
+
+def test_command_pool_runs_concurrently_and_keeps_order() -> None:
+    pool = CommandPool(ShellExecutor({"python"}), max_parallel=3)
+    sleep = "python -c \"import time; time.sleep(0.5); print('{}')\""
+
+    batch = pool.run([sleep.format(i) for i in range(3)])
+
+    assert [r.stdout for r in batch.results] == ["0", "1", "2"]
+    assert batch.succeeded and not batch.cancelled
+    assert batch.duration < 1.4
+    assert all(r.duration >= 0.4 for r in batch.results)
+
+
+def test_command_pool_fail_fast_cancels_remaining() -> None:
+    pool = CommandPool(ShellExecutor({"python"}), max_parallel=2)
+
+    batch = pool.run(
+        [
+            "python -c \"import sys; sys.exit(3)\"",
+            "python -c \"import time; time.sleep(30)\"",
+            "python -c \"print('queued')\"",
+        ],
+        fail_fast=True,
+    )
+
+    failed, running, queued = batch.results
+    assert failed.returncode == 3 and not failed.cancelled
+    assert running.cancelled and queued.cancelled
+    assert batch.cancelled and not batch.succeeded
+    assert batch.duration < 10
+
+
+def test_command_pool_rejects_unlisted_commands_up_front() -> None:
+    with pytest.raises(ValueError):
+        CommandPool(ShellExecutor({"git"})).run(["git status", "rm -rf build"])
+
+
+def test_command_pool_runs_through_shell_executor_limits() -> None:
+    progress = []
+    executor = ShellExecutor({"python"}, idle_timeout=0.5, on_progress=progress.append, progress_interval=0.0)
+    pool = CommandPool(executor, max_parallel=2)
+
+    batch = pool.run(["python -c \"print('hi')\"", "python -c \"import time; time.sleep(30)\""])
+
+    ok, stalled = batch.results
+    assert ok.stdout == "hi" and ok.returncode == 0
+    assert stalled.timed_out == "idle" and stalled.duration < 10
+    assert [p["line"] for p in progress] == ["hi"]
+
+
+def test_cli_exec_reports_each_command(capsys: pytest.CaptureFixture) -> None:
+    code = cli.main(["exec", "--allow", "python", "python -c \"print(1)\"", "python -c \"import sys; sys.exit(1)\""])
+
+    out = capsys.readouterr().out
+    assert code == 1
+    assert "OK" in out and "EXIT 1" in out and "2 command(s)" in out
@@ -0,0 +1,92 @@
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent.flight import FlightRecorder, recorded
+from shadowpcagent.logging_utils import JsonlLogger
+
+
+def test_ring_buffer_keeps_latest_events_in_order() -> None:
+    recorder = FlightRecorder(capacity=4)
+    for i in range(10):
+        recorder.record("test", "tick", {"i": i})
+
+    events = recorder.snapshot()
+
+    assert [e["payload"]["i"] for e in events] == [6, 7, 8, 9]
+    assert [e["seq"] for e in events] == [6, 7, 8, 9]
+    assert events[0]["thread"] == threading.current_thread().name
+
+
+def test_concurrent_records_are_not_lost() -> None:
+    recorder = FlightRecorder(capacity=4000)
+
+    def worker(n: int) -> None:
+        for i in range(500):
+            recorder.record("worker", "tick", (n, i))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events = recorder.snapshot()
+    assert len(events) == 2000
+    assert len({tuple(e["payload"]) for e in events}) == 2000
+
+
+def test_dump_writes_jsonl_including_exceptions(tmp_path: Path) -> None:
+    recorder = FlightRecorder(capacity=8)
+    recorder.record("shell", "exit", {"path": Path("x"), "returncode": 1})
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError as exc:
+        recorder.exception("orchestrator", exc)
+
+    path = recorder.dump(tmp_path / "flight" / "run.jsonl")
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+    assert records[0]["payload"] == {"path": "x", "returncode": 1}
+    assert records[1]["event"] == "exception"
+    assert "RuntimeError: boom" in records[1]["payload"]["traceback"]
+
+
+def test_logger_feeds_recorder_and_debug_stays_off_disk(tmp_path: Path) -> None:
+    recorder = FlightRecorder(capacity=16)
+    logger = JsonlLogger(tmp_path, recorder=recorder)
+
+    logger.log("plan_built", {"task": "x"})
+    logger.debug("patch_plan", [{"path": "a.py"}])
+
+    assert [(e["source"], e["event"]) for e in recorder.snapshot()] == [
+        ("log", "plan_built"),
+        ("debug", "patch_plan"),
+    ]
+    assert "patch_plan" not in logger.path.read_text(encoding="utf-8")
+
+
+def test_disabled_recorder_and_capacity_validation() -> None:
+    recorder = FlightRecorder(capacity=2, enabled=False)
+    recorder.record("test", "tick")
+    assert recorder.snapshot() == []
+    with pytest.raises(ValueError):
+        FlightRecorder(capacity=0)
+
+
+def test_recorded_worker_logs_lifecycle_and_dumps_on_exception(tmp_path: Path) -> None:
+    recorder = FlightRecorder(capacity=16)
+    recorded("gui", lambda: recorder.record("gui", "activity", "scan"), recorder, tmp_path)()
+
+    def broken() -> None:
+        raise RuntimeError("worker died")
+
+    with pytest.raises(RuntimeError, match="worker died"):
+        recorded("gui", broken, recorder, tmp_path)()
+
+    events = [e["event"] for e in recorder.snapshot()]
+    assert events == ["worker_start", "activity", "worker_done", "worker_start", "exception"]
+    (dump,) = tmp_path.glob("gui-*.jsonl")
+    assert "worker died" in dump.read_text(encoding="utf-8")
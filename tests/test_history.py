@@ -0,0 +1,77 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from shadowpcagent import cli
+from shadowpcagent.history import RunHistory
+from shadowpcagent.logging_utils import RunHistoryLogger
+from shadowpcagent.retention import LogRetention
+
+
+def _seed(path: Path, count: int) -> None:
+    with path.open("w", encoding="utf-8") as handle:
+        for i in range(count):
+            day = 1 + i // 100
+            status = "completed" if i % 4 else "approval_required"
+            record = {"timestamp": f"2024-01-{day:02d}T00:00:{i % 60:02d}Z", "task": f"task-{i % 3}", "status": status}
+            handle.write(json.dumps(record) + "\n")
+
+
+def test_tail_reads_latest_records_first(tmp_path: Path) -> None:
+    path = tmp_path / "run-history.jsonl"
+    _seed(path, 500)
+    history = RunHistory(path)
+
+    tail = history.tail(3)
+
+    assert [r["timestamp"] for r in tail] == [
+        "2024-01-05T00:00:19Z",
+        "2024-01-05T00:00:18Z",
+        "2024-01-05T00:00:17Z",
+    ]
+    assert len(history.tail(1000)) == 500
+
+
+def test_index_tracks_days_and_aggregates_incrementally(tmp_path: Path) -> None:
+    path = tmp_path / "run-history.jsonl"
+    _seed(path, 400)
+    history = RunHistory(path)
+
+    stats = history.stats()
+    assert stats["total"] == 400
+    assert stats["by_status"] == {"approval_required": 100, "completed": 300}
+    assert [r["timestamp"][:10] for r in history.since("2024-01-04", limit=2)] == ["2024-01-04"] * 2
+
+    logger = RunHistoryLogger(path)
+    logger.append({"task": "task-new", "status": "completed"})
+    # Appends stay cheap; the index catches up on the next read.
+    assert json.loads(history.index_path.read_text(encoding="utf-8"))["stats"]["total"] == 400
+    stats = history.stats()
+    assert stats["total"] == 401
+    assert stats["by_task"]["task-new"] == {"runs": 1, "by_status": {"completed": 1}}
+
+
+def test_history_command_prints_recent_runs_and_stats(tmp_path: Path, capsys) -> None:
+    path = tmp_path / "run-history.jsonl"
+    _seed(path, 8)
+
+    assert cli.main(["history", "--limit", "2", "--stats", "--history-path", str(path)]) == 0
+
+    out = capsys.readouterr().out
+    assert out.splitlines()[0].startswith("2024-01-01T00:00:07Z  completed")
+    assert "8 run(s)" in out
+    assert "  completed               6   75.0%" in out
+
+
+def test_concurrent_refreshes_count_each_record_once_across_rotation(tmp_path: Path) -> None:
+    path = tmp_path / "run-history.jsonl"
+    _seed(path, 300)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: RunHistory(path).refresh(), range(16)))
+    assert RunHistory(path).stats()["total"] == 300
+
+    RunHistoryLogger(path).append({"task": "late", "status": "completed"})
+    LogRetention(log_dir=tmp_path / "logs", history_path=path, history_max_bytes=1).rotate_history()
+    RunHistoryLogger(path).append({"task": "after", "status": "completed"})
+
+    assert RunHistory(path).stats()["total"] == 302
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from shadowpcagent.editor import EditResult
+from shadowpcagent.impact import TestImpactSelector, touched_paths
+from shadowpcagent.models import PatchResult
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _make_repo(root: Path) -> None:
+    _write(root / "src" / "pkg" / "__init__.py", "")
+    _write(root / "src" / "pkg" / "models.py", "class Model:\n    pass\n")
+    _write(root / "src" / "pkg" / "core.py", "from .models import Model\n")
+    _write(root / "src" / "pkg" / "cli.py", "import os\n")
+    _write(root / "tests" / "test_core.py", "from pkg.core import Model\n")
+    _write(root / "tests" / "test_cli.py", "from pkg import cli\n")
+
+
+def test_select_follows_reverse_imports_transitively(tmp_path: Path) -> None:
+    _make_repo(tmp_path)
+    selector = TestImpactSelector(tmp_path, db_path=tmp_path / "symbols.sqlite")
+
+    selection = selector.select([Path("src/pkg/models.py")])
+
+    assert selection.run_all is False
+    assert selection.tests == ["tests/test_core.py"]
+    assert selection.impacted_modules == ["pkg.core", "pkg.models", "tests.test_core"]
+    assert selector.select([Path("src/pkg/cli.py")]).pytest_args() == ["tests/test_cli.py"]
+
+
+def test_select_runs_everything_for_global_inputs(tmp_path: Path) -> None:
+    _make_repo(tmp_path)
+    _write(tmp_path / "tests" / "conftest.py", "")
+    selector = TestImpactSelector(tmp_path, db_path=tmp_path / "symbols.sqlite")
+
+    selection = selector.select([Path("tests/conftest.py")])
+
+    assert selection.run_all is True
+    assert selection.has_tests
+
+
+def test_select_runs_everything_for_files_outside_the_import_graph(tmp_path: Path) -> None:
+    _make_repo(tmp_path)
+    _write(tmp_path / "tests" / "fixtures" / "data.json", "{}")
+    selector = TestImpactSelector(tmp_path, db_path=tmp_path / "symbols.sqlite")
+
+    selection = selector.select([Path("src/pkg/cli.py"), Path("tests/fixtures/data.json")])
+
+    assert selection.run_all is True
+    assert selection.reason == "File not in import graph: tests/fixtures/data.json"
+
+
+def test_touched_paths_ignores_unchanged_and_unapplied_results() -> None:
+    edit = EditResult(path=Path("a.py"), diff="", applied=False, changed=True)
+    noop = EditResult(path=Path("b.py"), diff="", applied=False, changed=False)
+    dry_run = PatchResult(path="c.py", applied=False, dry_run=True, validated=True)
+    applied = PatchResult(path="d.py", applied=True, validated=True)
+
+    assert touched_paths(edit, noop, dry_run, applied, None) == [Path("a.py").resolve(), Path("d.py").resolve()]
+
+
+def test_touched_paths_resolve_against_cwd_and_select_uses_repo_db(tmp_path: Path, monkeypatch) -> None:
+    _make_repo(tmp_path)
+    monkeypatch.chdir(tmp_path / "src")
+    edit = EditResult(path=Path("pkg/models.py"), diff="", applied=True, changed=True)
+
+    changed = touched_paths(edit)
+    selection = TestImpactSelector(tmp_path).select(changed)
+
+    assert changed == [tmp_path.resolve() / "src" / "pkg" / "models.py"]
+    assert selection.changed_paths == ["src/pkg/models.py"]
+    assert selection.tests == ["tests/test_core.py"]
+    assert (tmp_path / "artifacts" / "impact-symbols.sqlite").exists()
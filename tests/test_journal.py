@@ -0,0 +1,72 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent import cli
+from shadowpcagent.editor import EditRequest, FileEditor
+from shadowpcagent.journal import UndoJournal
+from shadowpcagent.patcher import UnifiedDiffApplier
+
+
+def test_undo_replays_runs_backward(tmp_path: Path) -> None:
+    journal_path = tmp_path / "undo-journal.jsonl"
+    target = tmp_path / "app.py"
+    target.write_bytes(b"one\r\ntwo\r\nthree")
+
+    first = UndoJournal(journal_path, run_id="run-1")
+    FileEditor(journal=first).apply_edit(EditRequest(path=target, find_text="two", replace_text="2", apply=True))
+    second = UndoJournal(journal_path, run_id="run-2")
+    patch = (
+        "--- a/app.py\n+++ b/app.py\n@@ -1,3 +1,3 @@\n-one\n+1\n 2\n three\n"
+        "--- /dev/null\n+++ b/new.py\n@@ -0,0 +1 @@\n+created\n"
+    )
+    assert UnifiedDiffApplier(journal=second).apply(patch, repo_root=tmp_path).applied is True
+    assert [e["run"] for e in second.pending()] == ["run-1", "run-2"]
+
+    result = second.undo()
+    assert result.error is None
+    assert result.runs == ["run-2"]
+    assert not (tmp_path / "new.py").exists()
+    assert target.read_bytes() == b"one\n2\nthree"
+
+    result = second.undo(to_run="run-1")
+    assert result.runs == ["run-1"]
+    assert target.read_bytes() == b"one\r\ntwo\r\nthree"
+    assert second.pending() == []
+
+
+def test_undo_refuses_when_file_changed_after_run(tmp_path: Path, capsys) -> None:
+    journal_path = tmp_path / "undo-journal.jsonl"
+    target = tmp_path / "app.py"
+    target.write_text("value = 1\n", encoding="utf-8")
+    journal = UndoJournal(journal_path, run_id="run-1")
+    FileEditor(journal=journal).apply_edit(EditRequest(path=target, find_text="1", replace_text="2", apply=True))
+    target.write_text("value = 3\n", encoding="utf-8")
+
+    code = cli.main(["undo", "--journal", str(journal_path)])
+
+    assert code == 1
+    assert "changed since run-1; refusing to undo" in capsys.readouterr().out
+    assert target.read_text(encoding="utf-8") == "value = 3\n"
+    assert len(journal.pending()) == 1
+
+
+def test_journal_for_repo_uses_unique_run_ids_and_repo_path(tmp_path: Path) -> None:
+    first, second = UndoJournal.for_repo(tmp_path), UndoJournal.for_repo(tmp_path)
+
+    assert first.path == tmp_path.resolve() / ".shadowpcagent" / "undo-journal.jsonl"
+    assert first.run_id != second.run_id
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_undo_keeps_file_mode(tmp_path: Path) -> None:
+    target = tmp_path / "run.sh"
+    target.write_text("echo one\n", encoding="utf-8")
+    target.chmod(0o755)
+    journal = UndoJournal.for_repo(tmp_path)
+    FileEditor(journal=journal).apply_edit(EditRequest(path=target, find_text="one", replace_text="two", apply=True))
+
+    assert journal.undo().error is None
+    assert target.read_text(encoding="utf-8") == "echo one\n"
+    assert target.stat().st_mode & 0o777 == 0o755
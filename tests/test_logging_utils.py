@@ -0,0 +1,52 @@
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+from shadowpcagent.logging_utils import JsonlLogger, RunHistoryLogger, list_run_logs
+
+
+def _events(path: Path) -> list:
+    return [json.loads(line)["event"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_buffered_logger_batches_until_flush(tmp_path: Path) -> None:
+    logger = JsonlLogger(log_dir=tmp_path, buffered=True, flush_interval=60.0)
+    for index in range(100):
+        logger.log("step", {"index": index})
+
+    assert logger.path.read_text(encoding="utf-8") == ""
+    logger.flush()
+    assert _events(logger.path) == ["step"] * 100
+
+    logger.log("patch_validation", {"error": "Hunk #1 does not apply"})
+    assert _events(logger.path)[-1] == "patch_validation"
+
+    logger.log("run_summary", {})
+    logger.close()
+    assert _events(logger.path)[-1] == "run_summary"
+
+
+def test_buffered_logger_flushes_on_size_threshold(tmp_path: Path) -> None:
+    logger = JsonlLogger(log_dir=tmp_path, buffered=True, flush_bytes=1, flush_interval=60.0)
+    logger.log("step", {"index": 1})
+    deadline = time.monotonic() + 5
+    while not logger.path.read_text(encoding="utf-8") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _events(logger.path) == ["step"]
+
+    history = RunHistoryLogger(tmp_path / "history.jsonl", buffered=True)
+    history.append({"task": "t", "status": "completed"})
+    history.flush()
+    assert json.loads(history.history_path.read_text(encoding="utf-8"))["status"] == "completed"
+    logger.close()
+
+
+def test_loggers_started_together_get_distinct_logs(tmp_path: Path, monkeypatch) -> None:
+    frozen = type("FrozenDatetime", (datetime,), {"utcnow": staticmethod(lambda: datetime(2026, 1, 1))})
+    monkeypatch.setattr("shadowpcagent.logging_utils.datetime", frozen)
+
+    first, second = JsonlLogger(log_dir=tmp_path), JsonlLogger(log_dir=tmp_path)
+
+    assert first.path != second.path
+    assert sorted(list_run_logs(tmp_path)) == sorted([first.path, second.path])
@@ -0,0 +1,122 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent import cli
+from shadowpcagent.executors import ShellExecutor
+from shadowpcagent.metrics import (
+    INDEX_FILES,
+    SHELL_COMMANDS,
+    MetricsRegistry,
+    read_textfile,
+)
+
+
+def test_render_counters_gauges_and_histograms() -> None:
+    registry = MetricsRegistry()
+    runs = registry.counter("agent_runs_total", "Runs.", ["status"])
+    rate = registry.gauge("agent_rate", "Rate.")
+    latency = registry.histogram("agent_seconds", "Latency.", buckets=(0.1, 1.0))
+
+    runs.inc(status="completed")
+    runs.inc(2, status='say "hi"')
+    rate.set(12.5)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(3)
+
+    text = registry.render()
+
+    assert "# TYPE agent_runs_total counter" in text
+    assert 'agent_runs_total{status="completed"} 1' in text
+    assert 'agent_runs_total{status="say \\"hi\\""} 2' in text
+    assert "agent_rate 12.5" in text
+    assert 'agent_seconds_bucket{le="0.1"} 1' in text
+    assert 'agent_seconds_bucket{le="1.0"} 2' in text
+    assert 'agent_seconds_bucket{le="+Inf"} 3' in text
+    assert "agent_seconds_sum 3.55" in text
+    assert "agent_seconds_count 3" in text
+
+
+def test_labels_and_registration_are_checked() -> None:
+    registry = MetricsRegistry()
+    runs = registry.counter("runs_total", "Runs.", ["status"])
+
+    assert registry.counter("runs_total", "Runs.", ["status"]) is runs
+    with pytest.raises(ValueError):
+        registry.gauge("runs_total", "Runs.", ["status"])
+    with pytest.raises(ValueError):
+        runs.inc(task="x")
+    with pytest.raises(ValueError):
+        runs.inc(-1, status="completed")
+
+
+def test_textfile_is_cumulative_across_processes(tmp_path: Path) -> None:
+    path = tmp_path / "agent.prom"
+    first = MetricsRegistry()
+    first.counter("runs_total", "Runs.", ["status"]).inc(status="completed")
+    first.histogram("seconds", "Latency.", buckets=(1.0,)).observe(0.5)
+    first.gauge("rate", "Rate.").set(4)
+    first.write_textfile(path)
+
+    second = MetricsRegistry()
+    runs = second.counter("runs_total", "Runs.", ["status"])
+    runs.inc(status="completed")
+    runs.inc(status="planned")
+    second.histogram("seconds", "Latency.", buckets=(1.0,)).observe(2)
+    second.gauge("rate", "Rate.").set(9)
+    second.write_textfile(path)
+    runs.inc(status="planned")
+    second.write_textfile(path)
+
+    samples = read_textfile(path)
+    assert samples[("runs_total", '{status="completed"}')] == 2
+    assert samples[("runs_total", '{status="planned"}')] == 2
+    assert samples[("seconds_bucket", '{le="1.0"}')] == 1
+    assert samples[("seconds_count", "")] == 2
+    assert "rate 9" in path.read_text(encoding="utf-8")
+    assert not list(tmp_path.glob(".*tmp*"))
+
+
+def test_textfile_merges_interleaved_writers(tmp_path: Path) -> None:
+    path = tmp_path / "agent.prom"
+    first, second = MetricsRegistry(), MetricsRegistry()
+    first_runs = first.counter("runs_total", "Runs.")
+    second_runs = second.counter("runs_total", "Runs.")
+
+    first_runs.inc()
+    first.write_textfile(path)
+    second_runs.inc(2)
+    second.write_textfile(path)
+    first_runs.inc()
+    first.write_textfile(path)
+    second.write_textfile(path)
+
+    assert read_textfile(path)[("runs_total", "")] == 4
+
+
+def test_shell_executor_and_indexer_update_default_registry(tmp_path: Path) -> None:
+    before = SHELL_COMMANDS.value(exit_code=0)
+    ShellExecutor(allowlist={sys.executable}).run(f"{sys.executable} -c pass")
+    assert SHELL_COMMANDS.value(exit_code=0) == before + 1
+
+    (tmp_path / "a.txt").write_text("x", encoding="utf-8")
+    indexed = INDEX_FILES.value(index="files")
+    prom = tmp_path / "metrics" / "agent.prom"
+    code = cli.main(
+        [
+            "--metrics-textfile",
+            str(prom),
+            "search",
+            "index",
+            "--roots",
+            str(tmp_path / "a.txt"),
+            "--db-path",
+            str(tmp_path / "index.sqlite"),
+        ]
+    )
+
+    assert code == 0
+    assert INDEX_FILES.value(index="files") == indexed + 1
+    assert 'shadowpcagent_index_files_total{index="files"}' in prom.read_text(encoding="utf-8")
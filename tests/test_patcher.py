@@ -0,0 +1,203 @@
+from pathlib import Path
+
+from shadowpcagent.patcher import SnapshotCache, UnifiedDiffApplier
+
+GIT_DIFF = """diff --git a/pkg/a.py b/pkg/a.py
+index 1111111..2222222 100644
+--- a/pkg/a.py
++++ b/pkg/a.py
+@@ -1,2 +1,2 @@
+-x = 1
++x = 2
+ print(x)
+diff --git a/pkg/b.py b/pkg/b.py
+--- a/pkg/b.py
++++ b/pkg/b.py
+@@ -1 +1 @@
+-y = 1
++y = 2
+diff --git a/pkg/new.py b/pkg/new.py
+new file mode 100644
+--- /dev/null
++++ b/pkg/new.py
+@@ -0,0 +1,2 @@
++-- looks like a header
++z = 3
+diff --git a/pkg/old.py b/pkg/old.py
+deleted file mode 100644
+--- a/pkg/old.py
++++ /dev/null
+@@ -1 +0,0 @@
+-gone = True
+"""
+
+
+def _make_tree(root: Path) -> None:
+    (root / "pkg").mkdir()
+    (root / "pkg" / "a.py").write_text("x = 1\nprint(x)\n", encoding="utf-8")
+    (root / "pkg" / "b.py").write_text("y = 1\n", encoding="utf-8")
+    (root / "pkg" / "old.py").write_text("gone = True\n", encoding="utf-8")
+
+
+def test_parse_splits_git_diff_into_file_sections() -> None:
+    patches = UnifiedDiffApplier().parse(GIT_DIFF)
+
+    assert [(p.old_path, p.new_path) for p in patches] == [
+        ("pkg/a.py", "pkg/a.py"),
+        ("pkg/b.py", "pkg/b.py"),
+        (None, "pkg/new.py"),
+        ("pkg/old.py", None),
+    ]
+    assert patches[2].hunks[0].lines == ["+-- looks like a header", "+z = 3"]
+
+
+def test_apply_multi_file_diff_creates_modifies_and_deletes(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    dry = UnifiedDiffApplier().apply(GIT_DIFF, repo_root=tmp_path, dry_run=True)
+    assert dry.validated is True
+    assert (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8") == "x = 1\nprint(x)\n"
+
+    result = UnifiedDiffApplier().apply(GIT_DIFF, repo_root=tmp_path)
+
+    assert result.applied is True
+    assert len(result.files) == 4
+    assert (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8") == "x = 2\nprint(x)\n"
+    assert (tmp_path / "pkg" / "b.py").read_text(encoding="utf-8") == "y = 2\n"
+    assert (tmp_path / "pkg" / "new.py").read_text(encoding="utf-8") == "-- looks like a header\nz = 3\n"
+    assert not (tmp_path / "pkg" / "old.py").exists()
+
+
+def test_apply_is_all_or_nothing_when_one_file_conflicts(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    (tmp_path / "pkg" / "b.py").write_text("y = 99\n", encoding="utf-8")
+
+    result = UnifiedDiffApplier().apply(GIT_DIFF, repo_root=tmp_path)
+
+    assert result.applied is False
+    assert result.error == "pkg/b.py: Hunk #1 does not apply: context mismatch while applying patch."
+    assert [f.validated for f in result.files] == [True, False, True, True]
+    assert (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8") == "x = 1\nprint(x)\n"
+    assert not (tmp_path / "pkg" / "new.py").exists()
+    assert (tmp_path / "pkg" / "old.py").exists()
+
+
+def test_apply_plain_single_file_draft(tmp_path: Path) -> None:
+    (tmp_path / "README.md").write_text("ShadowPCAgent\nmore\n", encoding="utf-8")
+    diff = "--- README.md\n+++ README.md\n@@ -1,2 +1,2 @@\n-ShadowPCAgent\n+ShadowPCAgent (Draft)\n more"
+
+    result = UnifiedDiffApplier().apply(diff, repo_root=tmp_path)
+
+    assert result.applied is True
+    assert result.path == str((tmp_path / "README.md").resolve())
+    assert (tmp_path / "README.md").read_text(encoding="utf-8") == "ShadowPCAgent (Draft)\nmore\n"
+
+
+def test_apply_places_drifted_hunks_and_reports_offset(tmp_path: Path) -> None:
+    target = tmp_path / "mod.py"
+    body = [f"line {i}" for i in range(1, 41)]
+    target.write_text("\n".join(["# header 1", "# header 2", "# header 3"] + body) + "\n", encoding="utf-8")
+    diff = (
+        "--- mod.py\n+++ mod.py\n"
+        "@@ -9,3 +9,3 @@\n line 9\n-line 10\n+line ten\n line 11\n"
+        "@@ -29,3 +29,3 @@\n line 29\n-line 30\n+line thirty\n line 31\n"
+    )
+
+    result = UnifiedDiffApplier().apply(diff, repo_root=tmp_path)
+
+    assert result.applied is True
+    assert result.files[0].offsets == [3, 3]
+    assert (result.offset, result.fuzz) == (3, 0)
+    lines = target.read_text(encoding="utf-8").splitlines()
+    assert lines[12] == "line ten"
+    assert lines[32] == "line thirty"
+
+
+def test_apply_uses_fuzz_when_outer_context_changed(tmp_path: Path) -> None:
+    target = tmp_path / "mod.py"
+    target.write_text("a\nB CHANGED\nc\nd\ne\nf\ng\n", encoding="utf-8")
+    diff = "--- mod.py\n+++ mod.py\n@@ -1,7 +1,7 @@\n a\n b\n c\n-d\n+D\n e\n f\n g\n"
+
+    assert UnifiedDiffApplier(max_fuzz=1).apply(diff, repo_root=tmp_path, dry_run=True).validated is False
+    result = UnifiedDiffApplier(max_fuzz=2).apply(diff, repo_root=tmp_path)
+
+    assert result.applied is True
+    assert result.fuzz == 2
+    assert target.read_text(encoding="utf-8") == "a\nB CHANGED\nc\nD\ne\nf\ng\n"
+
+
+def test_plan_is_reused_for_apply_and_rejects_changed_targets(tmp_path: Path) -> None:
+    target = tmp_path / "hello.txt"
+    target.write_text("hello\n", encoding="utf-8")
+    diff = "--- hello.txt\n+++ hello.txt\n@@ -1 +1 @@\n-hello\n+hi\n"
+    applier = UnifiedDiffApplier()
+
+    plan = applier.plan(diff, repo_root=tmp_path)
+    assert plan.validated is True
+    assert plan.files[0].new_text == "hi\n"
+
+    target.write_text("hello\n# edited meanwhile\n", encoding="utf-8")
+    stale = applier.apply_plan(plan)
+    assert stale.applied is False
+    assert stale.error == "hello.txt: Target changed since validation."
+    assert target.read_text(encoding="utf-8") == "hello\n# edited meanwhile\n"
+
+    fresh = applier.plan(diff, repo_root=tmp_path)
+    result = applier.apply_plan(fresh)
+    assert result.applied is True
+    assert result.dry_run is False
+    assert target.read_text(encoding="utf-8") == "hi\n# edited meanwhile\n"
+
+
+def test_snapshot_cache_reads_each_target_once(tmp_path: Path) -> None:
+    (tmp_path / "hello.txt").write_text("hello\n", encoding="utf-8")
+    diff = "--- hello.txt\n+++ hello.txt\n@@ -1 +1 @@\n-hello\n+hi\n"
+    cache = SnapshotCache()
+    applier = UnifiedDiffApplier(reader=cache.read)
+
+    assert applier.plan(diff, repo_root=tmp_path).validated is True
+    assert applier.plan(diff, repo_root=tmp_path).validated is True
+    assert cache.reads == 1
+
+
+def test_apply_rejects_paths_outside_the_repository(tmp_path: Path) -> None:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (tmp_path / "outside.py").write_text("x = 1\n", encoding="utf-8")
+    (repo / "link").symlink_to(tmp_path)
+    escapes = [
+        "--- a/../outside.py\n+++ b/../outside.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n",
+        f"--- {tmp_path / 'outside.py'}\n+++ {tmp_path / 'outside.py'}\n@@ -1 +1 @@\n-x = 1\n+x = 2\n",
+        "--- a/link/outside.py\n+++ b/link/outside.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n",
+    ]
+
+    results = [UnifiedDiffApplier().apply(diff, repo_root=repo) for diff in escapes]
+
+    assert [r.applied for r in results] == [False, False, False]
+    assert all("outside the repository" in (r.error or "") for r in results)
+    assert (tmp_path / "outside.py").read_text(encoding="utf-8") == "x = 1\n"
+
+
+def test_apply_skips_mode_only_and_binary_sections(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    diff = (
+        "diff --git a/pkg/b.py b/pkg/b.py\nold mode 100644\nnew mode 100755\n"
+        "diff --git a/logo.png b/logo.png\nindex 1111111..2222222 100644\nBinary files a/logo.png and b/logo.png differ\n"
+        + GIT_DIFF.split("diff --git a/pkg/b.py", 1)[0]
+    )
+
+    result = UnifiedDiffApplier().apply(diff, repo_root=tmp_path)
+
+    assert result.applied is True
+    assert result.skipped == ["pkg/b.py", "logo.png"]
+    assert (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8") == "x = 2\nprint(x)\n"
+
+
+def test_apply_reports_non_utf8_targets_instead_of_raising(tmp_path: Path) -> None:
+    (tmp_path / "latin1.txt").write_bytes(b"caf\xe9\n")
+    diff = "--- a/latin1.txt\n+++ b/latin1.txt\n@@ -1 +1 @@\n-cafe\n+coffee\n"
+
+    result = UnifiedDiffApplier().apply(diff, repo_root=tmp_path)
+
+    assert (result.validated, result.applied) == (False, False)
+    assert "not UTF-8" in (result.error or "")
@@ -0,0 +1,64 @@
+import pstats
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent import cli
+from shadowpcagent.profiling import Profiler
+
+
+def _work() -> list:
+    return [str(i) * 10 for i in range(2000)]
+
+
+def test_cpu_and_memory_artifacts(tmp_path: Path) -> None:
+    with Profiler("both", tmp_path / "run-1", top=5) as profiler:
+        retained = _work()
+
+    assert set(profiler.paths) == {"cpu_profile", "cpu_top", "mem_top"}
+    assert pstats.Stats(profiler.paths["cpu_profile"]).total_calls > 0
+    assert "_work" in Path(profiler.paths["cpu_top"]).read_text(encoding="utf-8")
+    mem = Path(profiler.paths["mem_top"]).read_text(encoding="utf-8")
+    assert mem.startswith("current:") and "test_profiling.py" in mem
+    assert not tracemalloc.is_tracing()
+    assert retained
+
+
+def test_memory_only_leaves_existing_tracing_running(tmp_path: Path) -> None:
+    tracemalloc.start()
+    try:
+        paths = Profiler("mem", tmp_path).start().stop()
+        assert list(paths) == ["mem_top"]
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_unknown_mode_is_rejected(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        Profiler("io", tmp_path)
+
+
+def test_cli_profile_option_wraps_subcommands(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    (tmp_path / "a.txt").write_text("x", encoding="utf-8")
+    code = cli.main(
+        [
+            "--profile",
+            "cpu",
+            "--profile-dir",
+            str(tmp_path / "profiles"),
+            "search",
+            "index",
+            "--roots",
+            str(tmp_path / "a.txt"),
+            "--db-path",
+            str(tmp_path / "index.sqlite"),
+        ]
+    )
+
+    assert code == 0
+    (run_dir,) = (tmp_path / "profiles").iterdir()
+    assert sorted(p.name for p in run_dir.iterdir()) == ["cpu-top.txt", "cpu.prof"]
+    assert "build_sqlite_index" in (run_dir / "cpu-top.txt").read_text(encoding="utf-8")
+    assert "profile cpu_profile:" in capsys.readouterr().err
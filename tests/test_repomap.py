@@ -0,0 +1,67 @@
+from pathlib import Path
+
+from shadowpcagent.repomap import RepoMapBuilder, count_lines
+
+
+def _make_repo(root: Path) -> None:
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "tests").mkdir()
+    (root / "node_modules").mkdir()
+    (root / "pyproject.toml").write_text("[project]\nname = 'pkg'\n", encoding="utf-8")
+    (root / "src" / "pkg" / "mod.py").write_text(
+        "# header\n\nimport os\n\n\ndef f():\n    return os.sep\n", encoding="utf-8"
+    )
+    (root / "tests" / "test_mod.py").write_text("def test_f():\n    pass\n", encoding="utf-8")
+    (root / "node_modules" / "dep.js").write_text("var x = 1;\n", encoding="utf-8")
+    (root / "image.bin").write_bytes(b"\0\1\2")
+
+
+def test_count_lines_handles_block_comments() -> None:
+    text = "/* start\n still comment */\nint x = 1; // trailing\n\n// note\n"
+    assert count_lines(text, "C") == (1, 3, 1)
+
+
+def test_repo_map_classifies_languages_tools_and_tests(tmp_path: Path) -> None:
+    _make_repo(tmp_path)
+    artifact = tmp_path / "artifacts" / "repo-map.json"
+    repo_map = RepoMapBuilder(artifact_path=artifact).build(tmp_path)
+
+    paths = [stats.path for stats in repo_map.files]
+    assert "src/pkg/mod.py" in paths
+    assert not any(path.startswith("node_modules") for path in paths)
+    assert repo_map.build_tools == {"pyproject": ["."]}
+    assert repo_map.test_dirs == ["tests"]
+    python = repo_map.languages()["Python"]
+    assert (python.files, python.code, python.comment, python.blank) == (2, 5, 1, 3)
+    assert artifact.exists()
+
+
+def test_repo_map_reuses_cache_and_runs_in_process_pool(tmp_path: Path) -> None:
+    _make_repo(tmp_path)
+    artifact = tmp_path / "artifacts" / "repo-map.json"
+    builder = RepoMapBuilder(artifact_path=artifact, max_workers=2, parallel_threshold=1)
+    first = builder.build(tmp_path)
+    assert first.cached_files == 0
+
+    (tmp_path / "src" / "pkg" / "mod.py").write_text("x = 1\ny = 2\n", encoding="utf-8")
+    second = builder.build(tmp_path)
+    assert second.cached_files == len(second.files) - 1
+    mod = next(stats for stats in second.files if stats.path == "src/pkg/mod.py")
+    assert mod.code == 2
+
+
+def test_repo_map_respects_max_files_and_skips_unchanged_rewrites(tmp_path: Path) -> None:
+    _make_repo(tmp_path)
+    artifact = tmp_path / "artifacts" / "repo-map.json"
+    builder = RepoMapBuilder(artifact_path=artifact)
+
+    limited = builder.build(tmp_path, max_files=2)
+    assert len(limited.files) <= 2
+    assert limited.truncated
+
+    full = builder.build(tmp_path)
+    assert not full.truncated
+    written = artifact.stat().st_mtime_ns
+    again = builder.build(tmp_path)
+    assert again.cached_files == len(again.files)
+    assert artifact.stat().st_mtime_ns == written
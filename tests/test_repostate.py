@@ -0,0 +1,156 @@
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent import cli, executors
+from shadowpcagent.executors import ShellExecutor
+from shadowpcagent.repostate import find_repo, read_head, read_index, repo_fingerprint
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        cwd=str(repo),
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+    (tmp_path / "src" / "pkg" / "mod.py").write_text("x = 1\n", encoding="utf-8")
+    (tmp_path / "README.md").write_text("hi\n", encoding="utf-8")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-qm", "init")
+    return tmp_path
+
+
+def _bump_mtime(path: Path) -> None:
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5 * 10**9))
+
+
+@pytest.mark.parametrize("version", ["2", "4"])
+def test_read_index_matches_git(repo: Path, version: str) -> None:
+    _git(repo, "update-index", "--index-version", version)
+
+    entries = read_index(repo / ".git" / "index")
+
+    assert [e.path for e in entries] == _git(repo, "ls-files").split()
+    assert entries[0].size == len("hi\n")
+
+
+def test_head_is_read_without_git(repo: Path) -> None:
+    root, git_dir = find_repo(repo / "src" / "pkg")
+
+    assert root == repo
+    assert read_head(git_dir) == _git(repo, "rev-parse", "HEAD").strip()
+    _git(repo, "pack-refs", "--all")
+    assert read_head(git_dir) == _git(repo, "rev-parse", "HEAD").strip()
+
+
+def test_fingerprint_tracks_dirty_set_new_files_and_commits(repo: Path) -> None:
+    clean = repo_fingerprint(repo)
+    assert clean == repo_fingerprint(repo / "src")
+
+    (repo / "src" / "pkg" / "mod.py").write_text("x = 2\n", encoding="utf-8")
+    _bump_mtime(repo / "src" / "pkg" / "mod.py")
+    modified = repo_fingerprint(repo)
+    assert modified != clean
+
+    (repo / "src" / "pkg" / "new.py").write_text("", encoding="utf-8")
+    _bump_mtime(repo / "src" / "pkg")
+    assert repo_fingerprint(repo) != modified
+
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-qm", "second")
+    assert repo_fingerprint(repo) not in (clean, modified)
+
+
+def test_outside_a_repo_nothing_is_cached(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> None:
+    plain = tmp_path_factory.mktemp("plain")
+    if find_repo(plain) is not None:
+        pytest.skip("temp dir is inside a git repository")
+    monkeypatch.chdir(plain)
+    executor = ShellExecutor(allowlist={"ls"}, pure_commands={"ls"})
+
+    assert repo_fingerprint(plain) is None
+    assert not executor.run("ls").cached
+    assert not executor.run("ls").cached
+
+
+def test_pure_commands_are_cached_per_repo_state(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(repo)
+    executor = ShellExecutor(allowlist={"git", "ls"}, pure_commands={"git status", "ls"})
+
+    first = executor.run("git status --porcelain")
+    second = executor.run("git status --porcelain")
+    assert not first.cached and second.cached
+    assert second.stdout == first.stdout
+
+    (repo / "README.md").write_text("changed\n", encoding="utf-8")
+    _bump_mtime(repo / "README.md")
+    executor.invalidate()
+    third = executor.run("git status --porcelain")
+    assert not third.cached and "README.md" in third.stdout
+
+    assert executor.is_pure("ls -la")
+    assert not executor.is_pure("ls; rm -rf build")
+    assert not executor.is_pure("git log")
+    assert not executor.run("git log --oneline").cached
+    assert not executor.run("git log --oneline").cached
+
+
+def test_pure_command_cache_sees_untracked_directories_named_in_args(
+    repo: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(repo)
+    (repo / ".gitignore").write_text("build/\n", encoding="utf-8")
+    _git(repo, "add", ".gitignore")
+    _git(repo, "commit", "-qm", "ignore build")
+    (repo / "build").mkdir()
+    executor = ShellExecutor(allowlist={"ls"}, pure_commands={"ls"})
+
+    assert executor.run("ls build").stdout == ""
+    assert executor.run("ls build").cached
+
+    (repo / "build" / "out.bin").write_bytes(b"")
+    _bump_mtime(repo / "build")
+    listing = executor.run("ls build")
+    assert not listing.cached and listing.stdout == "out.bin"
+
+
+def test_cli_exec_caches_pure_commands_from_config(
+    repo: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+) -> None:
+    monkeypatch.chdir(repo)
+    config = repo / ".git" / "agent.json"
+    config.write_text(json.dumps({"allowlist": ["git"], "pure_commands": ["git status"]}), encoding="utf-8")
+
+    code = cli.main(["--config", str(config), "exec", "--parallel", "1", "--json", "git status", "git status"])
+
+    assert code == 0
+    assert [r["cached"] for r in json.loads(capsys.readouterr().out)["results"]] == [False, True]
+
+
+def test_repo_fingerprint_is_memoised_until_invalidated(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(repo)
+    calls = []
+    monkeypatch.setattr(executors, "repo_fingerprint", lambda start: calls.append(start) or repo_fingerprint(start))
+    executor = ShellExecutor(allowlist={"ls"}, pure_commands={"ls"})
+
+    assert [executor.run("ls").cached for _ in range(3)] == [False, True, True]
+    assert len(calls) == 1
+
+    executor.run("ls src")  # a miss that leaves the index alone reuses the fingerprint
+    assert len(calls) == 1
+    executor.invalidate()
+    assert executor.run("ls").cached
+    assert len(calls) == 2
@@ -0,0 +1,75 @@
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from shadowpcagent.logging_utils import list_run_logs, read_jsonl
+from shadowpcagent.retention import LogRetention
+
+
+def _write_log(path: Path, events: int, mtime: float) -> None:
+    path.write_text("".join(json.dumps({"event": f"e{i}"}) + "\n" for i in range(events)), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_retention_compresses_rotates_and_prunes(tmp_path: Path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    now = time.time()
+    _write_log(logs / "run-20200101T000000Z.jsonl", 5, now - 400 * 86400)
+    _write_log(logs / "run-20240101T000000Z.jsonl", 5, now - 3600)
+    active = logs / "run-20240102T000000Z.jsonl"
+    _write_log(active, 1, now)
+    other_agent = logs / "run-20240103T000000Z.jsonl"
+    _write_log(other_agent, 1, now - 60)
+    history = tmp_path / "run-history.jsonl"
+    _write_log(history, 200, now - 3600)
+
+    retention = LogRetention(
+        log_dir=logs, history_path=history, max_age=timedelta(days=90), history_max_bytes=1024
+    )
+    result = retention.run(active=active)
+
+    assert len(result.rotated) == 1 and not history.exists()
+    assert sorted(p.name for p in result.removed) == ["run-20200101T000000Z.jsonl.gz"]
+    assert [p.name for p in list_run_logs(logs)] == ["run-20240101T000000Z.jsonl.gz", active.name, other_agent.name]
+    archived = list_run_logs(logs)[0]
+    assert [r["event"] for r in read_jsonl(archived)] == [f"e{i}" for i in range(5)]
+    assert len(list(read_jsonl(Path(str(result.rotated[0]) + ".gz")))) == 200
+
+
+def test_retention_enforces_total_byte_budget(tmp_path: Path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    now = time.time()
+    for day in range(5):
+        _write_log(logs / f"run-2024010{day}T000000Z.jsonl", 50, now - (5 - day) * 3600)
+
+    result = LogRetention(log_dir=logs, max_total_bytes=None).run()
+    archive_size = max(p.stat().st_size for p in result.compressed)
+    LogRetention(log_dir=logs, max_total_bytes=archive_size * 2).run()
+
+    assert [p.name for p in list_run_logs(logs)] == [
+        "run-20240103T000000Z.jsonl.gz",
+        "run-20240104T000000Z.jsonl.gz",
+    ]
+
+
+def test_retention_sweeps_interrupted_compressions_and_stops(tmp_path: Path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    now = time.time()
+    _write_log(logs / "run-20240101T000000Z.jsonl", 5, now - 3600)
+    _write_log(logs / ".run-20240102T000000Z.jsonl.gz.tmp", 5, now - 3600)
+    _write_log(logs / ".run-20240103T000000Z.jsonl.gz.tmp", 5, now)
+    retention = LogRetention(log_dir=logs)
+
+    retention.start().join()
+    retention.stop()
+
+    assert sorted(p.name for p in logs.iterdir()) == [
+        ".run-20240103T000000Z.jsonl.gz.tmp",
+        "run-20240101T000000Z.jsonl.gz",
+    ]
+    assert [p.name for p in list_run_logs(logs)] == ["run-20240101T000000Z.jsonl.gz"]
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from shadowpcagent.tools.shadow_search.query import search_symbols
+from shadowpcagent.tools.shadow_search.symbols import build_symbol_index
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def test_symbol_index_records_definitions_and_imports(tmp_path: Path) -> None:
+    _write(
+        tmp_path / "src" / "pkg" / "patcher.py",
+        "from .models import PatchResult\n\n\n"
+        "class UnifiedDiffApplier:\n"
+        "    def _apply_hunks(self, lines: list, hunks: list) -> list:\n"
+        "        return lines\n",
+    )
+    _write(tmp_path / "src" / "pkg" / "__init__.py", "")
+    db = tmp_path / "symbols.sqlite"
+
+    result = build_symbol_index([tmp_path], db_path=db)
+    assert result["files_parsed"] == 2
+
+    hits = search_symbols("UnifiedDiffApplier._apply_hunks", db_path=db)
+    assert hits[0]["match"] == "exact"
+    assert hits[0]["kind"] == "method"
+    assert hits[0]["signature"] == "(self, lines: list, hunks: list) -> list"
+    assert (hits[0]["lineno"], hits[0]["end_lineno"]) == (5, 6)
+
+    assert search_symbols("Unified", db_path=db)[0]["match"] == "prefix"
+    assert search_symbols("aplyhunk", db_path=db)[0]["name"] == "_apply_hunks"
+    assert search_symbols("aplyhunk", db_path=db, fuzzy=False) == []
+
+
+def test_symbol_index_reparses_only_changed_files(tmp_path: Path) -> None:
+    _write(tmp_path / "a.py", "def alpha():\n    pass\n")
+    _write(tmp_path / "b.py", "def beta():\n    pass\n")
+    db = tmp_path / "symbols.sqlite"
+    build_symbol_index([tmp_path], db_path=db)
+
+    _write(tmp_path / "a.py", "def alpha2():\n    pass\n")
+    (tmp_path / "b.py").unlink()
+    result = build_symbol_index([tmp_path], db_path=db)
+
+    assert (result["files_parsed"], result["files_removed"]) == (1, 1)
+    assert search_symbols("alpha2", db_path=db, fuzzy=False)
+    assert search_symbols("beta", db_path=db, fuzzy=False) == []
+
+
+def test_symbol_index_refresh_leaves_sibling_roots_alone(tmp_path: Path) -> None:
+    _write(tmp_path / "b" / "one.py", "def one():\n    pass\n")
+    _write(tmp_path / "bc" / "two.py", "def two():\n    pass\n")
+    db = tmp_path / "symbols.sqlite"
+    build_symbol_index([tmp_path / "b", tmp_path / "bc"], db_path=db)
+
+    result = build_symbol_index([tmp_path / "b"], db_path=db)
+
+    assert result["files_removed"] == 0
+    assert search_symbols("two", db_path=db, fuzzy=False)
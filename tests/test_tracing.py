@@ -0,0 +1,84 @@
+import json
+import threading
+from pathlib import Path
+
+from shadowpcagent.tracing import NOOP_SPAN, Tracer
+
+
+def test_spans_nest_and_record_durations() -> None:
+    records = []
+    tracer = Tracer(sink=records.append)
+
+    with tracer.start("run", category="run") as outer:
+        inner = tracer.start("scan", files=3)
+        inner.end()
+        with tracer.start("shell", category="executor"):
+            pass
+
+    assert outer.duration >= inner.duration >= 0
+    assert [(r["name"], r["parent"], r["depth"]) for r in records] == [
+        ("scan", "run", 1),
+        ("shell", "run", 1),
+        ("run", None, 0),
+    ]
+    assert records[0]["args"] == {"files": 3}
+
+
+def test_chrome_trace_export(tmp_path: Path) -> None:
+    tracer = Tracer()
+    with tracer.start("run"):
+        with tracer.start("plan"):
+            pass
+
+    def worker() -> None:
+        tracer.start("thread-phase").end()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    path = tracer.write_chrome_trace(tmp_path / "traces" / "run.trace.json")
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    complete = [e for e in events if e["ph"] == "X"]
+
+    assert [e["name"] for e in complete] == ["run", "plan", "thread-phase"]
+    run, plan, threaded = complete
+    assert run["ts"] <= plan["ts"] and plan["ts"] + plan["dur"] <= run["ts"] + run["dur"]
+    assert threaded["tid"] != run["tid"]
+    assert threaded.get("args") == {}
+
+
+def test_exception_marks_span_and_closes_it() -> None:
+    tracer = Tracer()
+    try:
+        with tracer.start("apply"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    assert tracer.spans[0].args == {"error": "RuntimeError"}
+    assert tracer.start("next").depth == 0
+
+
+def test_disabled_tracer_is_a_noop() -> None:
+    records = []
+    tracer = Tracer(enabled=False, sink=records.append)
+
+    span = tracer.start("run", task="x")
+    with span:
+        pass
+
+    assert span is NOOP_SPAN
+    assert span.end() is None and span.duration is None
+    assert records == [] and tracer.spans == []
+
+
+def test_reset_drops_spans_left_open() -> None:
+    tracer = Tracer()
+    tracer.start("abandoned")
+    tracer.reset()
+
+    with tracer.start("next") as span:
+        pass
+
+    assert span.parent is None and span.depth == 0
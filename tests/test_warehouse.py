@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+from shadowpcagent import cli
+from shadowpcagent.retention import LogRetention
+from shadowpcagent.warehouse import LogQuery, LogWarehouse
+
+
+def _record(event: str, ts: str, **payload) -> str:
+    return json.dumps({"event": event, "timestamp": ts, "payload": payload}) + "\n"
+
+
+def test_ingest_is_incremental_and_survives_compression_and_rotation(tmp_path: Path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    first = logs / "run-20240101T000000Z.jsonl"
+    first.write_text(
+        _record("shell_command", "2024-01-01T00:00:01Z", command="git status", returncode=0, duration=0.5)
+        + _record("patch_validation", "2024-01-01T00:00:02Z", error="Hunk #1 does not apply: context mismatch"),
+        encoding="utf-8",
+    )
+    history = tmp_path / "run-history.jsonl"
+    history.write_text(
+        json.dumps({"timestamp": "2024-01-01T00:00:03Z", "task": "t", "status": "completed"}) + "\n",
+        encoding="utf-8",
+    )
+    warehouse = LogWarehouse(tmp_path / "warehouse.sqlite")
+
+    assert warehouse.ingest(logs, history)["events_loaded"] == 3
+    with first.open("a", encoding="utf-8") as handle:
+        handle.write(_record("shell_command", "2024-01-02T00:00:01Z", command="ls", returncode=0, duration=1.5))
+        handle.write('{"event": "partial"')
+    assert warehouse.ingest(logs, history)["events_loaded"] == 1
+
+    LogRetention(log_dir=logs, history_path=history, history_max_bytes=1).run()
+    history.write_text(
+        json.dumps({"timestamp": "2024-01-03T00:00:00Z", "task": "t2", "status": "planned"}) + "\n",
+        encoding="utf-8",
+    )
+    assert warehouse.ingest(logs, history)["events_loaded"] == 1
+
+    assert warehouse.runs(LogQuery(contains="context mismatch")) == ["run-20240101T000000Z"]
+    assert warehouse.stats(LogQuery(event="shell_command"), "duration")["median"] == 1.0
+    rows = warehouse.query(LogQuery(event="run_history"))
+    assert [r["status"] for r in rows] == ["planned", "completed"]
+    assert [r["payload"]["command"] for r in warehouse.query(LogQuery(fields={"command": "ls"}))] == ["ls"]
+    assert warehouse.query(LogQuery(since="2024-01-02T00:00:00Z", until="2024-01-03T00:00:00Z"))[0]["run"] == (
+        "run-20240101T000000Z"
+    )
+
+
+def test_logs_query_command_lists_runs(tmp_path: Path, capsys) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "run-20240101T000000Z.jsonl").write_text(
+        _record("shell_command", "2024-01-01T00:00:01Z", returncode=1), encoding="utf-8"
+    )
+    db = str(tmp_path / "warehouse.sqlite")
+
+    assert cli.main(["logs", "ingest", "--log-dir", str(logs), "--history-path", "", "--db-path", db]) == 0
+    assert cli.main(["logs", "query", "--where", "returncode=1", "--runs", "--db-path", db]) == 0
+
+    assert capsys.readouterr().out.strip().splitlines()[-1] == "run-20240101T000000Z"
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from shadowpcagent.editor import CodemodRequest, EditRequest, FileEditor
+from shadowpcagent.patcher import UnifiedDiffApplier
+from shadowpcagent.workspace import OverlayWorkspace
+
+
+def _tree(root: Path) -> None:
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "a.py").write_text("value = 1\nname = 'old'\n", encoding="utf-8")
+    (root / "pkg" / "b.py").write_text("print('old')\n", encoding="utf-8")
+
+
+def test_chained_edits_and_patches_stay_in_memory_until_commit(tmp_path: Path) -> None:
+    _tree(tmp_path)
+    workspace = OverlayWorkspace(tmp_path)
+    editor = FileEditor(workspace=workspace)
+    applier = UnifiedDiffApplier(workspace=workspace)
+
+    edit = editor.apply_edit(EditRequest(path=Path("pkg/a.py"), find_text="1", replace_text="2", apply=True))
+    assert edit.applied is True
+    # The patch is written against the edited content, which only exists in the overlay.
+    patch = (
+        "--- a/pkg/a.py\n+++ b/pkg/a.py\n@@ -1,2 +1,2 @@\n-value = 2\n+value = 3\n name = 'old'\n"
+        "--- /dev/null\n+++ b/pkg/c.py\n@@ -0,0 +1 @@\n+created = True\n"
+    )
+    assert applier.apply(patch, repo_root=tmp_path).applied is True
+    codemod = editor.apply_codemod(
+        CodemodRequest(root=tmp_path, pattern="old", replacement="new", path_glob="pkg/*.py", apply=True)
+    )
+    assert codemod.applied is True
+
+    assert (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8") == "value = 1\nname = 'old'\n"
+    assert not (tmp_path / "pkg" / "c.py").exists()
+
+    combined = workspace.diff()
+    copy = tmp_path / "copy"
+    _tree(copy)
+    assert UnifiedDiffApplier().apply(combined, repo_root=copy).applied is True
+
+    written = workspace.commit()
+    assert [p.name for p in written] == ["a.py", "b.py", "c.py"]
+    for name in ("a.py", "b.py", "c.py"):
+        assert (tmp_path / "pkg" / name).read_text(encoding="utf-8") == (copy / "pkg" / name).read_text(
+            encoding="utf-8"
+        )
+    assert (tmp_path / "pkg" / "a.py").read_text(encoding="utf-8") == "value = 3\nname = 'new'\n"
+    assert workspace.diff() == ""
+
+
+def test_commit_refuses_when_disk_changed_underneath(tmp_path: Path) -> None:
+    _tree(tmp_path)
+    workspace = OverlayWorkspace(tmp_path)
+    FileEditor(workspace=workspace).apply_edit(
+        EditRequest(path=Path("pkg/b.py"), find_text="old", replace_text="new", apply=True)
+    )
+    (tmp_path / "pkg" / "b.py").write_text("print('other')\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="Workspace base changed on disk: pkg/b.py"):
+        workspace.commit()
+    assert (tmp_path / "pkg" / "b.py").read_text(encoding="utf-8") == "print('other')\n"